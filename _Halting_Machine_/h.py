@@ -1,4 +1,6 @@
-from math import sin, cos, tan, atan, exp, pi
+from math import sin, cos, tan, atan, exp, pi, trunc, sqrt, isfinite
+from fractions import Fraction
+from numbers import Rational
 # Project Name: "Deciding the Undecidable"
 # Author: Kyle Hinds
 # Date: April 20th, 2024
@@ -102,10 +104,10 @@ def round_to_limits(value, decimals=2):
         return round(value, decimals)
 
 # Example of a function that always halts returning 0.
-def halt(x = 0, y = 0, a=1, b=1):
+def halt(x = 0, y = 0, a=1, b=1, decimals=2):
     # Returns 0⋅((x⋅a) + (y⋅b))
     result = 0*((x*a) + (y*b))
-    return round_to_limits(result)
+    return round_to_limits(result, decimals)
 
 # Example of a function that always loops and returns ±∞.
 def loop(x=0, y=0, a=1, b=1):
@@ -122,7 +124,7 @@ def loop(x=0, y=0, a=1, b=1):
 # By definition, sometimes Q halts, and sometimes it loops.
 # On infinite input, it halts and returns the finite output '0'.
 # On the finite input '0', it loops forever and returns infinite output.
-def q_inverse(x=0, y=0, a=1, b=1):
+def q_inverse(x=0, y=0, a=1, b=1, decimals=2):
     # Returns +∞ at 0 and 0 at +∞
     # Returns 1 / ((x⋅a) + (y⋅b))
     if (x + y) == 0:
@@ -132,97 +134,320 @@ def q_inverse(x=0, y=0, a=1, b=1):
         return 0
     else:
         result = 1 / ((x*a) + (y*b))
-        return round_to_limits(result)
+        return round_to_limits(result, decimals)
+
+# Repeated Q: Qn(x) = 1/(1/(1/...(1/x))) with n applications of q_inverse.
+# The result is exactly that of n repeated calls (the ±∞ and 0 branches and round_to_limits apply at every step), but the
+# orbit is only followed until a value repeats; from there it is periodic, so depth n is read off from its tail and period.
+# With y = 0, q_inverse is the reciprocal, an involution up to rounding, so orbits settle into period 1 or 2 within a few
+# steps and any depth costs O(1) by the parity of n.
+def q_inverse_n(x=0, n=1, y=0, a=1, b=1, decimals=2):
+    # Returns q_inverse(q_inverse(...q_inverse(x)...)) with n nested calls
+    if n < 0:
+        raise ValueError("Depth n must be a non-negative integer.")
+    orbit = [x]
+    seen = {}
+    while len(orbit) <= n:
+        key = repr(orbit[-1])  # Keeps 0, 0.0 and -0.0 apart, and matches nan with nan
+        if key in seen:
+            tail = seen[key]
+            period = len(orbit) - 1 - tail
+            return orbit[tail + (n - tail) % period]
+        seen[key] = len(orbit) - 1
+        orbit.append(q_inverse(orbit[-1], y, a, b, decimals))
+    return orbit[n]
 
 # Definition of the function H.
 # Functions for H, where it returns a yes or no answer that itself is finite, and can handle infinities as input.
-def h_arctan(x=0, y=0, a=1, b=1): # Returns a number between -1 and 1
+def h_arctan(x=0, y=0, a=1, b=1, decimals=2): # Returns a number between -1 and 1
     # Returns normalized arctan(((xπ)/a) - ((yπ)/b))⋅(2/π) = arctan(θ)⋅(2/π)
     result = atan(((x)/a) - ((y)/b)) * (2 / pi)
-    return round_to_limits(result)
+    return round_to_limits(result, decimals)
 
-def h_sigmoid(x=0, y=0, a=1, b=1): # Returns a number between 0 and 1
+def h_sigmoid(x=0, y=0, a=1, b=1, decimals=2): # Returns a number between 0 and 1
     # Returns 1/(1 + e^(-(((xπ)/a) - ((yπ)/b)))) = 1/(1 + e^(-θ))
     result = 1 / (1 + exp(-((x*a) + (y*b))))
-    return round_to_limits(result)
+    return round_to_limits(result, decimals)
+
+# Exact rational phases.
+# When x, y, a and b are all ints or Fractions, θ/π = x/a - y/b is an exact rational number instead of a rounded float.
+# Phases on a multiple of π/4 are answered from qn_phase_table without any trig, so the poles at multiples of π/2 are hit exactly
+# (in floating point cos(π/2) is about 6e-17, so the pole checks below would never fire there).
+# (tan²(θ), cot²(θ), tan²(θ)⋅sin(θ), cot²(θ)⋅cos(θ)) at θ = kπ/4 for k = 0 .. 7; at a pole the compositional models take
+# the sign of sin(θ) or cos(θ) there, -∞ at 3π/2 and π, as the float path rounds them.
+qn_phase_table = [
+    (0.0, float('inf'), 0.0, float('inf')),
+    (1.0, 1.0, sqrt(2) / 2, sqrt(2) / 2),
+    (float('inf'), 0.0, float('inf'), 0.0),
+    (1.0, 1.0, sqrt(2) / 2, -sqrt(2) / 2),
+    (0.0, float('inf'), 0.0, float('-inf')),
+    (1.0, 1.0, -sqrt(2) / 2, -sqrt(2) / 2),
+    (float('inf'), 0.0, float('-inf'), 0.0),
+    (1.0, 1.0, -sqrt(2) / 2, sqrt(2) / 2),
+]
+
+def rational_phase(x=0, y=0, a=1, b=1):
+    # Returns θ/π as an exact Fraction when every argument is an int or Fraction, otherwise None
+    if isinstance(x, Rational) and isinstance(y, Rational) and isinstance(a, Rational) and isinstance(b, Rational):
+        return Fraction(x, a) - Fraction(y, b)
+    return None
+
+def quarter_turn(x=0, y=0, a=1, b=1):
+    # Returns k where θ = kπ/4 (mod 2π) for an exact rational phase on a multiple of π/4, otherwise None
+    phase = rational_phase(x, y, a, b)
+    if phase is None or (phase * 4).denominator != 1:
+        return None
+    return (phase * 4).numerator % 8
+
+# Large-argument reduction.
+# Once x/a or y/b reaches REDUCTION_THRESHOLD half-turns, (xπ)/a has lost most of its fractional bits before tan sees it.
+# Every finite float is an exact dyadic rational, so θ/π is then computed exactly with Fractions and reduced modulo the
+# model's period (π for tan² and cot², 2π for the compositional models) before multiplying by π.
+REDUCTION_THRESHOLD = 2 ** 20
+
+# Period of each Qn model in units of π.
+qn_periods = {"qn_tan2": 1, "qn_cot2": 1, "qn_tan2_sin": 2, "qn_cot2_cos": 2}
+
+def large_phase(x=0, y=0, a=1, b=1):
+    # True if every argument is finite and x/a or y/b is at least REDUCTION_THRESHOLD in magnitude
+    if abs(x) < REDUCTION_THRESHOLD * abs(a) and abs(y) < REDUCTION_THRESHOLD * abs(b):
+        return False
+    for value in (x, y, a, b):
+        if not isinstance(value, Rational) and not isfinite(value):
+            return False
+    return True
+
+def qn_argument(x=0, y=0, a=1, b=1, period=1):
+    # Returns (k, None) when θ is an exact multiple of π/4 (θ = kπ/4 mod 2π), otherwise (None, θ) for the trig calls
+    large = large_phase(x, y, a, b)
+    phase = None if x.__class__ is float else rational_phase(x, y, a, b)
+    if phase is None and large:
+        phase = Fraction(x) / Fraction(a) - Fraction(y) / Fraction(b)  # Exact, since finite floats are rationals
+    if phase is not None and (phase * 4).denominator == 1:
+        return (phase * 4).numerator % 8, None
+    if large:
+        return None, float(phase % period) * pi
+    return None, ((x * pi) / a) - ((y * pi) / b)
+
+def qn_table_value(k, model, decimals=2):
+    # Entry of qn_phase_table for model 0 .. 3 (in qn_fused's output order), rounded like the models round
+    value = qn_phase_table[k][model]
+    return value if value == float('inf') else round_to_limits(value, decimals)
 
 # Functions for Qn that treat +∞ as True (loop) and 0 as halt (False).
 # Here x is our starting point, and y is the integer or fractional number of recursive iterations.
 # Allowing x and y to be hyperreal numbers facilitates the exploration of fractional and infinite recursion.
 # Qn tan²(θ) function
-def qn_tan2(x=0, y=0, a=2, b=2): # starts at 0
+def qn_tan2(x=0, y=0, a=2, b=2, decimals=2): # starts at 0
     # Returns tan²(((xπ)/a) - ((yπ)/b)) = tan²(θ) = recursive step # of q_inverse
-    argument = ((x * pi) / a) - ((y * pi) / b)
+    k, argument = qn_argument(x, y, a, b, 1)
+    if k is not None:
+        return qn_table_value(k, 0, decimals)  # Exact multiple of π/4
     # Check if cos(argument) == 0, which implies cot(argument) is 0 and tan²(θ) is undefined
     if cos(argument) == 0:
         return float('inf')  # Return +∞ for tan²(θ) when cot(θ) is 0
     result = tan(argument)**2
-    return round_to_limits(result)
+    return round_to_limits(result, decimals)
 
 # Qn cot²(θ) function
-def qn_cot2(x=0, y=0, a=2, b=2): # starts at ∞
+def qn_cot2(x=0, y=0, a=2, b=2, decimals=2): # starts at ∞
     # Returns cot²(((xπ)/a) - ((yπ)/b)) = cot²(θ) = recursive step # of q_inverse
-    argument = ((x * pi) / a) - ((y * pi) / b)
+    k, argument = qn_argument(x, y, a, b, 1)
+    if k is not None:
+        return qn_table_value(k, 1, decimals)  # Exact multiple of π/4
     # Check if sin(argument) == 0, which implies tan(argument) is 0 and cot²(θ) is undefined
     if sin(argument) == 0:
         return float('inf')  # Return +∞ for cot²(θ) when tan(θ) is 0
     result = 1 / tan(argument)**2
-    return round_to_limits(result)
+    return round_to_limits(result, decimals)
 
 # Functions for Qn that treat +∞ as True (loop) and -∞ as halt (False).
 # Here x is our starting point, and y is the number of recursive iterations.
 # Allowing x and y to be hyperreal numbers facilitates the exploration of fractional and infinite recursion.
-def qn_tan2_sin(x=0, y=0, a=1, b=1): # starts at 0
+def qn_tan2_sin(x=0, y=0, a=1, b=1, decimals=2): # starts at 0
     # Returns tan²(((xπ)/a)-((yπ)/b))⋅sin(((xπ)/a)-((yπ)/b)) = tan²(θ)⋅sin(θ) 
-    # Calculate the argument
-    argument = ((x*pi)/a) - ((y*pi)/b)
+    k, argument = qn_argument(x, y, a, b, 2)
+    if k is not None:
+        return qn_table_value(k, 2, decimals)  # Exact multiple of π/4
     # Check for conditions leading to ∞ directly to avoid division by zero
     if cos(argument) == 0:
         return float('inf')  # This handles the division by zero in tan²(θ) calculation
     # Calculate the expression value
     result = ((tan(argument)**2) * sin(argument))
     # Round the result to handle very small or very large values
-    rounded_result = round_to_limits(result)
+    rounded_result = round_to_limits(result, decimals)
     return rounded_result
 
-def qn_cot2_cos(x=0, y=0, a=1, b=1): # starts at ∞
+def qn_cot2_cos(x=0, y=0, a=1, b=1, decimals=2): # starts at ∞
     # Returns cot²(((xπ)/a)-((yπ)/b))⋅cos(((xπ)/a)-((yπ)/b)) = cot²(θ)⋅cos(θ)
-    # Calculate the argument
-    argument = ((x*pi)/a) - ((y*pi)/b)
+    k, argument = qn_argument(x, y, a, b, 2)
+    if k is not None:
+        return qn_table_value(k, 3, decimals)  # Exact multiple of π/4
     # Check for conditions leading to ∞ directly to avoid division by zero
     if sin(argument) == 0:
         return float('inf')  # This handles the division by zero in cot²(θ) calculation
     # Calculate the expression value
     result = ((1 / tan(argument))**2) * cos(argument)
     # Round the result to handle very small or very large values
-    rounded_result = round_to_limits(result)
+    rounded_result = round_to_limits(result, decimals)
     return rounded_result
 
+# Fused Qn kernel.
+# The argument and its sine and cosine are computed once, and all four Qn models are derived from them with the same pole checks.
+# Returns (tan²(θ), cot²(θ), tan²(θ)⋅sin(θ), cot²(θ)⋅cos(θ)) using 2 trig calls instead of the 10 made by calling each model.
+def qn_fused(x=0, y=0, a=1, b=1, decimals=2):
+    k = quarter_turn(x, y, a, b)
+    if k is not None:
+        return tuple(qn_table_value(k, model, decimals) for model in range(4))  # Exact multiple of π/4
+    if large_phase(x, y, a, b):
+        # The models reduce θ modulo different periods, so there is no single shared argument
+        return qn_tan2(x, y, a, b, decimals), qn_cot2(x, y, a, b, decimals), qn_tan2_sin(x, y, a, b, decimals), qn_cot2_cos(x, y, a, b, decimals)
+    argument = ((x*pi)/a) - ((y*pi)/b)
+    sine = sin(argument)
+    cosine = cos(argument)
+    if cosine == 0:
+        tan2 = tan2_sin = float('inf')  # tan²(θ) is undefined when cot(θ) is 0
+    else:
+        tangent = sine / cosine
+        tan2 = _fused_round(tangent * tangent, qn_tan2, x, y, a, b, decimals)
+        tan2_sin = _fused_round((tangent * tangent) * sine, qn_tan2_sin, x, y, a, b, decimals)
+    if sine == 0:
+        cot2 = cot2_cos = float('inf')  # cot²(θ) is undefined when tan(θ) is 0
+    else:
+        cotangent = cosine / sine
+        cot2 = _fused_round(cotangent * cotangent, qn_cot2, x, y, a, b, decimals)
+        cot2_cos = _fused_round((cotangent * cotangent) * cosine, qn_cot2_cos, x, y, a, b, decimals)
+    return tan2, cot2, tan2_sin, cot2_cos
+
+def _fused_round(value, qn_func, x, y, a, b, decimals):
+    # sin/cos can differ from tan in the last bit, so values that could round differently are recomputed directly
+    if near_rounding_boundary(value, decimals):
+        return qn_func(x, y, a, b, decimals)
+    return round_to_limits(value, decimals)
+
+def near_rounding_boundary(value, decimals=2, tolerance=1e-12):
+    # True if round_to_limits(value, decimals) could change under a relative error of about tolerance in value
+    if not -1e300 < value < 1e300:
+        return True  # ±∞, nan or close to overflowing
+    magnitude = abs(value)
+    if abs(magnitude - 1e-10) <= tolerance * 1e-10 or abs(magnitude - 1e10) <= tolerance * 1e10:
+        return True
+    if magnitude > 1e10:
+        return False  # Beyond the ±∞ thresholds the rounding no longer depends on the last bits
+    scaled = value * 10 ** decimals
+    return abs(scaled) >= 2 ** 52 or (magnitude >= 1e-10 and abs(abs(scaled - trunc(scaled)) - 0.5) <= tolerance * abs(scaled))
+
+# Derivatives of Qn.
+# The closed forms from the halting_machine docstring, evaluated from one sine and one cosine:
+# d/dθ tan²(θ) = 2tan(θ)⋅(1+tan²(θ)), d/dθ cot²(θ) = -2cot(θ)⋅(1+cot²(θ)),
+# d/dθ(tan²(θ)⋅sin(θ)) = 2tan(θ)⋅(1+tan²(θ))⋅sin(θ) + tan²(θ)⋅cos(θ), d/dθ(cot²(θ)⋅cos(θ)) = -2cot(θ)⋅(1+cot²(θ))⋅cos(θ) - cot²(θ)⋅sin(θ),
+# times ∂θ/∂x = π/a, ∂θ/∂y = -π/b, ∂θ/∂a = -xπ/a² or ∂θ/∂b = yπ/b² by the chain rule.
+# They keep the conventions of the models: ±∞ at the model's poles (-∞ where qn_phase_table has -∞), exact slopes at
+# multiples of π/4 for rational phases, exact reduction of large phases, and round_to_limits on the result.
+qn_slope_table = [
+    (0.0, float('inf'), 0.0, float('inf')),
+    (4.0, -4.0, 5 * sqrt(2) / 2, -5 * sqrt(2) / 2),
+    (float('inf'), 0.0, float('inf'), 0.0),
+    (-4.0, 4.0, -5 * sqrt(2) / 2, -5 * sqrt(2) / 2),
+    (0.0, float('inf'), 0.0, float('-inf')),
+    (4.0, -4.0, -5 * sqrt(2) / 2, 5 * sqrt(2) / 2),
+    (float('inf'), 0.0, float('-inf'), 0.0),
+    (-4.0, 4.0, 5 * sqrt(2) / 2, 5 * sqrt(2) / 2),
+]
+
+def qn_slope(model, sine, cosine):
+    # d/dθ of model 0 .. 3 (in qn_fused's output order) from sin(θ) and cos(θ), +∞ at the model's poles
+    if model in (0, 2):
+        if cosine == 0:
+            return float('inf')  # tan(θ) is undefined when cos(θ) is 0
+        tangent = sine / cosine
+        slope = 2 * tangent * (1 + tangent * tangent)
+        return slope if model == 0 else (slope * sine) + (tangent * tangent * cosine)
+    if sine == 0:
+        return float('inf')  # cot(θ) is undefined when sin(θ) is 0
+    cotangent = cosine / sine
+    slope = -2 * cotangent * (1 + cotangent * cotangent)
+    return slope if model == 1 else (slope * cosine) - (cotangent * cotangent * sine)
+
+def qn_phase_slope(name, x=0, y=0, a=1, b=1):
+    # d/dθ of the Qn model name at θ(x, y, a, b), from the exact table on multiples of π/4
+    model = list(qn_periods).index(name)
+    k, argument = qn_argument(x, y, a, b, qn_periods[name])
+    if k is not None:
+        return qn_slope_table[k][model]
+    return qn_slope(model, sin(argument), cos(argument))
+
+def phase_partials(x=0, y=0, a=1, b=1):
+    # Returns (∂θ/∂x, ∂θ/∂y, ∂θ/∂a, ∂θ/∂b) for θ = ((xπ)/a) - ((yπ)/b)
+    return pi / a, -(pi / b), -((x * pi) / a) / a, ((y * pi) / b) / b
+
+def qn_gradient(x=0, y=0, a=1, b=1, decimals=2, name='qn_tan2'):
+    # Returns (∂Qn/∂x, ∂Qn/∂y, ∂Qn/∂a, ∂Qn/∂b) for the Qn model name, all four from one sin/cos evaluation
+    slope = qn_phase_slope(name, x, y, a, b)
+    if slope in (float('inf'), float('-inf')):
+        return (slope,) * 4  # At a pole of Qn, like the model itself
+    return tuple(round_to_limits(slope * partial, decimals) for partial in phase_partials(x, y, a, b))
+
+def qn_partial(name, x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    # Returns ∂Qn/∂wrt for the Qn model name, with wrt one of 'x', 'y', 'a' or 'b'
+    if wrt not in ('x', 'y', 'a', 'b'):
+        raise ValueError(f"Cannot differentiate with respect to {wrt!r}, expected 'x', 'y', 'a' or 'b'.")
+    slope = qn_phase_slope(name, x, y, a, b)
+    if slope in (float('inf'), float('-inf')):
+        return slope
+    return round_to_limits(slope * phase_partials(x, y, a, b)['xyab'.index(wrt)], decimals)
+
+def d_qn_tan2(x=0, y=0, a=2, b=2, wrt='x', decimals=2):
+    # Returns ∂/∂wrt tan²(θ) = 2tan(θ)⋅(1+tan²(θ))⋅∂θ/∂wrt
+    return qn_partial('qn_tan2', x, y, a, b, wrt, decimals)
+
+def d_qn_cot2(x=0, y=0, a=2, b=2, wrt='x', decimals=2):
+    # Returns ∂/∂wrt cot²(θ) = -2cot(θ)⋅(1+cot²(θ))⋅∂θ/∂wrt
+    return qn_partial('qn_cot2', x, y, a, b, wrt, decimals)
+
+def d_qn_tan2_sin(x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    # Returns ∂/∂wrt tan²(θ)⋅sin(θ) = (2tan(θ)⋅(1+tan²(θ))⋅sin(θ) + tan²(θ)⋅cos(θ))⋅∂θ/∂wrt
+    return qn_partial('qn_tan2_sin', x, y, a, b, wrt, decimals)
+
+def d_qn_cot2_cos(x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    # Returns ∂/∂wrt cot²(θ)⋅cos(θ) = (-2cot(θ)⋅(1+cot²(θ))⋅cos(θ) - cot²(θ)⋅sin(θ))⋅∂θ/∂wrt
+    return qn_partial('qn_cot2_cos', x, y, a, b, wrt, decimals)
+
 # Testing defs with preset constants for Qn.
 # These initialize the starting point, phase shift and frequency.
 # Trigonometric Qn Functions with (0 ≤ z ≤ 1)
-def qn_tan2_arctan_const(x=0, y=-1, a=2, b=2):
-    return qn_tan2(x, y, a, b)
+def qn_tan2_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_tan2(x, y, a, b, decimals)
 
-def qn_cot2_arctan_const(x=0, y=0, a=2, b=2):
-    return qn_cot2(x, y, a, b)
+def qn_cot2_arctan_const(x=0, y=0, a=2, b=2, decimals=2):
+    return qn_cot2(x, y, a, b, decimals)
 
 # Compositional Trigonometric Qn Functions with (0 ≤ z ≤ 1)
-def qn_tan2_sin_sigmoid_const(x=0, y=-.5, a=1, b=1):
-    return qn_tan2_sin(x, y, a, b)
+def qn_tan2_sin_sigmoid_const(x=0, y=-.5, a=1, b=1, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
 
-def qn_cot2_cos_sigmoid_const(x=0, y=0, a=1, b=1):
-    return qn_cot2_cos(x, y, a, b)
+def qn_cot2_cos_sigmoid_const(x=0, y=0, a=1, b=1, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
 
 # Compositional Trigonometric Qn Functions with (-1 ≤ z ≤ 1)
-def qn_tan2_sin_arctan_const(x=0, y=-2, a=2, b=2):
-    return qn_tan2_sin(x, y, a, b)
-
-def qn_cot2_cos_arctan_const(x=0, y=-1, a=2, b=2):
-    return qn_cot2_cos(x, y, a, b)
+def qn_tan2_sin_arctan_const(x=0, y=-2, a=2, b=2, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
+
+# Trigonometric models for H and Q
+halting_models = [
+    (h_sigmoid, qn_tan2_sin_sigmoid_const, "H Sigmoid with Qn = tan²(θ)⋅sin(θ)"),
+    (h_sigmoid, qn_cot2_cos_sigmoid_const, "H Sigmoid with Qn = cot²(θ)⋅cos(θ)"),
+    (h_arctan, qn_tan2_arctan_const, "H Arctan with Qn = tan²(θ)"),
+    (h_arctan, qn_cot2_arctan_const, "H Arctan with Qn = cot²(θ)"),
+    (h_arctan, qn_tan2_sin_arctan_const, "H Arctan with Qn = tan²(θ)⋅sin(θ)"),
+    (h_arctan, qn_cot2_cos_arctan_const, "H Arctan with Qn = cot²(θ)⋅cos(θ)")
+]
 
 # The Halting Machine H(Qn).
-def halting_machine(x_values = [-1, 0, 1], depth = 3):
+def halting_machine(x_values = [-1, 0, 1], depth = 3, approximate = False):
     print(f"The Halting Machine H(Qn)")
     """
     The halting_machine function explores recursive applications of H mappings (sigmoid and arctan) to three models of Qn functions.
@@ -331,27 +556,22 @@ def halting_machine(x_values = [-1, 0, 1], depth = 3):
     This formulation allows us to extend the concept of cyclical or periodic logic to hypercomplex numbers and into higher-dimensional spaces.
     """
 
-    # Trigonometric models for H and Q
-    functions = [
-        (h_sigmoid, qn_tan2_sin_sigmoid_const, "H Sigmoid with Qn = tan²(θ)⋅sin(θ)"),
-        (h_sigmoid, qn_cot2_cos_sigmoid_const, "H Sigmoid with Qn = cot²(θ)⋅cos(θ)"),
-        (h_arctan, qn_tan2_arctan_const, "H Arctan with Qn = tan²(θ)"),
-        (h_arctan, qn_cot2_arctan_const, "H Arctan with Qn = cot²(θ)"),
-        (h_arctan, qn_tan2_sin_arctan_const, "H Arctan with Qn = tan²(θ)⋅sin(θ)"),
-        (h_arctan, qn_cot2_cos_arctan_const, "H Arctan with Qn = cot²(θ)⋅cos(θ)")
-    ]
-    # Trigonometric recursion
-    for x in x_values:
-        print(f"\nEvaluating functions for x = {x}:")
-        for h_func, qn_func, description in functions:
-            print(f"\n{description}:")
-            current_x = x
-            for i in range(1, depth + 1):
-                result = h_func(qn_func(current_x))
-                # Print the function names and the current value of x being evaluated
-                print(f"Iteration {i} with {h_func.__name__}({qn_func.__name__}({current_x})): Result = {result}")
-                current_x = result
-        print("")
+    # Trigonometric recursion, evaluated for every x and model at once by the batched engine
+    # With approximate=True the engine uses the h_approx lookup tables (see h_approx.error_bound for their accuracy)
+    from h_engine import run_halting_machine, print_halting_machine
+    x_values = list(x_values)
+    results = run_halting_machine(x_values, depth, approximate=approximate)
+    # Print the function names and the current value of x being evaluated
+    print_halting_machine(results, x_values)
+
+# The Halting Machine H(Qn) at any recursive depth.
+def halting_cycles(x_values = [-1, 0, 1], depth = 3):
+    print(f"The Halting Machine H(Qn) at depth {depth}")
+    # Each orbit is cycle-checked once, so the result at depth 10⁹ costs the same as at depth 3
+    from h_engine import halting_orbits, format_halting_cycles
+    orbits = halting_orbits(x_values)
+    for line in format_halting_cycles(orbits, depth):
+        print(line)
 
 # Complex Logic.
 def complex_logic(p, q, operator, operation):
@@ -417,12 +637,14 @@ def test():
     halting_machine(x_values, depth)
     complex_coinflip(True, True)
 
+import os
 import sys
 def blackboard(command, args): # Command line interface.
     function_map = {
         "halt": halt,
         "loop": loop,
         "q_inverse": q_inverse,
+        "q_inverse_n": q_inverse_n,
         "h_arctan": h_arctan,
         "h_sigmoid": h_sigmoid,
         "qn_tan2": qn_tan2,
@@ -430,16 +652,42 @@ def blackboard(command, args): # Command line interface.
         "qn_tan2_sin": qn_tan2_sin,
         "qn_cot2_cos": qn_cot2_cos,
         "halting_machine": halting_machine,
+        "halting_cycles": halting_cycles,
         "complex_logic": complex_logic,
         "complex_coinflip": complex_coinflip,
     }
+    # Qn models compiled and registered with h_model run like the built-in ones
+    from h_model import registry
+    for name, model in registry.items():
+        function_map.setdefault(name, model.scalar)
     func = function_map.get(command)
     if not func:
         print("Unknown command.")
         return
     prepared_args = []
-    if func == halting_machine:
-        # Handling for halting_machine: expects a list of numbers followed by '--' and then a depth
+    if func in (halting_machine, halting_cycles):
+        # Optional '--format csv|jsonl|binary' and '--output path' write lossless records instead of printing
+        output_format, output_path = None, None
+        # Optional '--approx' runs halting_machine on the h_approx lookup tables
+        approximate = '--approx' in args
+        args = [arg for arg in args if arg != '--approx']
+        if approximate and func != halting_machine:
+            print("Error: '--approx' is only supported for halting_machine.")
+            return
+        while '--format' in args or '--output' in args:
+            option = '--format' if '--format' in args else '--output'
+            option_index = args.index(option)
+            if option_index + 1 >= len(args):
+                print(f"Error: Missing value after '{option}'.")
+                return
+            if option == '--format':
+                output_format = args[option_index + 1]
+            else:
+                output_path = args[option_index + 1]
+            args = args[:option_index] + args[option_index + 2:]
+        if output_path and not output_format:
+            output_format = 'csv'
+        # Handling for halting_machine and halting_cycles: expects a list of numbers followed by '--' and then a depth
         if '--' not in args:
             print("Error: Missing separator '--' between x_values and depth.")
             return
@@ -459,6 +707,18 @@ def blackboard(command, args): # Command line interface.
             print("Ensure all x_values are valid numbers and depth is an integer.")
             return
         prepared_args = [x_values, depth]
+        if output_format:
+            if func != halting_machine:
+                print("Error: '--format' is only supported for halting_machine.")
+                return
+            from h_io import writers, write_halting_machine
+            if output_format not in writers:
+                print(f"Error: Unknown format '{output_format}', expected one of {', '.join(writers)}.")
+                return
+            write_halting_machine(x_values, depth, output_format, output_path, approximate=approximate)
+            return
+        if approximate:
+            prepared_args.append(True)
     elif func == complex_logic:
         # Handling for complex_logic: expects two Booleans and two strings
         if len(args) >= 4:
@@ -489,12 +749,35 @@ def blackboard(command, args): # Command line interface.
     print(result)
 
 def main():
-    if len(sys.argv) > 1: # Call function if arguments are provided
-        command = sys.argv[1]
-        args = sys.argv[2:]
-        blackboard(command, args)
+    argv = sys.argv[1:]
+    # '--cache' (or the HALTING_CACHE environment variable) serves repeated calls from a persistent result cache
+    use_cache = '--cache' in argv or bool(os.environ.get('HALTING_CACHE'))
+    argv = [arg for arg in argv if arg != '--cache']
+    # '--models path' (or the HALTING_MODELS environment variable) registers the Qn models defined in a JSON file
+    from h_model import load_models, load_environment
+    try:
+        load_environment()
+        while '--models' in argv:
+            option_index = argv.index('--models')
+            if option_index + 1 >= len(argv):
+                print("Error: Missing value after '--models'.")
+                return
+            load_models(argv[option_index + 1])
+            argv = argv[:option_index] + argv[option_index + 2:]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading models: {e}")
+        return
+    if argv: # Call function if arguments are provided
+        command = argv[0]
+        args = argv[1:]
+        if use_cache:
+            from h_cache import cached_blackboard
+            cached_blackboard(command, args)
+        else:
+            blackboard(command, args)
     else:
         test()  # Default behavior if no arguments are provided
 
 if __name__ == "__main__":
+    sys.modules.setdefault("h", sys.modules[__name__])  # Sibling modules import h, so share this module with them
     main()
\ No newline at end of file
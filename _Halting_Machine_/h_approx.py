@@ -0,0 +1,244 @@
+from array import array
+from collections import namedtuple
+from math import pi, sin, atan, exp, sqrt, isfinite
+import h
+import h_array
+# Approximate (lookup-table) evaluation of the Qn and H functions, for visualization and rough sweeps.
+# Every table is sampled on a uniform grid and read back by linear interpolation, whose error on a grid of step s is at most
+# s²/8⋅max|f''|. Each table records that bound, plus margins for argument reduction and floating point rounding, in 'error'.
+# The Qn models share one sine table over the fundamental period [0, 2π), read at θ and θ + π/2 for sin and cos.
+# Within POLE_WINDOW of a pole (|cos θ| for tan², |sin θ| for cot²) the models are evaluated exactly instead.
+# Outside the window the error of the derived model follows from the sin/cos error in closed form (see error_bound).
+# h_arctan uses a table over [0, 1] with atan(u) = π/2 - atan(1/u) beyond it; h_sigmoid uses a table over
+# [0, SIGMOID_CUTOFF] with σ(-z) = 1 - σ(z), and 0 or 1 beyond the cutoff (instead of raising OverflowError like h.py).
+# The functions mirror h_array's signatures, so h_engine can run the Halting Machine on them (approximate=True).
+
+# Grid intervals per table.
+TABLE_SIZE = 1 << 16
+
+# Points with |cos θ| (tan² models) or |sin θ| (cot² models) below this are evaluated exactly.
+POLE_WINDOW = 0.05
+
+# |θ| beyond which the float reduction modulo 2π is no longer accurate enough; such points are evaluated exactly.
+PHASE_LIMIT = 2.0 ** 20
+
+# σ(z) is taken as 0 or 1 beyond this |z|; e^-40 is far below the interpolation error.
+SIGMOID_CUTOFF = 40.0
+
+_ULP = 2.0 ** -52
+
+# values are the samples and slopes their forward differences, so interpolation is values[i] + t⋅slopes[i].
+ApproxTable = namedtuple('ApproxTable', ['name', 'start', 'step', 'values', 'slopes', 'error'])
+
+_tables = {}
+
+def _sample(func, start, step, count):
+    # (values, slopes) of func on the grid start + i⋅step
+    values = array('d', (func(start + i * step) for i in range(count)))
+    slopes = array('d', (values[i + 1] - values[i] for i in range(count - 1)))
+    slopes.append(0.0)
+    if h_array.np is not None:
+        np = h_array.np
+        return np.frombuffer(values, dtype=np.float64), np.frombuffer(slopes, dtype=np.float64)
+    return values, slopes
+
+def sine_table(size=TABLE_SIZE):
+    """sin over [0, 2π) in size intervals, with a quarter period of overlap so cos reads the same table."""
+    if ('sin', size) not in _tables:
+        step = 2 * pi / size
+        # Interpolation, then the reduction of |θ| ≤ PHASE_LIMIT by fl(2π) ≈ 2π - 2.45e-16, then rounding in the table and lerp
+        error = step * step / 8 + PHASE_LIMIT / (2 * pi) * 2.45e-16 + 16 * _ULP
+        _tables[('sin', size)] = ApproxTable('sin', 0.0, step, *_sample(sin, 0.0, step, size + size // 4 + 2), error)
+    return _tables[('sin', size)]
+
+def arctan_table(size=TABLE_SIZE):
+    """(2/π)⋅atan(u) over [0, 1] in size intervals."""
+    if ('arctan', size) not in _tables:
+        step = 1 / size
+        error = step * step / 8 * (2 / pi) * (3 * sqrt(3) / 8) + 8 * _ULP
+        _tables[('arctan', size)] = ApproxTable('arctan', 0.0, step, *_sample(lambda u: atan(u) * (2 / pi), 0.0, step, size + 2), error)
+    return _tables[('arctan', size)]
+
+def sigmoid_table(size=TABLE_SIZE, cutoff=SIGMOID_CUTOFF):
+    """1/(1 + e^-z) over [0, cutoff] in size intervals."""
+    if ('sigmoid', size) not in _tables:
+        step = cutoff / size
+        error = step * step / 8 / (6 * sqrt(3)) + exp(-cutoff) + 8 * _ULP
+        _tables[('sigmoid', size)] = ApproxTable('sigmoid', 0.0, step, *_sample(lambda z: 1 / (1 + exp(-z)), 0.0, step, size + 2), error)
+    return _tables[('sigmoid', size)]
+
+def error_bound(name, pole_window=POLE_WINDOW, size=TABLE_SIZE):
+    """Certified bound on |approximate - exact| for a function's value before round_to_limits.
+    After rounding to decimals places, results are within error_bound + 10^-decimals of h.py."""
+    name = getattr(name, '__name__', name)
+    if name.startswith('h_arctan'):
+        return arctan_table(size).error
+    if name.startswith('h_sigmoid'):
+        return sigmoid_table(size).error
+    e = sine_table(size).error
+    # |ŝ - s|, |ĉ - c| ≤ e with |denominator| ≥ δ: the error of ŝᵖ/ĉ² is largest at |numerator| = 1, |denominator| = δ
+    power = 3 if name.startswith(('qn_tan2_sin', 'qn_cot2_cos')) else 2
+    worst = (1 + e) ** power / (pole_window - e) ** 2
+    return worst - 1 / pole_window ** 2 + 8 * _ULP * worst
+
+def _lerp(table, t):
+    # Scalar linear interpolation at grid coordinate t (0 ≤ t ≤ size)
+    i = int(t)
+    return table.values[i] + (t - i) * table.slopes[i]
+
+def _lerp_vector(table, t, offset=0):
+    # Vectorized linear interpolation at grid coordinates t ≥ 0, shifted by a whole number of intervals
+    i = t.astype(h_array.np.intp)  # Truncation is floor for t ≥ 0
+    fraction = t - i
+    if offset:
+        i += offset
+    return table.values[i] + fraction * table.slopes[i]
+
+def _sincos(table, theta):
+    # sin and cos of θ from the shared table: cos θ = sin(θ + π/2) is a quarter of the table further on
+    size = round(2 * pi / table.step)
+    if h_array._use_numpy():
+        t = h_array.np.mod(theta, 2 * pi) * (1 / table.step)
+        return _lerp_vector(table, t), _lerp_vector(table, t, size // 4)
+    t = (theta % (2 * pi)) / table.step
+    return _lerp(table, t), _lerp(table, t + size // 4)
+
+def _qn_raw(name, s, c):
+    if name == 'qn_tan2':
+        return (s * s) / (c * c), c
+    if name == 'qn_cot2':
+        return (c * c) / (s * s), s
+    if name == 'qn_tan2_sin':
+        return ((s * s) / (c * c)) * s, c
+    return ((c * c) / (s * s)) * c, s
+
+def _qn(name, x, y, a, b, decimals):
+    table = sine_table()
+    bound = POLE_WINDOW + table.error  # |ĉ| ≥ δ + e guarantees |c| ≥ δ
+    if not h_array._use_numpy():
+        results = array('d')
+        for x, y, a, b in zip(*h_array._sequences(x, y, a, b)):
+            results.append(_qn_scalar(name, x, y, a, b, decimals, table, bound))
+        return results
+    if h_array._rational_mode(x, y, a, b) is not None:
+        return getattr(h_array, name)(x, y, a, b, decimals)  # Exact rational phases are table lookups already
+    np = h_array.np
+    x, y, a, b = h_array._operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        theta = ((x * pi) / a) - ((y * pi) / b)
+        s, c = _sincos(table, np.where(np.abs(theta) <= PHASE_LIMIT, theta, 0.0))
+        raw, denominator = _qn_raw(name, s, c)
+    result = h_array._round(raw, decimals)
+    exact = ~(np.abs(theta) <= PHASE_LIMIT) | (np.abs(denominator) < bound) | h_array._divides(a, b)
+    if exact.any():
+        result[exact] = getattr(h_array, name)(x[exact], y[exact], a[exact], b[exact], decimals)
+    return result
+
+def _qn_scalar(name, x, y, a, b, decimals, table, bound):
+    if a == 0 or b == 0 or h.rational_phase(x, y, a, b) is not None:
+        return getattr(h, name)(x, y, a, b, decimals)
+    theta = ((x * pi) / a) - ((y * pi) / b)
+    if not abs(theta) <= PHASE_LIMIT:
+        return getattr(h, name)(x, y, a, b, decimals)
+    raw, denominator = _qn_raw(name, *_sincos(table, theta))
+    if abs(denominator) < bound:
+        return getattr(h, name)(x, y, a, b, decimals)
+    return h.round_to_limits(raw, decimals)
+
+def _h_scalar(name, u, decimals):
+    # (2/π)⋅atan(u) or σ(u) from its table, using the odd/complementary symmetry for negative u
+    if name == 'h_arctan':
+        table = arctan_table()
+        if not isfinite(u):
+            value = u if u != u else 1.0
+        elif abs(u) <= 1:
+            value = _lerp(table, abs(u) / table.step)
+        else:
+            value = 1 - _lerp(table, (1 / abs(u)) / table.step)
+        return h.round_to_limits(value if u >= 0 else -value, decimals)
+    table = sigmoid_table()
+    if u != u:
+        return u
+    magnitude = abs(u)
+    value = 1.0 if magnitude > SIGMOID_CUTOFF else _lerp(table, magnitude / table.step)
+    return h.round_to_limits(value if u >= 0 else 1 - value, decimals)
+
+def _h(name, u, args, decimals):
+    if not h_array._use_numpy():
+        return array('d', (_h_scalar(name, value, decimals) for value in u))
+    np = h_array.np
+    with np.errstate(all='ignore'):
+        magnitude = np.where(np.isnan(u), 0.0, np.abs(u))  # nan is passed through below
+        if name == 'h_arctan':
+            table = arctan_table()
+            outer = magnitude > 1
+            value = _lerp_vector(table, np.where(outer, 1 / magnitude, magnitude) * (1 / table.step))  # 1/∞ reads atan(0)
+            value = np.where(outer, 1 - value, value)
+            value = np.where(u >= 0, value, -value)
+        else:
+            table = sigmoid_table()
+            value = np.where(magnitude > SIGMOID_CUTOFF, 1.0, _lerp_vector(table, np.minimum(magnitude, SIGMOID_CUTOFF) * (1 / table.step)))
+            value = np.where(u >= 0, value, 1 - value)
+        value = np.where(np.isnan(u), u, value)
+    result = h_array._round(value, decimals)
+    x, y, a, b = args
+    divides = h_array._divides(a, b) if name == 'h_arctan' else np.zeros(result.shape, dtype=bool)
+    if divides.any():
+        result[divides] = h_array.h_arctan(x[divides], y[divides], a[divides], b[divides], decimals)  # Raises like h.py
+    return result
+
+# Definition of the function H.
+def h_arctan(x=0, y=0, a=1, b=1, decimals=2):
+    """Approximate h.h_arctan, within error_bound('h_arctan') before rounding."""
+    if not h_array._use_numpy():
+        return array('d', (h.h_arctan(x, y, a, b, decimals) if a == 0 or b == 0 else _h_scalar('h_arctan', (x / a) - (y / b), decimals)
+                           for x, y, a, b in zip(*h_array._sequences(x, y, a, b))))
+    args = h_array._operands(x, y, a, b)
+    x, y, a, b = args
+    with h_array.np.errstate(all='ignore'):
+        return _h('h_arctan', (x / a) - (y / b), args, decimals)
+
+def h_sigmoid(x=0, y=0, a=1, b=1, decimals=2):
+    """Approximate h.h_sigmoid, within error_bound('h_sigmoid') before rounding."""
+    if not h_array._use_numpy():
+        return array('d', (_h_scalar('h_sigmoid', (x * a) + (y * b), decimals) for x, y, a, b in zip(*h_array._sequences(x, y, a, b))))
+    args = h_array._operands(x, y, a, b)
+    x, y, a, b = args
+    with h_array.np.errstate(all='ignore'):
+        return _h('h_sigmoid', (x * a) + (y * b), args, decimals)
+
+# Qn models.
+def qn_tan2(x=0, y=0, a=2, b=2, decimals=2):
+    """Approximate h.qn_tan2, within error_bound('qn_tan2') before rounding."""
+    return _qn('qn_tan2', x, y, a, b, decimals)
+
+def qn_cot2(x=0, y=0, a=2, b=2, decimals=2):
+    """Approximate h.qn_cot2, within error_bound('qn_cot2') before rounding."""
+    return _qn('qn_cot2', x, y, a, b, decimals)
+
+def qn_tan2_sin(x=0, y=0, a=1, b=1, decimals=2):
+    """Approximate h.qn_tan2_sin, within error_bound('qn_tan2_sin') before rounding."""
+    return _qn('qn_tan2_sin', x, y, a, b, decimals)
+
+def qn_cot2_cos(x=0, y=0, a=1, b=1, decimals=2):
+    """Approximate h.qn_cot2_cos, within error_bound('qn_cot2_cos') before rounding."""
+    return _qn('qn_cot2_cos', x, y, a, b, decimals)
+
+# Testing defs with preset constants for Qn.
+def qn_tan2_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_tan2(x, y, a, b, decimals)
+
+def qn_cot2_arctan_const(x=0, y=0, a=2, b=2, decimals=2):
+    return qn_cot2(x, y, a, b, decimals)
+
+def qn_tan2_sin_sigmoid_const(x=0, y=-.5, a=1, b=1, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_sigmoid_const(x=0, y=0, a=1, b=1, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
+
+def qn_tan2_sin_arctan_const(x=0, y=-2, a=2, b=2, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
@@ -0,0 +1,504 @@
+from array import array
+from math import pi
+from numbers import Integral, Rational
+import h
+# Vectorized (array-in/array-out) versions of the scalar primitives in h.py.
+# Every function broadcasts x, y, a and b together, so a million-point sweep is a single call.
+# NumPy is used when it is installed, otherwise results are built with the standard library array module.
+# Both backends reproduce the scalar functions exactly, including their poles, ±∞ branches and rounding thresholds.
+try:
+    import numpy as np
+except ImportError:  # Pure Python fallback
+    np = None
+
+# 'numpy' or 'array'; may be switched to 'array' to force the pure Python path.
+BACKEND = 'numpy' if np is not None else 'array'
+
+# Relative distance from a rounding or threshold boundary inside which a NumPy result is re-evaluated with math.
+# This absorbs the last-ulp differences between NumPy's and libm's trig so results stay identical to h.py.
+_SLACK = 1e-12
+
+def _use_numpy():
+    return BACKEND == 'numpy' and np is not None
+
+def _operands(*args):
+    # Broadcast the scalar/sequence arguments against each other as float64 arrays
+    return np.broadcast_arrays(*[np.asarray(arg, dtype=np.float64) for arg in args])
+
+def _originals(*args):
+    # The arguments as given, for the scalar path: sequences become arrays of their own int or float dtype, or object
+    # arrays where they mix ints or Fractions with floats, so every element keeps the type h.py would receive
+    originals = []
+    for arg in args:
+        if hasattr(arg, '__len__') and not isinstance(arg, np.ndarray):
+            values = np.asarray(arg)
+            if values.dtype.kind == 'f' and isinstance(arg, (list, tuple)) and any(isinstance(v, Rational) for v in arg):
+                values = np.asarray(arg, dtype=object)
+            arg = values
+        originals.append(arg)
+    return originals
+
+def _element(arg, index, shape):
+    # Element index of an original argument broadcast to shape, as the Python object h.py receives
+    if not isinstance(arg, np.ndarray):
+        return arg
+    value = np.broadcast_to(arg, shape).flat[index]
+    return value.item() if isinstance(value, np.generic) else value
+
+def _sequences(*args):
+    # Broadcast for the array module fallback: scalars repeat, sequences must share one length
+    length = None
+    for arg in args:
+        if not isinstance(arg, (float, Rational)):
+            arg_length = len(arg)
+            if length is not None and arg_length != length:
+                raise ValueError(f"operands could not be broadcast together with lengths {length} and {arg_length}")
+            length = arg_length
+    if length is None:
+        length = 1
+    return [[arg] * length if isinstance(arg, (float, Rational)) else arg for arg in args]
+
+def _map(func, *args):
+    # Array module fallback: evaluate the scalar function element by element
+    return array('d', map(func, *_sequences(*args)))
+
+def as_list(values):
+    """Convert a result from either backend into a flat list of Python floats."""
+    if np is not None and isinstance(values, np.ndarray):
+        return values.ravel().tolist()
+    return list(values)
+
+def _suspect(raw, decimals=2, slack=_SLACK):
+    # Elements whose rounded value could change under a relative error of slack in raw, or that the scalar path would reject
+    with np.errstate(all='ignore'):
+        magnitude = np.abs(raw)
+        scaled = raw * (10.0 ** decimals)
+        distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+        suspect = ~np.isfinite(raw)
+        suspect |= np.abs(magnitude - 1e-10) <= slack * 1e-10
+        suspect |= np.abs(magnitude - 1e10) <= slack * 1e10
+        # Beyond the ±∞ thresholds the rounding no longer depends on the last bits
+        rounded = (magnitude >= 1e-10) & (magnitude <= 1e10)
+        suspect |= (distance <= slack * np.abs(scaled)) & rounded
+        suspect |= (np.abs(scaled) >= 2.0 ** 52) & rounded
+    return suspect
+
+def _round(raw, decimals=2):
+    # Round very small values to 0 and very large values to ±∞, otherwise round to decimals places
+    with np.errstate(all='ignore'):
+        scale = 10.0 ** decimals
+        result = np.rint(raw * scale) / scale
+    result = np.where(np.abs(raw) < 1e-10, 0.0, result)
+    result[raw > 1e10] = float('inf')
+    result[raw < -1e10] = float('-inf')
+    return result
+
+def _finish(raw, args, scalar, fixed=None, suspect=None, decimals=2):
+    # Round raw, apply the fixed (branch) values and recompute anything ambiguous with the scalar function, which gets
+    # the original arguments (see _originals)
+    result = _round(raw, decimals)
+    check = _suspect(raw, decimals)
+    if not 0 <= decimals <= 22:
+        check[...] = True
+    if suspect is not None:
+        check |= suspect
+    if fixed is not None:
+        for mask, value in fixed:
+            result[mask] = value[mask] if isinstance(value, np.ndarray) else value
+            check &= ~mask
+    for index in np.flatnonzero(check):
+        result.flat[index] = scalar(*[_element(arg, index, result.shape) for arg in args], decimals)
+    return result
+
+def _divides(a, b):
+    # Python raises ZeroDivisionError on x/0, NumPy does not, so route those elements to the scalar path
+    return (a == 0) | (b == 0)
+
+# Cleaning up decimal points.
+def round_to_limits(value, decimals=2):
+    """Vectorized h.round_to_limits with Python's exact round() semantics."""
+    if not _use_numpy() or not 0 <= decimals <= 22:
+        return array('d', (h.round_to_limits(v, decimals) for v in _sequences(value)[0]))
+    value = np.asarray(value, dtype=np.float64)
+    result = _round(value, decimals)
+    with np.errstate(all='ignore'):
+        scaled = value * (10.0 ** decimals)
+        distance = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+    # np.rint can only disagree with round() within a few ulps of a half, or once the scale exceeds 2⁵²
+    check = (distance <= 4 * np.spacing(np.abs(scaled))) | (np.abs(scaled) >= 2.0 ** 52)
+    check &= np.abs(value) >= 1e-10
+    check &= np.abs(value) <= 1e10
+    for index in np.flatnonzero(check):
+        result.flat[index] = round(float(value.flat[index]), decimals)
+    return result
+
+# Example of a function that always halts returning 0.
+def halt(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.halt, x, y, a, b, decimals)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return _scalar_points(lambda x, y, a, b: h.halt(x, y, a, b, decimals), x, y, a, b)
+    args = _originals(x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        raw = 0 * ((x * a) + (y * b))
+    return _finish(raw, args, h.halt, decimals=decimals)
+
+# Example of a function that always loops and returns ±∞.
+def loop(x=0, y=0, a=1, b=1):
+    if not _use_numpy():
+        return _map(h.loop, x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        total = (x * a) + (y * b)
+    return np.where(total > 0, float('inf'), np.where(total < 0, float('-inf'), 1.0))
+
+# Definition of the function Q.
+def q_inverse(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.q_inverse, x, y, a, b, decimals)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return _scalar_points(lambda x, y, a, b: h.q_inverse(x, y, a, b, decimals), x, y, a, b)
+    args = _originals(x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        zero = (x + y) == 0  # +∞ for zero input
+        infinite = ~zero & (np.isinf(x) | np.isinf(y))  # Division by ±∞ results in 0
+        raw = 1 / ((x * a) + (y * b))
+    return _finish(raw, args, h.q_inverse, fixed=[(zero, float('inf')), (infinite, 0.0)], decimals=decimals)
+
+# Steps q_inverse_n takes in lockstep before handing unsettled points to the scalar cycle search.
+_SETTLE_STEPS = 16
+
+def q_inverse_n(x=0, n=1, y=0, a=1, b=1, decimals=2):
+    """Vectorized h.q_inverse_n: q_inverse applied n times, n broadcast with the other arguments."""
+    if not _use_numpy():
+        return _map(h.q_inverse_n, x, n, y, a, b, decimals)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return np.asarray(np.frompyfunc(lambda x, n, y, a, b: h.q_inverse_n(x, n, y, a, b, decimals), 5, 1)(
+            *_originals(x, n, y, a, b)), dtype=np.float64)
+    originals = _originals(x, n, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    args = np.broadcast_arrays(x, np.asarray(n, dtype=np.int64), y, a, b)
+    shape = args[0].shape
+    x, n, y, a, b = [arg.reshape(-1) for arg in args]
+    if (n < 0).any():
+        raise ValueError("Depth n must be a non-negative integer.")
+    # q_inverse reads y, a and b (and x on the first step) as given, so int inputs keep h.py's exact products
+    x0, n0, y0, a0, b0 = [np.broadcast_to(arg, shape).reshape(-1) for arg in originals]
+    result = x.copy()
+    active = np.flatnonzero(n > 0)
+    previous, last = None, x0[active]
+    for step in range(1, _SETTLE_STEPS + 1):
+        if not active.size:
+            break
+        current = q_inverse(last, y0[active], a0[active], b0[active], decimals)
+        depth = n[active]
+        done = depth == step
+        result[active[done]] = current[done]
+        settled = ~done
+        if previous is not None:
+            # current repeats the value two steps back, so the orbit alternates between last and current from here
+            settled &= current.view(np.uint64) == previous.view(np.uint64)
+            odd = (depth[settled] - step) % 2 == 1
+            result[active[settled]] = np.where(odd, last[settled], current[settled])
+        else:
+            settled[...] = False
+        keep = ~(done | settled)
+        active, previous, last = active[keep], last[keep], current[keep]
+    for index in active:
+        result[index] = h.q_inverse_n(*[_element(arg, index, shape) for arg in originals], decimals)
+    return result.reshape(shape)
+
+# Definition of the function H.
+def h_arctan(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.h_arctan, x, y, a, b, decimals)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return _scalar_points(lambda x, y, a, b: h.h_arctan(x, y, a, b, decimals), x, y, a, b)
+    args = _originals(x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        raw = np.arctan((x / a) - (y / b)) * (2 / pi)
+    return _finish(raw, args, h.h_arctan, suspect=_divides(a, b), decimals=decimals)
+
+def h_sigmoid(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.h_sigmoid, x, y, a, b, decimals)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return _scalar_points(lambda x, y, a, b: h.h_sigmoid(x, y, a, b, decimals), x, y, a, b)
+    args = _originals(x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    with np.errstate(all='ignore'):
+        exponent = -((x * a) + (y * b))
+        power = np.exp(exponent)
+        raw = 1 / (1 + power)
+    # math.exp raises OverflowError on finite arguments that overflow, so let the scalar path do so
+    return _finish(raw, args, h.h_sigmoid, suspect=np.isinf(power) & np.isfinite(exponent), decimals=decimals)
+
+def _argument(x, y, a, b):
+    # θ = ((xπ)/a) - ((yπ)/b), evaluated in the same order as h.py
+    return ((x * pi) / a) - ((y * pi) / b)
+
+# Exact rational phases.
+# h.py evaluates a point exactly when its x, y, a and b are all ints or Fractions, answering multiples of π/4 from a table.
+# Integer arguments that fit comfortably in int64 are handled here with integer arithmetic on θ/π = (x⋅b - y⋅a)/(a⋅b);
+# anything else rational (Fractions, huge ints, lists mixing ints and floats) goes through the scalar functions point by point.
+
+# Bound on integer arguments for the int64 path, so 4⋅(x⋅b - y⋅a) cannot overflow.
+_EXACT_LIMIT = 1 << 29
+
+def _rational_mode(*args):
+    # None if h.py takes the float path at every point, 'integer' for small ints, 'scalar' for any other rational input
+    mode = 'integer'
+    for arg in args:
+        if isinstance(arg, float):
+            return None
+        if isinstance(arg, Rational):
+            if not isinstance(arg, Integral) or not -_EXACT_LIMIT < arg < _EXACT_LIMIT:
+                mode = 'scalar'
+            continue
+        if isinstance(arg, array):
+            if arg.typecode in 'fd':
+                return None
+            continue
+        try:
+            values = np.asarray(arg)
+        except (ValueError, OverflowError):
+            return None
+        if values.dtype.kind == 'f':
+            if isinstance(arg, (list, tuple)) and any(isinstance(v, Rational) for v in arg):
+                mode = 'scalar'  # ints mixed with floats: h.py still treats the int points exactly
+                continue
+            return None
+        if values.dtype.kind == 'O':
+            mode = 'scalar'
+        elif values.dtype.kind not in 'iub':
+            return None
+        elif values.size and np.abs(values.astype(np.float64)).max() >= _EXACT_LIMIT:
+            mode = 'scalar'
+    return mode
+
+def _quarter_turns(x, y, a, b):
+    # Integer path: (mask of points on a multiple of π/4, k with θ = kπ/4 mod 2π)
+    x, y, a, b = np.broadcast_arrays(*[np.asarray(arg, dtype=np.int64) for arg in (x, y, a, b)])
+    numerator = 4 * (x * b - y * a)
+    denominator = a * b
+    safe = np.where(denominator == 0, 1, denominator)
+    on_grid = (denominator != 0) & (numerator % safe == 0)
+    return on_grid, (numerator // safe) % 8
+
+def _large(x, y, a, b):
+    # Points h.py reduces exactly modulo the model's period (see h.large_phase); they take the scalar path
+    with np.errstate(all='ignore'):
+        finite = np.isfinite(x) & np.isfinite(y) & np.isfinite(a) & np.isfinite(b)
+        return finite & ((np.abs(x) >= h.REDUCTION_THRESHOLD * np.abs(a)) | (np.abs(y) >= h.REDUCTION_THRESHOLD * np.abs(b)))
+
+def _qn_scalar(x, y, a, b, decimals, names):
+    # Point by point through h.py, keeping each element's own int, Fraction or float type
+    args = [np.asarray(arg, dtype=object) if isinstance(arg, (list, tuple)) else arg for arg in (x, y, a, b)]
+    with np.errstate(all='ignore'):  # h.py's own float arithmetic (nan phases and the like) is not a NumPy warning
+        return [np.asarray(np.frompyfunc(getattr(h, name), 5, 1)(*args, decimals), dtype=np.float64) for name in names]
+
+# Fused Qn kernel.
+# The argument and its sine and cosine are computed once per point, and every requested Qn model is derived from them.
+# Elements where the sin/cos form could round differently from h.py's tan form are recomputed with the scalar model.
+qn_models = ('qn_tan2', 'qn_cot2', 'qn_tan2_sin', 'qn_cot2_cos')
+
+def _qn_kernel(x, y, a, b, decimals, names):
+    mode = _rational_mode(x, y, a, b)
+    if mode == 'scalar':
+        return _qn_scalar(x, y, a, b, decimals, names)
+    on_grid = None
+    if mode == 'integer':
+        on_grid, quarter = _quarter_turns(x, y, a, b)
+        if on_grid.all():
+            # Every point is an exact multiple of π/4: a pure table lookup, no trig at all
+            return [np.array([h.qn_table_value(k, qn_models.index(name), decimals) for k in range(8)])[quarter] for name in names]
+    args = _originals(x, y, a, b)
+    x, y, a, b = _operands(x, y, a, b)
+    results = []
+    with np.errstate(all='ignore'):
+        argument = _argument(x, y, a, b)
+        sine = np.sin(argument)
+        cosine = np.cos(argument)
+        # Division by zero raises in h.py, and large phases are reduced exactly there, so both go to the scalar model
+        direct = _divides(a, b) | _large(x, y, a, b)
+        if 'qn_tan2' in names or 'qn_tan2_sin' in names:
+            tangent = sine / cosine
+            tan2 = tangent * tangent
+        if 'qn_cot2' in names or 'qn_cot2_cos' in names:
+            cotangent = cosine / sine
+            cot2 = cotangent * cotangent
+        for name in names:
+            if name == 'qn_tan2':
+                raw, pole = tan2, cosine == 0  # +∞ where cot(θ) is 0
+            elif name == 'qn_cot2':
+                raw, pole = cot2, sine == 0  # +∞ where tan(θ) is 0
+            elif name == 'qn_tan2_sin':
+                raw, pole = tan2 * sine, cosine == 0
+            elif name == 'qn_cot2_cos':
+                raw, pole = cot2 * cosine, sine == 0
+            else:
+                raise ValueError(f"Unknown Qn model {name}.")
+            scalar = getattr(h, name)
+            fixed = [(pole & ~direct, float('inf'))]
+            if on_grid is not None:
+                table = np.array([h.qn_table_value(k, qn_models.index(name), decimals) for k in range(8)])
+                fixed = [(pole & ~direct & ~on_grid, float('inf')), (on_grid, table[quarter])]
+            results.append(_finish(raw, args, scalar, fixed=fixed, suspect=direct, decimals=decimals))
+    return results
+
+def qn_fused(x=0, y=0, a=1, b=1, decimals=2, names=qn_models):
+    """Evaluate several Qn models from one sin/cos pass, returning one array per name (all four by default)."""
+    if not _use_numpy():
+        outputs = [qn_models.index(name) for name in names]
+        columns = [array('d') for name in names]
+        for results in map(h.qn_fused, *_sequences(x, y, a, b, decimals)):
+            for column, output in zip(columns, outputs):
+                column.append(results[output])
+        return tuple(columns)
+    return tuple(_qn_kernel(x, y, a, b, decimals, names))
+
+# Qn tan²(θ) function
+def qn_tan2(x=0, y=0, a=2, b=2, decimals=2):
+    if not _use_numpy():
+        return _map(h.qn_tan2, x, y, a, b, decimals)
+    return _qn_kernel(x, y, a, b, decimals, ('qn_tan2',))[0]
+
+# Qn cot²(θ) function
+def qn_cot2(x=0, y=0, a=2, b=2, decimals=2):
+    if not _use_numpy():
+        return _map(h.qn_cot2, x, y, a, b, decimals)
+    return _qn_kernel(x, y, a, b, decimals, ('qn_cot2',))[0]
+
+def qn_tan2_sin(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.qn_tan2_sin, x, y, a, b, decimals)
+    return _qn_kernel(x, y, a, b, decimals, ('qn_tan2_sin',))[0]
+
+def qn_cot2_cos(x=0, y=0, a=1, b=1, decimals=2):
+    if not _use_numpy():
+        return _map(h.qn_cot2_cos, x, y, a, b, decimals)
+    return _qn_kernel(x, y, a, b, decimals, ('qn_cot2_cos',))[0]
+
+# Derivatives of Qn.
+# One sin/cos pass gives d/dθ of the model, which is multiplied by each requested ∂θ/∂x, ∂θ/∂y, ∂θ/∂a or ∂θ/∂b.
+# Poles are ±∞ as in h.py, and elements that could round differently are recomputed with h.qn_partial.
+
+def phase_slope(model, sine, cosine):
+    """Vectorized h.qn_slope: (d/dθ of model 0 .. 3 in qn_fused's output order, mask of the model's poles) from arrays of
+    sin θ and cos θ; the slope is not finite at the poles."""
+    with np.errstate(all='ignore'):
+        if model in (0, 2):
+            pole = cosine == 0  # tan(θ) is undefined when cos(θ) is 0
+            tangent = sine / cosine
+            slope = 2 * tangent * (1 + tangent * tangent)
+            if model == 2:
+                slope = (slope * sine) + (tangent * tangent * cosine)
+        else:
+            pole = sine == 0  # cot(θ) is undefined when sin(θ) is 0
+            cotangent = cosine / sine
+            slope = -2 * cotangent * (1 + cotangent * cotangent)
+            if model == 3:
+                slope = (slope * cosine) - (cotangent * cotangent * sine)
+    return slope, pole
+
+def _qn_slope(x, y, a, b, model):
+    # (original arguments, operands, d/dθ of model 0 .. 3 with its ±∞ at the poles, the pole mask, elements h.py evaluates
+    # directly) from one sin/cos pass
+    on_grid = None
+    if _rational_mode(x, y, a, b) == 'integer':
+        on_grid, quarter = _quarter_turns(x, y, a, b)
+    args = _originals(x, y, a, b)
+    operands = _operands(x, y, a, b)
+    x, y, a, b = operands
+    with np.errstate(all='ignore'):
+        argument = _argument(x, y, a, b)
+        slope, pole = phase_slope(model, np.sin(argument), np.cos(argument))
+    slope = np.where(pole, float('inf'), slope)
+    if on_grid is not None:
+        table = np.array([h.qn_slope_table[k][model] for k in range(8)])[quarter]
+        slope = np.where(on_grid, table, slope)
+        pole = np.where(on_grid, np.isinf(table), pole)
+    # Division by zero raises in h.py, and large phases are reduced exactly there, so both go to the scalar path
+    direct = _divides(a, b) | _large(x, y, a, b)
+    return args, operands, slope, pole, direct
+
+def _scalar_points(func, x, y, a, b):
+    # Point by point through a scalar function of (x, y, a, b), keeping each element's own int, Fraction or float type
+    args = [np.asarray(arg, dtype=object) if isinstance(arg, (list, tuple)) else arg for arg in (x, y, a, b)]
+    with np.errstate(all='ignore'):
+        return np.asarray(np.frompyfunc(func, 4, 1)(*args), dtype=np.float64)
+
+def _qn_partials(x, y, a, b, decimals, name, wrts):
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return [_scalar_points(lambda x, y, a, b, wrt=wrt: h.qn_partial(name, x, y, a, b, wrt, decimals), x, y, a, b) for wrt in wrts]
+    args, (x, y, a, b), slope, pole, direct = _qn_slope(x, y, a, b, qn_models.index(name))
+    results = []
+    with np.errstate(all='ignore'):
+        partials = dict(zip('xyab', (pi / a, -(pi / b), -((x * pi) / a) / a, ((y * pi) / b) / b)))
+        for wrt in wrts:
+            scalar = lambda x, y, a, b, decimals, wrt=wrt: h.qn_partial(name, x, y, a, b, wrt, decimals)
+            results.append(_finish(slope * partials[wrt], args, scalar, fixed=[(pole & ~direct, slope)], suspect=direct, decimals=decimals))
+    return results
+
+def qn_phase_slope(name, x=0, y=0, a=1, b=1):
+    """Vectorized h.qn_phase_slope: d/dθ of the Qn model name (unrounded), ±∞ at its poles."""
+    if not _use_numpy():
+        return _map(lambda x, y, a, b: h.qn_phase_slope(name, x, y, a, b), x, y, a, b)
+    if _rational_mode(x, y, a, b) == 'scalar':
+        return _scalar_points(lambda x, y, a, b: h.qn_phase_slope(name, x, y, a, b), x, y, a, b)
+    args, operands, slope, pole, direct = _qn_slope(x, y, a, b, qn_models.index(name))
+    for index in np.flatnonzero(direct):
+        slope.flat[index] = h.qn_phase_slope(name, *[_element(arg, index, slope.shape) for arg in args])
+    return slope
+
+def qn_gradient(x=0, y=0, a=1, b=1, decimals=2, name='qn_tan2'):
+    """Vectorized h.qn_gradient: arrays of ∂Qn/∂x, ∂Qn/∂y, ∂Qn/∂a and ∂Qn/∂b for the Qn model name, from one sin/cos pass."""
+    if not _use_numpy():
+        columns = [array('d') for wrt in 'xyab']
+        for results in map(lambda x, y, a, b: h.qn_gradient(x, y, a, b, decimals, name), *_sequences(x, y, a, b)):
+            for column, result in zip(columns, results):
+                column.append(result)
+        return tuple(columns)
+    return tuple(_qn_partials(x, y, a, b, decimals, name, 'xyab'))
+
+def qn_partial(name, x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    """Vectorized h.qn_partial: ∂Qn/∂wrt for the Qn model name, with wrt one of 'x', 'y', 'a' or 'b'."""
+    if wrt not in ('x', 'y', 'a', 'b'):
+        raise ValueError(f"Cannot differentiate with respect to {wrt!r}, expected 'x', 'y', 'a' or 'b'.")
+    if not _use_numpy():
+        return _map(lambda x, y, a, b: h.qn_partial(name, x, y, a, b, wrt, decimals), x, y, a, b)
+    return _qn_partials(x, y, a, b, decimals, name, (wrt,))[0]
+
+def d_qn_tan2(x=0, y=0, a=2, b=2, wrt='x', decimals=2):
+    return qn_partial('qn_tan2', x, y, a, b, wrt, decimals)
+
+def d_qn_cot2(x=0, y=0, a=2, b=2, wrt='x', decimals=2):
+    return qn_partial('qn_cot2', x, y, a, b, wrt, decimals)
+
+def d_qn_tan2_sin(x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    return qn_partial('qn_tan2_sin', x, y, a, b, wrt, decimals)
+
+def d_qn_cot2_cos(x=0, y=0, a=1, b=1, wrt='x', decimals=2):
+    return qn_partial('qn_cot2_cos', x, y, a, b, wrt, decimals)
+
+# Testing defs with preset constants for Qn.
+def qn_tan2_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_tan2(x, y, a, b, decimals)
+
+def qn_cot2_arctan_const(x=0, y=0, a=2, b=2, decimals=2):
+    return qn_cot2(x, y, a, b, decimals)
+
+def qn_tan2_sin_sigmoid_const(x=0, y=-.5, a=1, b=1, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_sigmoid_const(x=0, y=0, a=1, b=1, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
+
+def qn_tan2_sin_arctan_const(x=0, y=-2, a=2, b=2, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
@@ -0,0 +1,71 @@
+import sys
+import time
+import random
+import h
+import h_array
+# Benchmarks for the optimized evaluation paths.
+# Run with 'python h_bench.py [points]'; each benchmark prints what it measured.
+
+def count_trig_calls(func, *args):
+    """Call func(*args) with h.py's sin, cos and tan wrapped in counters, returning (result, calls)."""
+    calls = {"sin": 0, "cos": 0, "tan": 0}
+    originals = {name: getattr(h, name) for name in calls}
+    def counted(name):
+        def wrapper(argument):
+            calls[name] += 1
+            return originals[name](argument)
+        return wrapper
+    try:
+        for name in calls:
+            setattr(h, name, counted(name))
+        result = func(*args)
+    finally:
+        for name, original in originals.items():
+            setattr(h, name, original)
+    return result, calls
+
+def bench_fused(points=10**6):
+    """Compare the four separate Qn models against the fused kernel, in trig calls and in time."""
+    random.seed(0)
+    x_values = [random.uniform(-4, 4) for i in range(points)]
+    models = [getattr(h, name) for name in h_array.qn_models]
+    # Trig calls per point on the scalar path
+    separate = sum(sum(count_trig_calls(model, 0.3, -0.5, 1, 1)[1].values()) for model in models)
+    fused = sum(count_trig_calls(h.qn_fused, 0.3, -0.5, 1, 1)[1].values())
+    print(f"Trig calls per point: separate = {separate}, fused = {fused} ({separate / fused:.1f}x fewer)")
+    # Wall time on the vectorized path
+    start = time.perf_counter()
+    for name in h_array.qn_models:
+        getattr(h_array, name)(x_values, -0.5, 1, 1)
+    separate_time = time.perf_counter() - start
+    start = time.perf_counter()
+    h_array.qn_fused(x_values, -0.5, 1, 1)
+    fused_time = time.perf_counter() - start
+    print(f"{points} points ({h_array.BACKEND}): separate = {separate_time:.3f}s, fused = {fused_time:.3f}s ({separate_time / fused_time:.1f}x)")
+
+def bench_parallel(points=10**5, depth=10, workers=(1, 2, 4, 8)):
+    """Time the parallel sweep runner in process and thread mode against the serial batched engine."""
+    import os
+    import h_engine
+    import h_parallel
+    random.seed(0)
+    x_values = [random.uniform(-1, 1) for i in range(points)]
+    models = h.halting_models[2:]  # The arctan models accept every starting point without overflowing
+    start = time.perf_counter()
+    h_engine.run_halting_machine(x_values, depth, models)
+    serial = time.perf_counter() - start
+    print(f"{points} points x {depth} iterations on {os.cpu_count()} cores: serial = {serial:.3f}s")
+    for mode in ('process', 'thread'):
+        for count in workers:
+            start = time.perf_counter()
+            h_parallel.run_halting_machine_parallel(x_values, depth, models, workers=count, mode=mode)
+            elapsed = time.perf_counter() - start
+            print(f"  {mode} x {count}: {elapsed:.3f}s ({serial / elapsed:.2f}x)")
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    bench_fused(points)
+    bench_parallel(points // 10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import io
+import os
+import ast
+import json
+import sqlite3
+import hashlib
+from contextlib import redirect_stdout
+# Persistent result cache for the blackboard command line interface.
+# Each entry holds the text a blackboard call printed, keyed by the command, its normalized arguments and a hash of the
+# Halting Machine sources, so a repeated call from a script returns without recomputing in a fresh interpreter.
+# Entries live in an SQLite file and are evicted least recently used first once the file holds more than max_bytes;
+# a trigger-maintained total and the index on 'used' keep each put independent of the number of entries.
+# The source hash covers only the modules the command runs through (h.py, h_model and the command's own modules, with
+# every sibling module they import), so editing or adding an unrelated h_*.py module keeps the cache warm.
+# Editing one of those modules or the registered models changes the hash, so older entries are never hit; they are
+# kept, since switching back (say between two --models files) hits them again, and age out through the LRU eviction.
+# Enable it with 'python h.py --cache <command> ...' or by setting HALTING_CACHE to the path of the cache file.
+
+# Environment variable naming the cache file; setting it enables the cache for every call.
+CACHE_ENV = 'HALTING_CACHE'
+
+# Cache file used by --cache when HALTING_CACHE is not set.
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'halting_machine.sqlite')
+
+# Upper bound on the total size of cached output, in bytes.
+MAX_CACHE_BYTES = 1 << 26
+
+# Least recently used entries read from the 'used' index per eviction query.
+EVICT_BATCH = 64
+
+# Modules blackboard imports for a command besides h_model, which every command imports to look up registered models.
+COMMAND_MODULES = {
+    "halting_machine": ("h_engine",),
+    "halting_cycles": ("h_engine",),
+}
+
+def _imports(source):
+    # Top-level names of every module a source imports, at any depth (function-level imports included)
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return names
+
+def command_modules(command):
+    """Sibling modules a blackboard command runs through, before following their imports."""
+    return ("h", "h_model") + COMMAND_MODULES.get(command, ())
+
+def source_hash(directory=None, modules=("h", "h_model")):
+    """SHA256 of the given sibling modules and every sibling module they import, in name order."""
+    if directory is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+    sources, pending = {}, list(modules)
+    while pending:
+        name = pending.pop()
+        path = os.path.join(directory, name + '.py')
+        if name in sources or not os.path.exists(path):
+            continue  # Standard library and third-party modules are not hashed
+        with open(path, 'rb') as f:
+            sources[name] = f.read()
+        if name != 'h':  # h.py's imports are blackboard's per-command ones, listed in COMMAND_MODULES
+            pending.extend(_imports(sources[name]))
+    digest = hashlib.sha256()
+    for name in sorted(sources):
+        digest.update(name.encode() + b'.py\0')
+        digest.update(hashlib.sha256(sources[name]).digest())
+    return digest.hexdigest()
+
+def normalize_args(args):
+    """Spell every numeric argument the way blackboard parses it, so '2.50' and '2.5' share an entry but '1' and '1.0' do not."""
+    normalized = []
+    for arg in args:
+        try:
+            # blackboard reads an argument as a float if it contains '.' or 'e', otherwise as an int
+            if '.' in arg or 'e' in arg.lower():
+                arg = repr(float(arg))
+            else:
+                arg = str(int(arg))
+        except ValueError:
+            pass  # Flags, separators, booleans and operator names are kept as given
+        normalized.append(arg)
+    return normalized
+
+class ResultCache:
+    """Size-bounded LRU cache of command output in an SQLite file."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=MAX_CACHE_BYTES, source=None):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.source = source or source_hash()
+        self.connection = sqlite3.connect(path)
+        # Delete triggers then also fire for the rows INSERT OR REPLACE overwrites
+        self.connection.execute("PRAGMA recursive_triggers = ON")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY, source TEXT, command TEXT, args TEXT, output BLOB, size INTEGER, used INTEGER);
+            CREATE INDEX IF NOT EXISTS results_used ON results (used);
+            CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, bytes INTEGER);
+            INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM results WHERE NOT EXISTS (SELECT 1 FROM totals);
+            CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+                BEGIN UPDATE totals SET bytes = bytes + NEW.size; END;
+            CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+                BEGIN UPDATE totals SET bytes = bytes - OLD.size; END;
+        """)
+
+    def key(self, command, args):
+        """Cache key for a command and its arguments under the current sources."""
+        text = json.dumps([command, normalize_args(args), self.source])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _next_use(self):
+        return self.connection.execute("SELECT COALESCE(MAX(used), 0) + 1 FROM results").fetchone()[0]
+
+    def get(self, command, args):
+        """Return the cached output of a call, or None, marking the entry as most recently used."""
+        key = self.key(command, args)
+        row = self.connection.execute("SELECT output FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute("UPDATE results SET used = ? WHERE key = ?", (self._next_use(), key))
+        return row[0].decode()
+
+    def put(self, command, args, output):
+        """Store the output of a call, evicting least recently used entries beyond max_bytes."""
+        encoded = output.encode()
+        if len(encoded) > self.max_bytes:
+            return
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(command, args), self.source, command, json.dumps(normalize_args(args)), encoded, len(encoded), self._next_use()))
+            excess = self.size() - self.max_bytes
+            while excess > 0:
+                # The new entry is the most recently used and fits on its own, so this stops before reaching it
+                oldest = self.connection.execute("SELECT key, size FROM results ORDER BY used LIMIT ?", (EVICT_BATCH,)).fetchall()
+                for key, size in oldest:
+                    if excess <= 0:
+                        break
+                    self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                    excess -= size
+
+    def size(self):
+        """Total bytes of cached output."""
+        return self.connection.execute("SELECT bytes FROM totals").fetchone()[0]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM results")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def cached_blackboard(command, args, path=None, max_bytes=MAX_CACHE_BYTES):
+    """Run a blackboard call through the cache, printing the cached output on a hit."""
+    import h
+    if '--output' in args or '--format' in args:
+        # Output written to files is not captured, so those calls always run
+        return h.blackboard(command, args)
+    path = path or os.environ.get(CACHE_ENV) or DEFAULT_CACHE_PATH
+    source = source_hash(modules=command_modules(command))
+    from h_model import definitions
+    if definitions:
+        # Models registered from a JSON file change what the commands print, so their definitions are part of the key
+        source = hashlib.sha256((source + json.dumps(sorted(definitions.values()))).encode()).hexdigest()
+    with ResultCache(path, max_bytes, source) as cache:
+        output = cache.get(command, args)
+        if output is None:
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                h.blackboard(command, args)
+            output = buffer.getvalue()
+            cache.put(command, args, output)
+    print(output, end='')
@@ -0,0 +1,477 @@
+import random
+from array import array
+from collections import namedtuple
+from math import pi, isfinite
+import h
+import h_array
+import h_memo
+# Memory-bounded chunked evaluation of Qn/H pipelines.
+# h_array evaluates a whole input at once, allocating a full-size temporary for every intermediate (θ, sin, cos, tan²,
+# the product, the rounding and suspect masks), so peak memory is several times the output size. Here the input is cut
+# into chunks of chunk_size points, every intermediate lives in a Scratch buffer that is allocated once and reused in
+# place by each chunk (ufuncs with out=), and each chunk's result is written straight into the output, which may itself
+# be a memory map. Peak memory beyond the inputs and output is O(chunk_size): pick it so the scratch set (Scratch.nbytes)
+# stays in L2 or L3. Results are identical to h_array and h.py; ambiguous elements are still recomputed with h.py.
+# Float inputs run through the in-place kernels below; int or Fraction inputs (h.py's exact rational phases) and the
+# other primitives go through h_array one chunk at a time, which is still O(chunk_size) but allocates per chunk.
+# dtype='float32' selects the float32 mode below, halving the bandwidth and storage of the output.
+
+# Points per chunk; about 20 scratch buffers of this size take 2.5 MiB.
+CHUNK_SIZE = 1 << 14
+
+class Scratch:
+    """Named work buffers of chunk_size elements, allocated on first use and reused by every later chunk."""
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.buffers = {}
+
+    def __call__(self, name, n, dtype=None):
+        """The first n elements of the buffer called name."""
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            np = h_array.np
+            buffer = self.buffers[name] = np.empty(self.chunk_size, dtype=dtype or np.float64)
+        return buffer[:n]
+
+    def nbytes(self):
+        """Total size of the allocated buffers."""
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+def _round_into(raw, decimals, out, scratch):
+    # h_array._round, writing into out
+    np = h_array.np
+    n = len(out)
+    mask = scratch('round_mask', n, bool)
+    scale = 10.0 ** decimals
+    np.multiply(raw, scale, out=out)
+    np.rint(out, out=out)
+    np.divide(out, scale, out=out)
+    magnitude = scratch('magnitude', n)
+    np.abs(raw, out=magnitude)
+    np.less(magnitude, 1e-10, out=mask)
+    np.copyto(out, 0.0, where=mask)
+    np.greater(raw, 1e10, out=mask)
+    np.copyto(out, float('inf'), where=mask)
+    np.less(raw, -1e10, out=mask)
+    np.copyto(out, float('-inf'), where=mask)
+
+def _suspect_into(raw, decimals, check, scratch):
+    # h_array._suspect, writing into check; expects _round_into to have filled 'magnitude'
+    np = h_array.np
+    n = len(check)
+    magnitude = scratch('magnitude', n)
+    scaled = scratch('scaled', n)
+    distance = scratch('distance', n)
+    threshold = scratch('threshold', n)
+    mask = scratch('suspect_mask', n, bool)
+    rounded = scratch('rounded', n, bool)
+    np.multiply(raw, 10.0 ** decimals, out=scaled)
+    np.trunc(scaled, out=distance)
+    np.subtract(scaled, distance, out=distance)
+    np.abs(distance, out=distance)
+    np.subtract(distance, 0.5, out=distance)
+    np.abs(distance, out=distance)
+    np.isfinite(raw, out=check)
+    np.logical_not(check, out=check)
+    for limit in (1e-10, 1e10):
+        np.subtract(magnitude, limit, out=threshold)
+        np.abs(threshold, out=threshold)
+        np.less_equal(threshold, h_array._SLACK * limit, out=mask)
+        check |= mask
+    # Beyond the ±∞ thresholds the rounding no longer depends on the last bits
+    np.greater_equal(magnitude, 1e-10, out=rounded)
+    np.less_equal(magnitude, 1e10, out=mask)
+    rounded &= mask
+    np.abs(scaled, out=scaled)
+    np.multiply(scaled, h_array._SLACK, out=threshold)
+    np.less_equal(distance, threshold, out=mask)
+    mask &= rounded
+    check |= mask
+    np.greater_equal(scaled, 2.0 ** 52, out=mask)
+    mask &= rounded
+    check |= mask
+
+def _at(arg, index):
+    # Element index of a chunk argument, which may be a scalar
+    return float(arg) if not hasattr(arg, '__len__') else float(arg[index])
+
+def _finish_into(raw, args, scalar, out, scratch, fixed=(), suspect=None, decimals=2):
+    # h_array._finish, writing into out
+    np = h_array.np
+    _round_into(raw, decimals, out, scratch)
+    check = scratch('check', len(out), bool)
+    _suspect_into(raw, decimals, check, scratch)
+    if not 0 <= decimals <= 22:
+        check[...] = True
+    if suspect is not None:
+        check |= suspect
+    for mask, value in fixed:
+        np.copyto(out, value, where=mask)
+        np.greater(check, mask, out=check)  # check & ~mask
+    for index in np.flatnonzero(check):
+        out[index] = scalar(*[_at(arg, index) for arg in args], decimals)
+
+def _divides_into(a, b, out, scratch):
+    np = h_array.np
+    mask = scratch('divides_mask', len(out), bool)
+    np.equal(a, 0, out=out)
+    np.equal(b, 0, out=mask)
+    out |= mask
+
+def _large_into(x, y, a, b, out, scratch):
+    # h_array._large, or-ed into out
+    np = h_array.np
+    n = len(out)
+    large = scratch('large', n, bool)
+    mask = scratch('large_mask', n, bool)
+    left, right = scratch('large_left', n), scratch('large_right', n)
+    np.abs(x, out=left)
+    np.abs(a, out=right)
+    np.multiply(right, h.REDUCTION_THRESHOLD, out=right)
+    np.greater_equal(left, right, out=large)
+    np.abs(y, out=left)
+    np.abs(b, out=right)
+    np.multiply(right, h.REDUCTION_THRESHOLD, out=right)
+    np.greater_equal(left, right, out=mask)
+    large |= mask
+    if large.any():
+        for arg in (x, y, a, b):
+            np.isfinite(arg, out=mask)
+            large &= mask
+        out |= large
+
+def _qn_into(name, x, y, a, b, decimals, out, scratch):
+    np = h_array.np
+    n = len(out)
+    argument, other = scratch('argument', n), scratch('other', n)
+    sine, cosine, raw = scratch('sine', n), scratch('cosine', n), scratch('raw', n)
+    direct, pole = scratch('direct', n, bool), scratch('pole', n, bool)
+    # θ = ((xπ)/a) - ((yπ)/b), evaluated in the same order as h.py
+    np.multiply(x, pi, out=argument)
+    np.divide(argument, a, out=argument)
+    np.multiply(y, pi, out=other)
+    np.divide(other, b, out=other)
+    np.subtract(argument, other, out=argument)
+    np.sin(argument, out=sine)
+    np.cos(argument, out=cosine)
+    # Division by zero raises in h.py, and large phases are reduced exactly there, so both go to the scalar model
+    _divides_into(a, b, direct, scratch)
+    _large_into(x, y, a, b, direct, scratch)
+    if name in ('qn_tan2', 'qn_tan2_sin'):
+        np.divide(sine, cosine, out=raw)
+        np.equal(cosine, 0, out=pole)  # +∞ where cot(θ) is 0
+    else:
+        np.divide(cosine, sine, out=raw)
+        np.equal(sine, 0, out=pole)  # +∞ where tan(θ) is 0
+    np.multiply(raw, raw, out=raw)
+    if name == 'qn_tan2_sin':
+        np.multiply(raw, sine, out=raw)
+    elif name == 'qn_cot2_cos':
+        np.multiply(raw, cosine, out=raw)
+    np.greater(pole, direct, out=pole)  # pole & ~direct
+    _finish_into(raw, (x, y, a, b), getattr(h, name), out, scratch, fixed=[(pole, float('inf'))], suspect=direct, decimals=decimals)
+
+def _h_into(name, x, y, a, b, decimals, out, scratch):
+    np = h_array.np
+    n = len(out)
+    raw, other = scratch('raw', n), scratch('other', n)
+    suspect = scratch('direct', n, bool)
+    if name == 'h_arctan':
+        np.divide(x, a, out=raw)
+        np.divide(y, b, out=other)
+        np.subtract(raw, other, out=raw)
+        np.arctan(raw, out=raw)
+        np.multiply(raw, 2 / pi, out=raw)
+        _divides_into(a, b, suspect, scratch)
+    else:
+        np.multiply(x, a, out=raw)
+        np.multiply(y, b, out=other)
+        np.add(raw, other, out=raw)
+        np.negative(raw, out=other)  # The exponent
+        np.exp(other, out=raw)
+        # math.exp raises OverflowError on finite arguments that overflow, so let the scalar path do so
+        np.isinf(raw, out=suspect)
+        mask = scratch('finite', n, bool)
+        np.isfinite(other, out=mask)
+        suspect &= mask
+        np.add(raw, 1, out=raw)
+        np.divide(1, raw, out=raw)
+    _finish_into(raw, (x, y, a, b), getattr(h, name), out, scratch, suspect=suspect, decimals=decimals)
+
+# Float32 mode.
+# For exploratory heatmaps the results are computed and stored in float32. θ is still formed in float64 from the inputs
+# and reduced modulo 2π there (so its float32 error stays within 2π⋅2⁻²⁴ whatever the magnitude of x/a), then sin, cos,
+# tan², the products, arctan, exp and the rounding run in float32. Zero divisors and large phases go to h.py exactly as in
+# float64, and int or Fraction inputs are evaluated exactly and stored in float32. float32_error measures the deviation.
+# h_sigmoid's exp overflows to 0 instead of raising OverflowError like h.py.
+# Every float32 result, from the float32 kernels or from h.py's exact values, gets the float32 zero threshold.
+
+# round_to_limits thresholds for float32. θ carries an absolute error of about the float32 machine epsilon 2⁻²³, so smaller
+# values are noise and round to 0, in place of float64's 1e-10. float32 represents 1e10 and well beyond, so values still
+# become ±∞ beyond h.py's 1e10.
+FLOAT32_ZERO = 2.0 ** -23
+FLOAT32_INFINITY = 1e10
+
+# Points float32_error evaluates in both precisions.
+SAMPLE_SIZE = 100_000
+
+PrecisionReport = namedtuple('PrecisionReport', ['samples', 'max_error', 'mean_error', 'max_relative_error', 'mismatches'])
+
+def _round32_into(raw, decimals, out, scratch):
+    # _round_into with the float32 thresholds, in float32
+    np = h_array.np
+    mask = scratch('round_mask', len(out), bool)
+    scale = np.float32(10.0 ** decimals)
+    np.multiply(raw, scale, out=out)
+    np.rint(out, out=out)
+    np.divide(out, scale, out=out)
+    np.abs(raw, out=scratch('magnitude32', len(out), np.float32))
+    np.less(scratch('magnitude32', len(out), np.float32), FLOAT32_ZERO, out=mask)
+    np.copyto(out, 0.0, where=mask)
+    np.greater(raw, FLOAT32_INFINITY, out=mask)
+    np.copyto(out, float('inf'), where=mask)
+    np.less(raw, -FLOAT32_INFINITY, out=mask)
+    np.copyto(out, float('-inf'), where=mask)
+
+def _zero32_into(out, scratch):
+    # The float32 zero threshold on values computed elsewhere (h.py's exact values, or h_array's)
+    np = h_array.np
+    mask = scratch('round_mask', len(out), bool)
+    np.abs(out, out=scratch('magnitude32', len(out), np.float32))
+    np.less(scratch('magnitude32', len(out), np.float32), FLOAT32_ZERO, out=mask)
+    np.copyto(out, 0.0, where=mask)
+
+def _direct_into(scalar, args, decimals, out, direct):
+    # Elements h.py evaluates itself (raising where it raises), rounded to float32
+    for index in h_array.np.flatnonzero(direct):
+        out[index] = scalar(*[_at(arg, index) for arg in args], decimals)
+
+def _qn32_into(name, x, y, a, b, decimals, out, scratch):
+    np = h_array.np
+    n = len(out)
+    argument, other = scratch('argument', n), scratch('other', n)
+    theta = scratch('argument32', n, np.float32)
+    sine, cosine = scratch('sine32', n, np.float32), scratch('cosine32', n, np.float32)
+    raw = scratch('raw32', n, np.float32)
+    direct, pole = scratch('direct', n, bool), scratch('pole', n, bool)
+    np.multiply(x, pi, out=argument)
+    np.divide(argument, a, out=argument)
+    np.multiply(y, pi, out=other)
+    np.divide(other, b, out=other)
+    np.subtract(argument, other, out=argument)
+    # θ - 2πk in float64, k = rint(θ/2π)
+    np.multiply(argument, 1 / (2 * pi), out=other)
+    np.rint(other, out=other)
+    np.multiply(other, 2 * pi, out=other)
+    np.subtract(argument, other, out=argument)
+    np.copyto(theta, argument, casting='same_kind')
+    np.sin(theta, out=sine)
+    np.cos(theta, out=cosine)
+    _divides_into(a, b, direct, scratch)
+    _large_into(x, y, a, b, direct, scratch)
+    if name in ('qn_tan2', 'qn_tan2_sin'):
+        np.divide(sine, cosine, out=raw)
+        np.equal(cosine, 0, out=pole)
+    else:
+        np.divide(cosine, sine, out=raw)
+        np.equal(sine, 0, out=pole)
+    np.multiply(raw, raw, out=raw)
+    if name == 'qn_tan2_sin':
+        np.multiply(raw, sine, out=raw)
+    elif name == 'qn_cot2_cos':
+        np.multiply(raw, cosine, out=raw)
+    _round32_into(raw, decimals, out, scratch)
+    np.copyto(out, float('inf'), where=pole)
+    _direct_into(getattr(h, name), (x, y, a, b), decimals, out, direct)
+
+def _h32_into(name, x, y, a, b, decimals, out, scratch):
+    np = h_array.np
+    n = len(out)
+    wide, other = scratch('raw', n), scratch('other', n)
+    raw = scratch('raw32', n, np.float32)
+    if name == 'h_arctan':
+        np.divide(x, a, out=wide)
+        np.divide(y, b, out=other)
+        np.subtract(wide, other, out=wide)
+        np.copyto(raw, wide, casting='same_kind')
+        np.arctan(raw, out=raw)
+        np.multiply(raw, np.float32(2 / pi), out=raw)
+        _round32_into(raw, decimals, out, scratch)
+        direct = scratch('direct', n, bool)
+        _divides_into(a, b, direct, scratch)
+        _direct_into(h.h_arctan, (x, y, a, b), decimals, out, direct)
+    else:
+        np.multiply(x, a, out=wide)
+        np.multiply(y, b, out=other)
+        np.add(wide, other, out=wide)
+        np.negative(wide, out=wide)
+        np.copyto(raw, wide, casting='same_kind')
+        np.exp(raw, out=raw)
+        np.add(raw, 1, out=raw)
+        np.divide(1, raw, out=raw)
+        _round32_into(raw, decimals, out, scratch)
+
+def _stages(pipeline):
+    # (name, base, defaults) for each stage; a single name is a one-stage pipeline
+    if isinstance(pipeline, str):
+        pipeline = (pipeline,)
+    stages = []
+    for name in pipeline:
+        if not hasattr(h_array, name) or not hasattr(h, name):
+            raise ValueError(f"Unknown function '{name}'.")
+        try:
+            base = h_memo.base_name(getattr(h, name))
+        except ValueError:
+            base = None  # halt, loop and q_inverse run through h_array
+        stages.append((name, base, getattr(h, name).__defaults__))
+    return stages
+
+def _float_inputs(*args):
+    # True if h.py takes the float path at every point, so the in-place kernels apply
+    return h_array._rational_mode(*args) is None
+
+def _evaluate_chunk(stage, x, y, a, b, decimals, out, scratch, in_place):
+    name, base, defaults = stage
+    single = out.dtype == h_array.np.float32
+    if in_place and base in h_array.qn_models:
+        (_qn32_into if single else _qn_into)(base, x, y, a, b, decimals, out, scratch)
+    elif in_place and base in ('h_arctan', 'h_sigmoid'):
+        (_h32_into if single else _h_into)(base, x, y, a, b, decimals, out, scratch)
+    elif name == 'loop':
+        out[...] = h_array.loop(x, y, a, b)  # loop() has no rounding, so it takes no decimals argument
+    else:
+        out[...] = getattr(h_array, name)(x, y, a, b, decimals)
+    if single:
+        _zero32_into(out, scratch)
+
+def _chunk_of(arg, start, stop, shape):
+    # A view (or, for broadcast or non-float arguments, a chunk-sized copy) of the flat elements start .. stop - 1
+    np = h_array.np
+    if not isinstance(arg, np.ndarray):
+        return arg
+    if arg.size == 1:
+        return arg.reshape(-1)[0].item()
+    if arg.shape == shape and arg.flags.c_contiguous:
+        return arg.reshape(-1)[start:stop]
+    return np.broadcast_to(arg, shape).flat[start:stop]
+
+def evaluate(pipeline, x=None, y=None, a=None, b=None, decimals=2, out=None, chunk_size=CHUNK_SIZE, dtype='float64'):
+    """Apply a Qn/H function, or a pipeline of them (innermost first), chunk by chunk into out.
+
+    y, a and b default to the first function's own defaults, and each later stage receives the previous stage's result
+    as x with its own default y, a and b (so ('qn_tan2_arctan_const', 'h_arctan') is one H(Qn) step). out may be any
+    preallocated C-contiguous array or memory map of the broadcast shape and dtype ('float64', or 'float32' for the
+    float32 mode); it is allocated when omitted.
+    """
+    if dtype not in ('float64', 'float32'):
+        raise ValueError(f"Unknown dtype '{dtype}', expected 'float64' or 'float32'.")
+    stages = _stages(pipeline)
+    first = stages[0][2]
+    x, y, a, b = [default if arg is None else arg for arg, default in zip((x, y, a, b), first)]
+    if not h_array._use_numpy():
+        return _evaluate_points(stages, x, y, a, b, decimals, out, dtype)
+    np = h_array.np
+    args = [np.asarray(arg) if isinstance(arg, (list, tuple, array)) else arg for arg in (x, y, a, b)]
+    shape = np.broadcast_shapes(*[np.shape(arg) for arg in args])
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape or out.dtype != np.dtype(dtype) or not out.flags.c_contiguous:
+        raise ValueError(f"out must be a C-contiguous {dtype} array of shape {shape}.")
+    flat = out.reshape(-1)
+    in_place = _float_inputs(*args)
+    scratch = Scratch(chunk_size)
+    with np.errstate(all='ignore'):
+        _evaluate_chunks(stages, args, shape, decimals, flat, scratch, in_place)
+    return out
+
+def _evaluate_chunks(stages, args, shape, decimals, flat, scratch, in_place):
+    np = h_array.np
+    chunk_size = scratch.chunk_size
+    for start in range(0, flat.size, chunk_size):
+        stop = min(start + chunk_size, flat.size)
+        chunk = [_chunk_of(arg, start, stop, shape) for arg in args]
+        if in_place:
+            # Float arguments of other dtypes are converted into scratch buffers rather than per-chunk copies
+            for i, arg in enumerate(chunk):
+                if isinstance(arg, np.ndarray) and arg.dtype != np.float64:
+                    converted = scratch('input_' + 'xyab'[i], stop - start)
+                    np.copyto(converted, arg, casting='unsafe')
+                    chunk[i] = converted
+        target = flat[start:stop]
+        _evaluate_chunk(stages[0], *chunk, decimals, target, scratch, in_place)
+        for stage in stages[1:]:
+            # Later stages read the previous result, a float array, so they always take the in-place kernels
+            current = scratch('stage', stop - start)
+            np.copyto(current, target)
+            _evaluate_chunk(stage, current, *stage[2][1:4], decimals, target, scratch, _float_inputs(current, *stage[2][1:4]))
+
+def _evaluate_points(stages, x, y, a, b, decimals, out, dtype='float64'):
+    # Array module fallback: one point at a time through h.py, so nothing but out grows with the input
+    # (the float32 mode stores the exact results in float32)
+    args = (x, y, a, b)
+    lengths = {len(arg) for arg in args if hasattr(arg, '__len__')}
+    if len(lengths) > 1:
+        raise ValueError(f"operands could not be broadcast together with lengths {sorted(lengths)}")
+    length = lengths.pop() if lengths else 1
+    if out is None:
+        typecode = 'f' if dtype == 'float32' else 'd'
+        out = array(typecode, bytes(array(typecode).itemsize * length))
+    functions = [getattr(h, name) for name, base, defaults in stages]
+    for index in range(length):
+        point = [arg[index] if hasattr(arg, '__len__') else arg for arg in args]
+        value = functions[0](*point) if stages[0][0] == 'loop' else functions[0](*point, decimals)
+        if dtype == 'float32' and abs(value) < FLOAT32_ZERO:
+            value = 0.0
+        for function, (name, base, defaults) in zip(functions[1:], stages[1:]):
+            value = function(value, *defaults[1:4]) if name == 'loop' else function(value, *defaults[1:4], decimals)
+            if dtype == 'float32' and abs(value) < FLOAT32_ZERO:
+                value = 0.0
+        out[index] = value
+    return out
+
+def compare_precision(reference, approximate):
+    """PrecisionReport of approximate values against reference values.
+
+    The errors are taken over the points finite in both, absolute and relative to max(|reference|, 1) (Qn values near
+    a pole are large, so their absolute errors are too); mismatches counts the points where only one is finite, or both
+    are infinite with different signs, or the nan-ness differs.
+    """
+    count, finite, total, largest, relative, mismatches = 0, 0, 0.0, 0.0, 0.0, 0
+    for expected, value in zip(h_array.as_list(reference), h_array.as_list(approximate)):
+        count += 1
+        if isfinite(expected) and isfinite(value):
+            error = abs(value - expected)
+            finite += 1
+            total += error
+            largest = max(largest, error)
+            relative = max(relative, error / max(abs(expected), 1.0))
+        elif not (expected == value or (expected != expected and value != value)):
+            mismatches += 1
+    return PrecisionReport(count, largest, total / finite if finite else 0.0, relative, mismatches)
+
+def _sample(args, shape, samples, seed):
+    # The arguments at up to samples random points of the broadcast shape
+    size = 1
+    for length in shape:
+        size *= length
+    indices = sorted(random.Random(seed).sample(range(size), min(samples, size)))
+    if not h_array._use_numpy():
+        return [[arg[index] for index in indices] if hasattr(arg, '__len__') else arg for arg in args]
+    np = h_array.np
+    coordinates = np.unravel_index(np.asarray(indices, dtype=np.intp), shape)
+    return [np.broadcast_to(arg, shape)[coordinates] if isinstance(arg, np.ndarray) and arg.size > 1 else arg for arg in args]
+
+def float32_error(pipeline, x=None, y=None, a=None, b=None, decimals=2, samples=SAMPLE_SIZE, seed=0):
+    """Evaluate a random sample of the points in float64 and in the float32 mode, and report the deviation."""
+    first = _stages(pipeline)[0][2]
+    args = [default if arg is None else arg for arg, default in zip((x, y, a, b), first)]
+    if h_array._use_numpy():
+        np = h_array.np
+        args = [np.asarray(arg) if isinstance(arg, (list, tuple, array)) else arg for arg in args]
+        shape = np.broadcast_shapes(*[np.shape(arg) for arg in args])
+    else:
+        shape = (max([len(arg) for arg in args if hasattr(arg, '__len__')], default=1),)
+    points = _sample(args, shape, samples, seed)
+    reference = evaluate(pipeline, *points, decimals=decimals)
+    return compare_precision(reference, evaluate(pipeline, *points, decimals=decimals, dtype='float32'))
@@ -0,0 +1,325 @@
+from array import array
+from math import atan, exp, pi, isfinite
+import h
+import h_array
+import h_memo
+# Forward-mode automatic differentiation through the Halting Machine.
+# A Dual carries a value and its tangent: the derivatives of that value with respect to the seeded parameters, a tuple of
+# floats for a scalar, or a NumPy array of shape (parameters, points) when the value is an array of points (a batch).
+# The functions below have the signatures of their h.py counterparts and accept Duals or plain numbers for any argument.
+# Each value is computed by the h.py function (or, for a batch, by h_array), so values, poles, ±∞ branches and exceptions
+# are exactly those of the Halting Machine; tangents are pushed forward with the analytic derivative of each function
+# (h.qn_phase_slope for Qn, the closed forms of arctan and the sigmoid for H), so one forward pass gives the derivatives
+# of a whole orbit with respect to every seeded parameter at once.
+# Rounding by round_to_limits is treated as the identity for tangents, so they are derivatives of the smooth model the
+# rounding approximates. Where a function saturates (an infinite result or argument, a ±∞/0 branch of q_inverse, or the
+# piecewise constant halt and loop) the tangent is 0.
+# h.py's functions call math directly, so they are not handed Duals themselves: math.sin would drop the tangent, and
+# dispatching on the argument type there would slow down every plain float call.
+
+class Dual:
+    """A value with its tangent (derivatives with respect to the seeded parameters)."""
+
+    __slots__ = ('value', 'tangent')
+
+    def __init__(self, value, tangent):
+        self.value = value
+        self.tangent = tangent
+
+    def __repr__(self):
+        return f"Dual({self.value!r}, {self.tangent!r})"
+
+    def _binary(self, other, value, partial_self, partial_other):
+        return Dual(value, _combine([(partial_self, self.tangent), (partial_other, _tangent(other))]))
+
+    def __add__(self, other):
+        return self._binary(other, self.value + _value(other), 1.0, 1.0)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._binary(other, self.value - _value(other), 1.0, -1.0)
+
+    def __rsub__(self, other):
+        return self._binary(other, _value(other) - self.value, -1.0, 1.0)
+
+    def __mul__(self, other):
+        return self._binary(other, self.value * _value(other), _value(other), self.value)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        quotient = self.value / _value(other)
+        return self._binary(other, quotient, 1 / _value(other), -quotient / _value(other))
+
+    def __rtruediv__(self, other):
+        quotient = _value(other) / self.value
+        return self._binary(other, quotient, -quotient / self.value, 1 / self.value)
+
+    def __pow__(self, exponent):
+        # Constant exponents only
+        return Dual(self.value ** exponent, _scale(self.tangent, exponent * self.value ** (exponent - 1)))
+
+    def __neg__(self):
+        return Dual(-self.value, _scale(self.tangent, -1.0))
+
+    def __pos__(self):
+        return self
+
+def _value(x):
+    return x.value if isinstance(x, Dual) else x
+
+def _tangent(x):
+    return x.tangent if isinstance(x, Dual) else None
+
+def _scale(tangent, factor):
+    if tangent is None:
+        return None
+    if isinstance(tangent, tuple):
+        return tuple(factor * t for t in tangent)
+    return factor * tangent
+
+def _combine(terms):
+    # Σ factor⋅tangent over the terms whose tangent is not None (None if there are none)
+    total = None
+    for factor, tangent in terms:
+        scaled = _scale(tangent, factor)
+        if scaled is None:
+            continue
+        if total is None:
+            total = scaled
+        elif isinstance(total, tuple):
+            total = tuple(t + u for t, u in zip(total, scaled))
+        else:
+            total = total + scaled
+    return total
+
+def _batch(*args):
+    return any(isinstance(_value(arg), (list, tuple)) or (h_array.np is not None and isinstance(_value(arg), h_array.np.ndarray)) for arg in args)
+
+def seed(*values):
+    """Duals for the parameters to differentiate with respect to, with unit tangents in argument order.
+    If any value is a sequence the Duals form a batch: their tangents are NumPy arrays of shape (parameters, points)."""
+    count = len(values)
+    if not _batch(*values):
+        return tuple(Dual(value, tuple(1.0 if i == j else 0.0 for j in range(count))) for i, value in enumerate(values))
+    np = h_array.np
+    if np is None:
+        raise ValueError("Batches of Duals need NumPy; seed each point separately instead.")
+    duals = []
+    for i, value in enumerate(values):
+        size = len(value) if isinstance(value, (list, tuple, np.ndarray)) else 1
+        tangent = np.zeros((count, size))
+        tangent[i] = 1.0
+        duals.append(Dual(value, tangent))
+    return tuple(duals)
+
+def _lift(value, args, partials, saturated):
+    # value with tangent Σ ∂value/∂arg⋅tangent(arg), or 0 where saturated; plain value if no argument is a Dual
+    terms = [(partial, _tangent(arg)) for arg, partial in zip(args, partials)]
+    if all(tangent is None for partial, tangent in terms):
+        return value
+    if isinstance(value, (float, int)):
+        if saturated:
+            return Dual(value, _scale(next(t for p, t in terms if t is not None), 0.0))
+        return Dual(value, _combine(terms))
+    np = h_array.np
+    with np.errstate(all='ignore'):
+        tangent = _combine(terms)
+    return Dual(value, np.where(saturated, 0.0, tangent))
+
+def _values(args):
+    # Plain values for evaluation, and float64 arrays (for a batch) or the numbers themselves for the partials
+    values = [_value(arg) for arg in args]
+    if _batch(*args):
+        return values, [h_array.np.asarray(value, dtype=h_array.np.float64) for value in values]
+    return values, values
+
+def _qn(name, x, y, a, b, decimals):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    if _batch(*args):
+        np = h_array.np
+        value = getattr(h_array, name)(*values, decimals)
+        slope = h_array.qn_phase_slope(name, *values)
+        with np.errstate(all='ignore'):
+            x, y, a, b = numbers
+            partials = [slope * partial for partial in (pi / a, -(pi / b), -((x * pi) / a) / a, ((y * pi) / b) / b)]
+        return _lift(value, args, partials, ~np.isfinite(value) | ~np.isfinite(slope))
+    value = getattr(h, name)(*values, decimals)
+    if not any(isinstance(arg, Dual) for arg in args):
+        return value
+    slope = h.qn_phase_slope(name, *values)
+    if value in (float('inf'), float('-inf')) or slope in (float('inf'), float('-inf')):
+        return _lift(value, args, (0.0,) * 4, True)  # At a pole, like the model itself
+    return _lift(value, args, [slope * partial for partial in h.phase_partials(*numbers)], False)
+
+# Example of a function that always halts returning 0.
+def halt(x=0, y=0, a=1, b=1, decimals=2):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    value = (h_array.halt if _batch(*args) else h.halt)(*values, decimals)
+    return _lift(value, args, (0.0,) * 4, True)
+
+# Example of a function that always loops and returns ±∞.
+def loop(x=0, y=0, a=1, b=1):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    value = (h_array.loop if _batch(*args) else h.loop)(*values)
+    return _lift(value, args, (0.0,) * 4, True)
+
+# Definition of the function Q: d/dv 1/v = -1/v² for v = (x⋅a) + (y⋅b).
+def q_inverse(x=0, y=0, a=1, b=1, decimals=2):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    x, y, a, b = numbers
+    if _batch(*args):
+        np = h_array.np
+        value = h_array.q_inverse(*values, decimals)
+        with np.errstate(all='ignore'):
+            slope = -1 / ((x * a) + (y * b)) ** 2
+            partials = (slope * a, slope * b, slope * x, slope * y)
+            saturated = ((x + y) == 0) | np.isinf(x) | np.isinf(y) | ~np.isfinite(value)
+        return _lift(value, args, partials, saturated)
+    value = h.q_inverse(*values, decimals)
+    if (x + y) == 0 or not (isfinite(x) and isfinite(y) and isfinite(value)):
+        return _lift(value, args, (0.0,) * 4, True)  # The ±∞ and 0 branches
+    slope = -1 / ((x * a) + (y * b)) ** 2
+    return _lift(value, args, (slope * a, slope * b, slope * x, slope * y), False)
+
+# Definition of the function H: d/du (2/π)⋅arctan(u) = (2/π)/(1 + u²) and d/du σ(u) = σ(u)⋅(1 - σ(u)).
+def h_arctan(x=0, y=0, a=1, b=1, decimals=2):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    x, y, a, b = numbers
+    if _batch(*args):
+        np = h_array.np
+        value = h_array.h_arctan(*values, decimals)
+        with np.errstate(all='ignore'):
+            u = (x / a) - (y / b)
+            slope = (2 / pi) / (1 + u * u)
+            partials = (slope / a, -slope / b, -slope * (x / a) / a, slope * (y / b) / b)
+        return _lift(value, args, partials, ~np.isfinite(u))
+    value = h.h_arctan(*values, decimals)
+    u = (x / a) - (y / b)
+    if not isfinite(u):
+        return _lift(value, args, (0.0,) * 4, True)
+    slope = (2 / pi) / (1 + u * u)
+    return _lift(value, args, (slope / a, -slope / b, -slope * (x / a) / a, slope * (y / b) / b), False)
+
+def h_sigmoid(x=0, y=0, a=1, b=1, decimals=2):
+    args = (x, y, a, b)
+    values, numbers = _values(args)
+    x, y, a, b = numbers
+    if _batch(*args):
+        np = h_array.np
+        value = h_array.h_sigmoid(*values, decimals)
+        with np.errstate(all='ignore'):
+            u = (x * a) + (y * b)
+            e = np.exp(-np.abs(u))
+            slope = e / (1 + e) ** 2  # σ(u)⋅(1 - σ(u)) without overflow
+            partials = (slope * a, slope * b, slope * x, slope * y)
+        return _lift(value, args, partials, ~np.isfinite(u))
+    value = h.h_sigmoid(*values, decimals)
+    u = (x * a) + (y * b)
+    if not isfinite(u):
+        return _lift(value, args, (0.0,) * 4, True)
+    e = exp(-abs(u))
+    slope = e / (1 + e) ** 2  # σ(u)⋅(1 - σ(u)) without overflow
+    return _lift(value, args, (slope * a, slope * b, slope * x, slope * y), False)
+
+# Qn: ∂Qn/∂x = d/dθ Qn⋅π/a, and likewise for y, a and b (see h.qn_gradient).
+def qn_tan2(x=0, y=0, a=2, b=2, decimals=2):
+    return _qn('qn_tan2', x, y, a, b, decimals)
+
+def qn_cot2(x=0, y=0, a=2, b=2, decimals=2):
+    return _qn('qn_cot2', x, y, a, b, decimals)
+
+def qn_tan2_sin(x=0, y=0, a=1, b=1, decimals=2):
+    return _qn('qn_tan2_sin', x, y, a, b, decimals)
+
+def qn_cot2_cos(x=0, y=0, a=1, b=1, decimals=2):
+    return _qn('qn_cot2_cos', x, y, a, b, decimals)
+
+# Testing defs with preset constants for Qn.
+def qn_tan2_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_tan2(x, y, a, b, decimals)
+
+def qn_cot2_arctan_const(x=0, y=0, a=2, b=2, decimals=2):
+    return qn_cot2(x, y, a, b, decimals)
+
+def qn_tan2_sin_sigmoid_const(x=0, y=-.5, a=1, b=1, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_sigmoid_const(x=0, y=0, a=1, b=1, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
+
+def qn_tan2_sin_arctan_const(x=0, y=-2, a=2, b=2, decimals=2):
+    return qn_tan2_sin(x, y, a, b, decimals)
+
+def qn_cot2_cos_arctan_const(x=0, y=-1, a=2, b=2, decimals=2):
+    return qn_cot2_cos(x, y, a, b, decimals)
+
+# Sensitivities of the Halting Machine.
+# Parameters that halting_sensitivities can differentiate with respect to: the start x and the Qn constants y, a and b.
+PARAMETERS = ('x', 'y', 'a', 'b')
+
+def halting_sensitivities(x_values=[-1, 0, 1], depth=3, models=None, wrt=('x', 'a', 'b'), decimals=2):
+    """Run every halting_machine orbit once, forward-propagating derivatives with respect to the parameters in wrt.
+    Returns (cube, tangents): cube[model, x, depth] is run_halting_machine's result cube, and tangents[model, parameter, x,
+    depth] the derivative of each result with respect to the start x or the model's Qn constant y, a or b."""
+    if models is None:
+        models = h.halting_models
+    for parameter in wrt:
+        if parameter not in PARAMETERS:
+            raise ValueError(f"Cannot differentiate with respect to {parameter!r}, expected one of {', '.join(PARAMETERS)}.")
+    x_values = list(x_values)
+    if h_array._use_numpy():
+        np = h_array.np
+        cube = np.empty((len(models), len(x_values), depth), dtype=np.float64)
+        tangents = np.zeros((len(models), len(wrt), len(x_values), depth), dtype=np.float64)
+        for m, (h_func, qn_func, description) in enumerate(models):
+            h_dual, qn_dual, constants = _model(h_func, qn_func, x_values, wrt)
+            current_x = constants.pop('x')
+            for i in range(depth):
+                current_x = h_dual(qn_dual(current_x, decimals=decimals, **constants), decimals=decimals)
+                cube[m, :, i] = _value(current_x)
+                if isinstance(current_x, Dual):
+                    tangents[m, :, :, i] = current_x.tangent
+        return cube, tangents
+    # Array module fallback: one scalar orbit per x, cube[model][x] and tangents[model][parameter][x] are array('d') rows
+    cube, tangents = [], []
+    for h_func, qn_func, description in models:
+        rows = [array('d') for x in x_values]
+        tangent_rows = [[array('d') for x in x_values] for parameter in wrt]
+        for j, x in enumerate(x_values):
+            h_dual, qn_dual, constants = _model(h_func, qn_func, x, wrt)
+            current_x = constants.pop('x')
+            for i in range(depth):
+                current_x = h_dual(qn_dual(current_x, decimals=decimals, **constants), decimals=decimals)
+                rows[j].append(_value(current_x))
+                tangent = _tangent(current_x) or (0.0,) * len(wrt)
+                for k in range(len(wrt)):
+                    tangent_rows[k][j].append(tangent[k])
+        cube.append(rows)
+        tangents.append(tangent_rows)
+    return cube, tangents
+
+def _model(h_func, qn_func, x_values, wrt):
+    # Lifted (H, Qn) functions and the seeded start x and Qn constants for one model
+    defaults = dict(zip(PARAMETERS, qn_func.__defaults__[:4]))
+    defaults['x'] = x_values
+    if _batch(x_values):
+        # One tangent column per point, whether or not x itself is in wrt
+        duals = {}
+        for i, parameter in enumerate(wrt):
+            tangent = h_array.np.zeros((len(wrt), len(x_values)))
+            tangent[i] = 1.0
+            duals[parameter] = Dual(defaults[parameter], tangent)
+    else:
+        duals = dict(zip(wrt, seed(*[defaults[parameter] for parameter in wrt])))
+    constants = {parameter: duals.get(parameter, defaults[parameter]) for parameter in PARAMETERS}
+    h_dual, qn_dual = globals().get(h_func.__name__), globals().get(h_memo.base_name(qn_func))
+    if h_dual is None or qn_dual is None or h_dual.__module__ != __name__:
+        raise ValueError(f"No derivative rules for the model {h_func.__name__}(Qn = {qn_func.__name__}).")
+    return h_dual, qn_dual, constants
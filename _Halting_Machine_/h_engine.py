@@ -0,0 +1,188 @@
+import sys
+from array import array
+from collections import namedtuple
+from itertools import islice
+from math import copysign
+import h
+import h_array
+import h_memo
+import h_model
+# Batched engine for the Halting Machine H(Qn).
+# Instead of three nested Python loops, the recurrence current_x = h_func(qn_func(current_x)) is evaluated
+# for every starting x at once with the vectorized primitives in h_array, one model and one iteration at a time.
+# The results are returned as a (model, x, depth) cube, and printing is left to an optional formatter.
+# With h_memo enabled, each step evaluates only the distinct phases its x values map to.
+
+def array_model(h_func, qn_func, approximate=False):
+    """Return the h_array (or, if approximate, the h_approx lookup-table) counterparts of a scalar (H, Qn) pair."""
+    module = h_array
+    if approximate:
+        import h_approx
+        module = h_approx
+    if qn_func.__name__ in h_model.registry:
+        # Models compiled by h_model have no lookup tables, so they always run their own exact kernel
+        return getattr(module, h_func.__name__), h_model.registry[qn_func.__name__].vector
+    return getattr(module, h_func.__name__), getattr(module, qn_func.__name__)
+
+def _step(h_func, qn_func, h_vector, qn_vector, current_x, approximate=False):
+    # One H(Qn) step for every x, through the phase memos when they are enabled (they hold exact results only)
+    # Models compiled by h_model have no phase memo and always run their kernel
+    if h_memo.enabled and not approximate and qn_func.__name__ not in h_model.registry:
+        return h_memo.evaluate(h_func, h_memo.evaluate(qn_func, current_x))
+    return h_vector(qn_vector(current_x))
+
+def run_halting_machine(x_values=[-1, 0, 1], depth=3, models=None, approximate=False):
+    """Evaluate every model of the Halting Machine for every x and return a (model, x, depth) result cube.
+    With approximate=True the steps use h_approx's lookup tables instead of the exact primitives."""
+    if models is None:
+        models = h.halting_models
+    x_values = list(x_values)
+    if h_array._use_numpy():
+        np = h_array.np
+        cube = np.empty((len(models), len(x_values), depth), dtype=np.float64)
+        for m, (h_func, qn_func, description) in enumerate(models):
+            h_vector, qn_vector = array_model(h_func, qn_func, approximate)
+            current_x = x_values  # The first step sees the x values as given, so int starting points keep their exact phase
+            for i in range(depth):
+                current_x = _step(h_func, qn_func, h_vector, qn_vector, current_x, approximate)
+                cube[m, :, i] = current_x
+        return cube
+    # Array module fallback: cube[model][x] is an array('d') of depth results
+    cube = []
+    for h_func, qn_func, description in models:
+        h_vector, qn_vector = array_model(h_func, qn_func, approximate)
+        rows = [array('d') for x in x_values]
+        current_x = x_values
+        for i in range(depth):
+            current_x = _step(h_func, qn_func, h_vector, qn_vector, current_x, approximate)
+            for row, result in zip(rows, current_x):
+                row.append(result)
+        cube.append(rows)
+    return cube
+
+def format_halting_machine(cube, x_values=[-1, 0, 1], models=None):
+    """Yield the lines halting_machine prints for a result cube, one iteration per line."""
+    if models is None:
+        models = h.halting_models
+    for j, x in enumerate(x_values):
+        yield f"\nEvaluating functions for x = {x}:"
+        for m, (h_func, qn_func, description) in enumerate(models):
+            yield f"\n{description}:"
+            current_x = x
+            for i, result in enumerate(h_array.as_list(cube[m][j]), 1):
+                yield f"Iteration {i} with {h_func.__name__}({qn_func.__name__}({current_x})): Result = {result}"
+                current_x = result
+        yield ""
+
+def print_halting_machine(cube, x_values=[-1, 0, 1], models=None, file=None):
+    """Write the formatted result cube to file (stdout by default) in large batches."""
+    if file is None:
+        file = sys.stdout
+    file.writelines(line + "\n" for line in format_halting_machine(cube, x_values, models))
+
+# Streaming.
+# Starting points are pulled from any iterable chunk by chunk and each chunk runs through the batched engine,
+# so memory stays constant however many x values are fed in, and consumers can stop early.
+IterationRecord = namedtuple('IterationRecord', ['model', 'x0', 'iteration', 'input', 'result'])
+
+# Starting points evaluated per batched engine call while streaming.
+STREAM_CHUNK = 1024
+
+def iterate_halting_machine(x_values=[-1, 0, 1], depth=3, models=None, chunk_size=STREAM_CHUNK):
+    """Lazily yield an IterationRecord for every x, model and iteration, in halting_machine's order."""
+    if models is None:
+        models = h.halting_models
+    x_values = iter(x_values)
+    while True:
+        chunk = list(islice(x_values, chunk_size))
+        if not chunk:
+            return
+        cube = run_halting_machine(chunk, depth, models)
+        for j, x in enumerate(chunk):
+            for m in range(len(models)):
+                current_x = x
+                for i, result in enumerate(h_array.as_list(cube[m][j]), 1):
+                    yield IterationRecord(m, x, i, current_x, result)
+                    current_x = result
+
+def read_x_values(file):
+    """Yield the starting x values in a text file (or open file object), whitespace separated, one at a time."""
+    if isinstance(file, str):
+        with open(file) as f:
+            yield from read_x_values(f)
+        return
+    for line in file:
+        for token in line.split():
+            yield float(token) if '.' in token or 'e' in token.lower() or 'inf' in token.lower() else int(token)
+
+# Cycle detection.
+# Every H output is quantized by round_to_limits, so each orbit x, H(Qn(x)), H(Qn(H(Qn(x)))), ... is eventually periodic.
+# Once the tail length μ and period λ of an orbit are known, the value at any depth n ≥ μ is the state at μ + (n - μ) mod λ.
+Orbit = namedtuple('Orbit', ['x', 'tail', 'period', 'states'])
+
+def same_state(p, q):
+    """Compare two orbit states bit for bit, treating nan as equal to itself and -0.0 as distinct from 0.0.
+    The types must match too: an int start takes the exact phase path of qn_argument, so 1 and 1.0 are different states."""
+    if p.__class__ is not q.__class__:
+        return False
+    if p != p or q != q:
+        return p != p and q != q
+    return p == q and copysign(1, p) == copysign(1, q)
+
+def find_cycle(h_func, qn_func, x):
+    """Brent's cycle detection on the orbit of x under H(Qn), returning (tail, period)."""
+    # Find the period λ by racing the hare ahead of a tortoise that teleports at powers of two
+    power = period = 1
+    tortoise = x
+    hare = h_func(qn_func(x))
+    while not same_state(tortoise, hare):
+        if power == period:
+            tortoise = hare
+            power *= 2
+            period = 0
+        hare = h_func(qn_func(hare))
+        period += 1
+    # Find the tail μ by walking two pointers λ apart until they meet
+    tortoise = hare = x
+    for i in range(period):
+        hare = h_func(qn_func(hare))
+    tail = 0
+    while not same_state(tortoise, hare):
+        tortoise = h_func(qn_func(tortoise))
+        hare = h_func(qn_func(hare))
+        tail += 1
+    return tail, period
+
+def trace_orbit(h_func, qn_func, x):
+    """Return the Orbit of x with its tail length, period and the states 0 .. tail + period."""
+    tail, period = find_cycle(h_func, qn_func, x)
+    states = [x]
+    # One extra state so a cycle through the starting x is read back as an H output rather than the raw input
+    for i in range(1, tail + period + 1):
+        states.append(h_func(qn_func(states[-1])))
+    return Orbit(x, tail, period, states)
+
+def orbit_value(orbit, n):
+    """Return the result of iteration n (state n of the orbit) in O(1), however large n is."""
+    if n < len(orbit.states):
+        return orbit.states[n]
+    index = orbit.tail + (n - orbit.tail) % orbit.period
+    if index == 0:
+        index = orbit.period
+    return orbit.states[index]
+
+def halting_orbits(x_values=[-1, 0, 1], models=None):
+    """Cycle-check every (model, x) orbit of the Halting Machine, returning a list of Orbits per model."""
+    if models is None:
+        models = h.halting_models
+    return [[trace_orbit(h_func, qn_func, x) for x in x_values] for h_func, qn_func, description in models]
+
+def format_halting_cycles(orbits, depth, models=None):
+    """Yield one line per orbit reporting its tail, period and the result at the given depth."""
+    if models is None:
+        models = h.halting_models
+    for (h_func, qn_func, description), model_orbits in zip(models, orbits):
+        yield f"\n{description}:"
+        for orbit in model_orbits:
+            yield f"x = {orbit.x}: tail = {orbit.tail}, period = {orbit.period}, Result at depth {depth} = {orbit_value(orbit, depth)}"
+    yield ""
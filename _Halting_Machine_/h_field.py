@@ -0,0 +1,262 @@
+import hashlib
+import mmap
+from array import array
+from math import sin, cos, fsum
+import h
+import h_array
+import h_memo
+import h_model
+import h_qmc
+import h_quad
+import h_sweep
+# N-dimensional Qn fields and their gradient truth vectors.
+# ρ = Qn(θ) with θ = Θ_1/α_1 + ... + Θ_n/α_n as in h_qmc, evaluated over the grid that the angles Θ_i and scalars α_i
+# broadcast to (grid() gives the open mesh of a Cartesian product of axes). The gradient is analytic:
+# ∂ρ/∂Θ_i = Qn'(θ)/α_i and ∂ρ/∂α_i = -Qn'(θ)⋅Θ_i/α_i², with Qn' from the closed forms of h.qn_slope for the h.py models
+# and from the symbolic derivative (h_model.differentiate) for registered models. Values and slopes are unrounded, and at
+# a pole the value and every gradient component are +∞, as in h.qn_gradient.
+# qn_field returns the arrays in memory. field writes them tile by tile into a memory-mapped file in h_sweep's format
+# (header length, JSON header, data) with the components interleaved per point, so memory stays at one tile whatever the
+# grid; it checkpoints and resumes like a sweep. A 1024³ grid with its 3 partials is 32 GiB of float64 (16 GiB with
+# dtype='float32'). gradient='phase' stores the single slope Qn'(θ) instead of the n partials, which are that slope over
+# α_i, so the file holds two components per point in any dimension.
+
+# Gradient components stored after the value, per gradient mode.
+GRADIENTS = ('angles', 'all', 'phase', None)
+
+def grid(*axes):
+    """Open mesh of 1-D axes: the i-th result varies along grid dimension i only, so the results broadcast to the
+    Cartesian product (like numpy.ix_). Without NumPy the results are nested lists."""
+    count = len(axes)
+    if h_array._use_numpy():
+        np = h_array.np
+        return [np.asarray(axis, dtype=np.float64).reshape([-1 if i == j else 1 for j in range(count)]) for i, axis in enumerate(axes)]
+    return [_nest([_nest(float(value), count - 1 - i) for value in axis], i) for i, axis in enumerate(axes)]
+
+def _nest(value, depth):
+    # value inside depth singleton lists
+    for j in range(depth):
+        value = [value]
+    return value
+
+def components(dimensions, gradient='angles'):
+    """Names of the stored components: 'value', then the gradient ('angle_i', 'scale_i' or 'phase')."""
+    if gradient not in GRADIENTS:
+        raise ValueError(f"Unknown gradient '{gradient}', expected 'angles', 'all', 'phase' or None.")
+    names = ['value']
+    if gradient == 'phase':
+        names.append('phase')
+    elif gradient is not None:
+        names += [f'angle_{i}' for i in range(dimensions)]
+        if gradient == 'all':
+            names += [f'scale_{i}' for i in range(dimensions)]
+    return names
+
+def _model(model):
+    # (spec, model index in qn_fused order or the registered Model)
+    spec = h_qmc._spec(model)
+    name, expression, period = spec
+    if expression is None:
+        return spec, h_array.qn_models.index(h_memo.base_name(getattr(h, name)))
+    return spec, h_model.registry[name]
+
+def _value_and_slope(model, spec, sine, cosine):
+    # NumPy: ρ and Qn'(θ) from sin θ and cos θ, both +∞ at the poles
+    np = h_array.np
+    with np.errstate(all='ignore'):
+        if isinstance(model, int):
+            value = h_quad.integrand(spec[0])[0](sine, cosine)
+            slope, pole = h_array.phase_slope(model, sine, cosine)
+        else:
+            value, slope = model._raw(sine, cosine)[0], model._raw_slope(sine, cosine)[0]
+            pole = ~np.isfinite(value)
+            if model.leaves & {'tan', 'sec'}:
+                pole |= cosine == 0
+            if model.leaves & {'cot', 'csc'}:
+                pole |= sine == 0
+    value = np.where(pole, float('inf'), value)
+    slope = np.where(pole, float('inf'), slope)
+    return value, slope, pole
+
+def _evaluate(model, spec, angles, scales, gradient):
+    # NumPy: the components over the broadcast shape of angles and scales
+    np = h_array.np
+    angles = [np.asarray(angle, dtype=np.float64) for angle in angles]
+    scales = [np.asarray(scale, dtype=np.float64) for scale in scales]
+    shape = np.broadcast_shapes(*[angle.shape for angle in angles], *[scale.shape for scale in scales])
+    with np.errstate(all='ignore'):
+        theta = np.zeros(shape)
+        for angle, scale in zip(angles, scales):
+            theta += angle / scale
+        value, slope, pole = _value_and_slope(model, spec, np.sin(theta), np.cos(theta))
+        results = [value]
+        if gradient == 'phase':
+            results.append(slope)
+        elif gradient is not None:
+            results += [np.where(pole, float('inf'), slope / scale) for scale in scales]
+            if gradient == 'all':
+                results += [np.where(pole, float('inf'), -((slope * angle) / scale) / scale) for angle, scale in zip(angles, scales)]
+    return [np.broadcast_to(result, shape) for result in results]
+
+def _evaluate_point(model, spec, angles, scales, gradient):
+    # Without NumPy: the components at one point
+    theta = fsum(angle / scale for angle, scale in zip(angles, scales))
+    sine, cosine = sin(theta), cos(theta)
+    try:
+        if isinstance(model, int):
+            value = h_quad.integrand(spec[0])[0](sine, cosine)
+            slope = h.qn_slope(model, sine, cosine)
+        else:
+            leaves = h_quad._leaves(sine, cosine)
+            value = h_model.evaluate_tree(model.tree, leaves)
+            slope = h_model.evaluate_tree(model.derivative, leaves)
+    except ZeroDivisionError:
+        value = slope = float('inf')
+    pole = value == float('inf') or slope == float('inf')
+    results = [float('inf') if pole else value]
+    if gradient == 'phase':
+        results.append(float('inf') if pole else slope)
+    elif gradient is not None:
+        results += [float('inf') if pole else slope / scale for scale in scales]
+        if gradient == 'all':
+            results += [float('inf') if pole else -((slope * angle) / scale) / scale for angle, scale in zip(angles, scales)]
+    return results
+
+def _shape(value):
+    # Shape of a number or nested sequence
+    shape = []
+    while isinstance(value, (list, tuple, array)):
+        shape.append(len(value))
+        value = value[0]
+    return shape
+
+def _broadcast(shapes):
+    full = [1] * max(len(shape) for shape in shapes)
+    for shape in shapes:
+        for axis, size in enumerate(shape, len(full) - len(shape)):
+            if size != 1 and full[axis] not in (1, size):
+                raise ValueError(f"Shapes {', '.join(str(tuple(shape)) for shape in shapes)} do not broadcast.")
+            if size != 1:
+                full[axis] = size
+    return full
+
+def _element(value, shape, index):
+    # value at the full-grid index, broadcasting its size-1 and missing leading axes
+    for axis, size in enumerate(shape, len(index) - len(shape)):
+        value = value[index[axis] if size != 1 else 0]
+    return value
+
+def _unravel(flat, shape):
+    index = [0] * len(shape)
+    for axis in range(len(shape) - 1, -1, -1):
+        flat, index[axis] = divmod(flat, shape[axis])
+    return index
+
+def _inputs(angles, scales):
+    angles = list(angles)
+    if not angles:
+        raise ValueError("A field needs at least one angle.")
+    scales = [1.0] * len(angles) if scales is None else list(scales)
+    if len(scales) != len(angles):
+        raise ValueError("scales must give one scalar per angle.")
+    return angles, scales
+
+def qn_field(model, angles, scales=None, gradient='angles'):
+    """ρ = Qn(Θ_1/α_1 + ... + Θ_n/α_n) and its analytic gradient over the broadcast grid of angles and scales.
+    Returns the list of components named by components(n, gradient): ρ, then ∂ρ/∂Θ_i (and ∂ρ/∂α_i for gradient='all'),
+    or Qn'(θ) alone for gradient='phase'. Without NumPy each component is a flat array('d') in C order."""
+    angles, scales = _inputs(angles, scales)
+    names = components(len(angles), gradient)
+    spec, model = _model(model)
+    if h_array._use_numpy():
+        return _evaluate(model, spec, angles, scales, gradient)
+    inputs = angles + scales
+    shapes = [_shape(value) for value in inputs]
+    shape = _broadcast(shapes)
+    count = 1
+    for size in shape:
+        count *= size
+    results = [array('d') for name in names]
+    for flat in range(count):
+        index = _unravel(flat, shape)
+        point = [_element(value, value_shape, index) for value, value_shape in zip(inputs, shapes)]
+        for column, result in zip(results, _evaluate_point(model, spec, point[:len(angles)], point[len(angles):], gradient)):
+            column.append(result)
+    return results
+
+def _digest(value):
+    # (shape, SHA-256 of the float64 values) identifying an input in the header, however large it is
+    if h_array._use_numpy():
+        np = h_array.np
+        value = np.ascontiguousarray(value, dtype=np.float64)
+        return [list(value.shape), hashlib.sha256(memoryview(value).cast('B')).hexdigest()]
+    shape = _shape(value)
+    flat = [value]
+    for size in shape:
+        flat = [item for nested in flat for item in nested]
+    return [shape, hashlib.sha256(array('d', flat).tobytes()).hexdigest()]
+
+def field(model, path, angles, scales=None, gradient='angles', dtype='float64', tile_size=h_sweep.TILE_SIZE,
+          checkpoint=h_sweep.CHECKPOINT_TILES):
+    """Write qn_field's components into a memory-mapped file tile by tile, resuming an interrupted run of the same field.
+    The data are shaped (*grid, components), components interleaved per point; dtype='float32' stores them in float32.
+    Returns the header."""
+    if dtype not in h_sweep.DTYPES:
+        raise ValueError(f"Unknown dtype '{dtype}', expected 'float64' or 'float32'.")
+    angles, scales = _inputs(angles, scales)
+    names = components(len(angles), gradient)
+    spec, model = _model(model)
+    inputs = angles + scales
+    if h_array._use_numpy():
+        np = h_array.np
+        inputs = [np.asarray(value, dtype=np.float64) for value in inputs]
+        shapes = [list(value.shape) for value in inputs]
+        shape = list(np.broadcast_shapes(*[value.shape for value in inputs]))
+    else:
+        shapes = [_shape(value) for value in inputs]
+        shape = _broadcast(shapes)
+    header = {
+        "model": spec[0], "expression": spec[1], "dimensions": len(angles), "gradient": gradient, "components": names,
+        "shape": shape, "dtype": h_sweep.DTYPES[dtype][0], "tile_size": tile_size,
+        "inputs": {"angles": [_digest(value) for value in angles], "scales": [_digest(value) for value in scales]},
+    }
+    width = len(names)
+    count = width
+    for size in shape:
+        count *= size
+    tiles_done = h_sweep._tiles_done(path, header)
+    if tiles_done is None:
+        h_sweep._create(path, header, count)
+        tiles_done = 0
+    if h_array._use_numpy():
+        full = [np.broadcast_to(value, shape) for value in inputs]  # Views: nothing is materialized
+        def evaluate(start, stop):
+            coordinates = np.unravel_index(np.arange(start // width, stop // width), shape)
+            points = [value[coordinates] for value in full]
+            return np.stack(_evaluate(model, spec, points[:len(angles)], points[len(angles):], gradient), axis=-1)
+    else:
+        def evaluate(start, stop):
+            results = array('d')
+            for flat in range(start // width, stop // width):
+                index = _unravel(flat, shape)
+                point = [_element(value, value_shape, index) for value, value_shape in zip(inputs, shapes)]
+                results.extend(_evaluate_point(model, spec, point[:len(angles)], point[len(angles):], gradient))
+            return results
+    h_sweep._run_tiles(path, count, tile_size * width, checkpoint, tiles_done, evaluate, h_sweep.DTYPES[dtype][1])
+    return header
+
+def open_field(path):
+    """Memory-map a finished field, returning (header, data) with data shaped (*grid, components)."""
+    with open(path, 'rb') as f:
+        header, data_offset = h_sweep._read_header(f)
+    shape = header["shape"] + [len(header["components"])]
+    if h_array._use_numpy():
+        np = h_array.np
+        return header, np.memmap(path, dtype=header["dtype"], mode='r', offset=data_offset, shape=tuple(shape))
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    count = 1
+    for size in shape:
+        count *= size
+    typecode = h_sweep._typecode(header)
+    return header, memoryview(mapped)[data_offset:data_offset + array(typecode).itemsize * count].cast(typecode)
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections import namedtuple
+from math import copysign
+import h
+import h_array
+import h_cache
+import h_model
+from h_engine import array_model
+# Functional-graph transition tables for the rounded H∘Qn maps of the Halting Machine.
+# round_to_limits quantizes every H output to 'decimals' places, and H is bounded to [0, 1] (sigmoid) or [-1, 1] (arctan),
+# so after the first step each orbit lives on the finite grid k/10^decimals (plus -0.0, which arctan can return).
+# Enumerating that grid once gives the successor of every state as an int32 table.
+# Cycles, tail lengths and basins are then found iteratively, and any later orbit query is a table lookup.
+
+# The grid of possible outputs for each H function, in units of 10^-decimals.
+h_ranges = {
+    "h_sigmoid": (0, 1),
+    "h_arctan": (-1, 1),
+}
+
+# Successor of a state whose step raises in h.py (for example OverflowError in h_sigmoid).
+NO_STATE = -1
+
+# successor, tail, entry, basin and position have one int32 per state; cycle_start and cycle_nodes list the cycles.
+# tail is the number of steps to reach a cycle (or the failing state when basin is NO_STATE),
+# entry is the first cycle state reached, basin is the id of that cycle and position is a cycle state's place on its cycle.
+TransitionGraph = namedtuple('TransitionGraph', [
+    'h_name', 'qn_name', 'decimals', 'low', 'high',
+    'successor', 'tail', 'entry', 'basin', 'position', 'cycle_start', 'cycle_nodes',
+])
+
+# Chunk of states evaluated per vectorized call while building a table.
+BUILD_CHUNK = 1 << 16
+
+def grid_size(low, high, decimals):
+    """Number of states on the grid, including the extra -0.0 state when the range is signed."""
+    return (high - low) * 10 ** decimals + 1 + (low < 0)
+
+def state_value(graph, index):
+    """Return the H output represented by a state index."""
+    scale = 10 ** graph.decimals
+    if index == (graph.high - graph.low) * scale + 1:
+        return -0.0
+    return (index + graph.low * scale) / scale
+
+def state_index(graph, value):
+    """Return the state index of an H output, or None if the value is not on the grid."""
+    scale = 10 ** graph.decimals
+    if value != value or value in (float('inf'), float('-inf')):
+        return None
+    if value == 0 and copysign(1, value) < 0:
+        return (graph.high - graph.low) * scale + 1 if graph.low < 0 else None
+    k = round(value * scale)
+    if not graph.low * scale <= k <= graph.high * scale or k / scale != value:
+        return None
+    return k - graph.low * scale
+
+def _grid_values(low, high, decimals, start, stop):
+    # Values of the states start .. stop - 1
+    scale = 10 ** decimals
+    last = (high - low) * scale + 1
+    return [(i + low * scale) / scale if i < last else -0.0 for i in range(start, stop)]
+
+def _step_chunk(h_func, qn_func, values, decimals):
+    # One H(Qn) step for a chunk of states, vectorized when nothing in the chunk raises
+    h_vector, qn_vector = array_model(h_func, qn_func)
+    try:
+        return h_array.as_list(h_vector(qn_vector(values, decimals=decimals), decimals=decimals))
+    except (OverflowError, ZeroDivisionError, ValueError):
+        results = []
+        for value in values:
+            try:
+                results.append(h_func(qn_func(value, decimals=decimals), decimals=decimals))
+            except (OverflowError, ZeroDivisionError, ValueError):
+                results.append(None)
+        return results
+
+def _analyze(successor):
+    # Iterative (non-recursive) cycle, tail and basin search over the functional graph
+    count = len(successor)
+    tail = [0] * count
+    entry = [NO_STATE] * count
+    basin = [NO_STATE] * count
+    position = [NO_STATE] * count
+    cycle_start = [0]
+    cycle_nodes = []
+    UNVISITED, ON_PATH, DONE = 0, 1, 2
+    status = bytearray(count)
+    for start in range(count):
+        if status[start] != UNVISITED:
+            continue
+        # Walk forward until we reach a finished state, a failing state or our own path
+        path = []
+        node = start
+        while node != NO_STATE and status[node] == UNVISITED:
+            status[node] = ON_PATH
+            path.append(node)
+            node = successor[node]
+        if node != NO_STATE and status[node] == ON_PATH:
+            # A new cycle: the path from its first occurrence onwards
+            first = path.index(node)
+            cycle_id = len(cycle_start) - 1
+            for place, member in enumerate(path[first:]):
+                entry[member] = member
+                basin[member] = cycle_id
+                position[member] = place
+                status[member] = DONE
+            cycle_nodes.extend(path[first:])
+            cycle_start.append(len(cycle_nodes))
+            del path[first:]
+        # Unwind the rest of the path, each state one step further from its cycle than its successor
+        for node in reversed(path):
+            following = successor[node]
+            if following != NO_STATE:
+                tail[node] = tail[following] + 1
+                entry[node] = entry[following]
+                basin[node] = basin[following]
+            status[node] = DONE
+    return tail, entry, basin, position, cycle_start, cycle_nodes
+
+def build_transition_graph(h_func, qn_func, decimals=2):
+    """Enumerate the state space of x → H(Qn(x)) at the given rounding and analyze its functional graph."""
+    if h_func.__name__ not in h_ranges:
+        raise ValueError(f"No output range known for {h_func.__name__}.")
+    low, high = h_ranges[h_func.__name__]
+    graph = TransitionGraph(h_func.__name__, qn_func.__name__, decimals, low, high, *([None] * 7))
+    count = grid_size(low, high, decimals)
+    successor = array('i')
+    for start in range(0, count, BUILD_CHUNK):
+        values = _grid_values(low, high, decimals, start, min(start + BUILD_CHUNK, count))
+        for result in _step_chunk(h_func, qn_func, values, decimals):
+            index = NO_STATE if result is None else state_index(graph, result)
+            if result is not None and index is None:
+                raise ValueError(f"{h_func.__name__} returned {result}, which is not on its {decimals} decimal grid.")
+            successor.append(index)
+    tail, entry, basin, position, cycle_start, cycle_nodes = _analyze(successor)
+    return graph._replace(successor=successor, tail=array('i', tail), entry=array('i', entry), basin=array('i', basin),
+                          position=array('i', position), cycle_start=array('i', cycle_start), cycle_nodes=array('i', cycle_nodes))
+
+def cycles(graph):
+    """Return every cycle of the graph as a list of H output values."""
+    return [[state_value(graph, node) for node in graph.cycle_nodes[graph.cycle_start[c]:graph.cycle_start[c + 1]]]
+            for c in range(len(graph.cycle_start) - 1)]
+
+def basin_sizes(graph):
+    """Return the number of states draining into each cycle."""
+    sizes = [0] * (len(graph.cycle_start) - 1)
+    for cycle_id in graph.basin:
+        if cycle_id != NO_STATE:
+            sizes[cycle_id] += 1
+    return sizes
+
+def graph_orbit_value(graph, x, n, qn_func=None, h_func=None):
+    """Return the result of iteration n of the orbit of x, using only table lookups once x is on the grid."""
+    if n == 0:
+        return x
+    # The grid holds float H outputs, and an int or Fraction start takes the exact phase path, so both step like off-grid x
+    node = state_index(graph, x) if x.__class__ is float else None
+    if node is None:
+        # An off-grid starting point needs one real H(Qn) step to land on the grid
+        h_func = h_func or getattr(h, graph.h_name)
+        qn_func = qn_func or getattr(h, graph.qn_name)
+        x = h_func(qn_func(x, decimals=graph.decimals), decimals=graph.decimals)
+        node = state_index(graph, x)
+        n -= 1
+        if node is None:
+            return x  # Only nan is left off the grid, and H(Qn(nan)) is nan
+    if graph.basin[node] == NO_STATE or n < graph.tail[node]:
+        # Walk the tail (through the table) until n runs out or we reach a state whose step raises
+        for i in range(n):
+            following = graph.successor[node]
+            if following == NO_STATE:
+                # Let h.py raise the same error the direct recurrence would
+                value = state_value(graph, node)
+                return getattr(h, graph.h_name)(getattr(h, graph.qn_name)(value, decimals=graph.decimals), decimals=graph.decimals)
+            node = following
+        return state_value(graph, node)
+    cycle_id = graph.basin[node]
+    first = graph.cycle_start[cycle_id]
+    length = graph.cycle_start[cycle_id + 1] - first
+    place = (graph.position[graph.entry[node]] + n - graph.tail[node]) % length
+    return state_value(graph, graph.cycle_nodes[first + place])
+
+# Persistence.
+# A table file is a 4-byte header length, a JSON header padded to 8 bytes, then the int32 arrays back to back.
+# Loading maps the file into memory, so queries read straight from the page cache without parsing it.
+# halting_graphs records graph_source in the header of the files it caches and rebuilds a file whose source differs, so
+# editing the modules or re-registering a model under the same name never serves a stale table.
+_ARRAYS = ['successor', 'tail', 'entry', 'basin', 'position', 'cycle_start', 'cycle_nodes']
+
+def graph_source(h_func, qn_func):
+    """Hash of what a table is built from: the Halting Machine sources and the registered definition of qn_func, if any."""
+    text = json.dumps([h_cache.source_hash(modules=('h_graph',)), h_func.__name__, qn_func.__name__, h_model.definitions.get(qn_func.__name__)])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def save_transition_graph(graph, path, source=None):
+    """Write a transition graph to path in the memory-mappable table format, recording source in its header."""
+    header = {
+        "h_name": graph.h_name, "qn_name": graph.qn_name, "decimals": graph.decimals,
+        "low": graph.low, "high": graph.high, "byteorder": sys.byteorder,
+        "lengths": [len(getattr(graph, name)) for name in _ARRAYS], "source": source,
+    }
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(len(encoded) + 4) % 8)
+    with open(path, 'wb') as f:
+        f.write(len(encoded).to_bytes(4, 'little'))
+        f.write(encoded)
+        for name in _ARRAYS:
+            f.write(getattr(graph, name).tobytes())
+
+def _read_header(f):
+    size = int.from_bytes(f.read(4), 'little')
+    return size, json.loads(f.read(size))
+
+def graph_file_source(path):
+    """The source recorded in a table file's header, or None if it has none or cannot be read."""
+    try:
+        with open(path, 'rb') as f:
+            return _read_header(f)[1].get("source")
+    except (OSError, ValueError):
+        return None
+
+def load_transition_graph(path):
+    """Memory-map a transition graph written by save_transition_graph."""
+    with open(path, 'rb') as f:
+        size, header = _read_header(f)
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine.")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    offset = 4 + size
+    arrays = []
+    for length in header["lengths"]:
+        arrays.append(view[offset:offset + 4 * length].cast('i'))
+        offset += 4 * length
+    return TransitionGraph(header["h_name"], header["qn_name"], header["decimals"], header["low"], header["high"], *arrays)
+
+def halting_graphs(decimals=2, directory=None, models=None):
+    """Return the transition graph of every Halting Machine model, cached as table files in directory if given."""
+    if models is None:
+        models = h.halting_models
+    graphs = []
+    for h_func, qn_func, description in models:
+        if directory is None:
+            graphs.append(build_transition_graph(h_func, qn_func, decimals))
+            continue
+        path = os.path.join(directory, f"{h_func.__name__}_{qn_func.__name__}_{decimals}.hqg")
+        source = graph_source(h_func, qn_func)
+        if graph_file_source(path) != source:
+            # Written beside the stale file and renamed over it, so graphs already mapped from it stay intact
+            save_transition_graph(build_transition_graph(h_func, qn_func, decimals), path + '.tmp', source)
+            os.replace(path + '.tmp', path)
+        graphs.append(load_transition_graph(path))
+    return graphs
@@ -0,0 +1,208 @@
+import sys
+import struct
+from math import isinf, isnan
+import h
+import h_array
+from h_engine import IterationRecord, run_halting_machine, STREAM_CHUNK
+# Buffered result writers for halting_machine and sweeps.
+# Records are written losslessly (repr floats or raw IEEE doubles) instead of the rounded text halting_machine prints,
+# and every writer batches its output through one large buffer so formatting, not system calls, sets the pace.
+# Available formats: 'csv', 'jsonl' and 'binary' (fixed-width little-endian records packed with struct).
+
+# Size of the write buffer in bytes.
+BUFFER_SIZE = 1 << 22
+
+# Records formatted per batch before they are joined and handed to the buffer.
+BATCH_SIZE = 1 << 14
+
+# Fixed-width binary iteration record: model (uint8), x0 (float64), iteration (uint64), input (float64), result (float64).
+ITERATION_STRUCT = struct.Struct('<BdQdd')
+
+def _number(value):
+    # Lossless text for a number, spelling ±∞ and nan the way Python's json module does
+    if isinstance(value, float):
+        if isnan(value):
+            return 'NaN'
+        if isinf(value):
+            return 'Infinity' if value > 0 else '-Infinity'
+    return repr(value)
+
+class RecordWriter:
+    """Base class for writers: buffers formatted records and writes them in large batches."""
+    binary = False
+
+    def __init__(self, file=None, fields=IterationRecord._fields, buffer_size=BUFFER_SIZE):
+        self.fields = tuple(fields)
+        self.owns_file = isinstance(file, str)
+        if self.owns_file:
+            file = open(file, 'wb' if self.binary else 'w', buffering=buffer_size)
+        elif file is None:
+            file = sys.stdout.buffer if self.binary else sys.stdout
+        self.file = file
+        self.pending = []
+        self.count = 0
+        self.start()
+
+    def start(self):
+        pass
+
+    def format(self, record):
+        raise NotImplementedError
+
+    def write(self, record):
+        """Queue one record, flushing the batch once it is full."""
+        self.pending.append(self.format(record))
+        self.count += 1
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def write_records(self, records):
+        """Write every record of an iterable."""
+        for record in records:
+            self.write(record)
+
+    def write_cube(self, cube, x_values, models=None):
+        """Write a run_halting_machine result cube as iteration records, in halting_machine's order."""
+        if models is None:
+            models = h.halting_models
+        for j, x in enumerate(x_values):
+            for m in range(len(models)):
+                current_x = x
+                for i, result in enumerate(h_array.as_list(cube[m][j]), 1):
+                    self.write(IterationRecord(m, x, i, current_x, result))
+                    current_x = result
+
+    def flush(self):
+        if self.pending:
+            self.file.write((b'' if self.binary else '').join(self.pending))
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TextWriter(RecordWriter):
+    """Base class for line-oriented text writers built from a str.format template with one slot per field."""
+    template = None
+
+    def format(self, record):
+        return self.template.format(*map(_number, record))
+
+    def write_cube(self, cube, x_values, models=None):
+        # H outputs repeat heavily across a cube, so each distinct float is formatted once per call
+        if models is None:
+            models = h.halting_models
+        texts = {}
+        def text(value):
+            if value.__class__ is not float or value == 0 or value != value:
+                return _number(value)  # ints, ±0.0 and nan compare equal to values with a different spelling
+            if value not in texts:
+                texts[value] = _number(value)
+            return texts[value]
+        template = self.template
+        depth = len(cube[0][0]) if len(cube) and len(x_values) else 0
+        iterations = [str(i) for i in range(1, depth + 1)]
+        for j, x in enumerate(x_values):
+            x_text = _number(x)
+            for m in range(len(models)):
+                model_text = str(m)
+                results = [text(result) for result in h_array.as_list(cube[m][j])]
+                inputs = [x_text] + results[:-1]
+                self.pending.extend(map(template.format, [model_text] * depth, [x_text] * depth, iterations, inputs, results))
+                self.count += depth
+            if len(self.pending) >= BATCH_SIZE:
+                self.flush()
+
+class CsvWriter(TextWriter):
+    """Comma separated values with a header row."""
+    def start(self):
+        self.template = ','.join(['{}'] * len(self.fields)) + '\n'
+        self.pending.append(','.join(self.fields) + '\n')
+
+class JsonLinesWriter(TextWriter):
+    """One JSON object per line."""
+    def start(self):
+        self.template = '{{' + ','.join('"' + field + '":{}' for field in self.fields) + '}}\n'
+
+class BinaryWriter(RecordWriter):
+    """Fixed-width binary records packed with a struct.Struct (ITERATION_STRUCT by default)."""
+    binary = True
+
+    def __init__(self, file=None, fields=IterationRecord._fields, buffer_size=BUFFER_SIZE, record_struct=ITERATION_STRUCT):
+        self.record_struct = record_struct
+        super().__init__(file, fields, buffer_size)
+
+    def format(self, record):
+        return self.record_struct.pack(*record)
+
+    def write_cube(self, cube, x_values, models=None):
+        if not h_array._use_numpy() or self.record_struct is not ITERATION_STRUCT:
+            return super().write_cube(cube, x_values, models)
+        # Build the packed records for the whole cube at once with a NumPy structured array
+        np = h_array.np
+        self.flush()
+        model_count, x_count, depth = cube.shape
+        records = np.empty((x_count, model_count, depth), dtype=iteration_dtype())
+        x0 = np.asarray(x_values, dtype=np.float64)
+        results = cube.transpose(1, 0, 2)
+        records['model'] = np.arange(model_count, dtype=np.uint8)[None, :, None]
+        records['x0'] = x0[:, None, None]
+        records['iteration'] = np.arange(1, depth + 1, dtype=np.uint64)
+        records['result'] = results
+        if depth:
+            records['input'][:, :, 0] = x0[:, None]
+            records['input'][:, :, 1:] = results[:, :, :-1]
+        self.file.write(records.tobytes())
+        self.count += records.size
+
+def iteration_dtype():
+    """NumPy structured dtype matching ITERATION_STRUCT."""
+    np = h_array.np
+    return np.dtype([('model', '<u1'), ('x0', '<f8'), ('iteration', '<u8'), ('input', '<f8'), ('result', '<f8')])
+
+# Writers by the name used on the command line.
+writers = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "binary": BinaryWriter,
+}
+
+def open_writer(output_format, file=None, **options):
+    """Create the writer for a format name, writing to a path, an open file or stdout."""
+    if output_format not in writers:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(writers)}.")
+    return writers[output_format](file, **options)
+
+def write_halting_machine(x_values=[-1, 0, 1], depth=3, output_format="csv", file=None, models=None, chunk_size=STREAM_CHUNK, approximate=False):
+    """Stream every halting_machine iteration record into a writer, chunk by chunk, returning the record count."""
+    if models is None:
+        models = h.halting_models
+    with open_writer(output_format, file) as writer:
+        chunk = []
+        for x in x_values:
+            chunk.append(x)
+            if len(chunk) == chunk_size:
+                writer.write_cube(run_halting_machine(chunk, depth, models, approximate), chunk, models)
+                chunk = []
+        if chunk:
+            writer.write_cube(run_halting_machine(chunk, depth, models, approximate), chunk, models)
+    return writer.count
+
+def read_binary_records(file, record_struct=ITERATION_STRUCT, record_type=IterationRecord):
+    """Yield the records of a binary file written by BinaryWriter."""
+    with open(file, 'rb') as f:
+        while True:
+            block = f.read(record_struct.size * BATCH_SIZE)
+            if not block:
+                return
+            for values in record_struct.iter_unpack(block):
+                yield record_type(*values)
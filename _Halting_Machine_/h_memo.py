@@ -0,0 +1,249 @@
+from array import array
+from collections import OrderedDict, namedtuple
+from fractions import Fraction
+from math import cos, isfinite, pi, sin
+from numbers import Rational
+import h
+import h_array
+# Phase-keyed memoization for the Qn and H functions.
+# Every Qn model depends on its arguments only through the argument θ it hands to tan, sin and cos, h_arctan only through
+# x/a - y/b and h_sigmoid only through x⋅a + y⋅b, so results are memoized on that phase (and decimals) rather than on raw arguments.
+# A Qn result is keyed on its phase class: θ/π reduced exactly modulo the model's period, as h.large_phase reduces large
+# phases, so points whole periods apart share an entry. h.py itself only reduces large phases, and the float θ it evaluates
+# for the other points of a class differ in their last bits, so a result is filed under its class only when its rounding
+# cannot change within that difference (_THETA_ERROR); otherwise it is keyed on the float θ h.py evaluates, as are the
+# h_arctan and h_sigmoid results.
+# Each function has its own bounded LRU memo with hit, miss and eviction counters. Memoization is off until enable() is called.
+
+# Entries kept per function memo.
+MEMO_SIZE = 1 << 16
+
+MemoStats = namedtuple('MemoStats', ['hits', 'misses', 'evictions', 'size'])
+
+_MISSING = object()
+
+# Bound on the error of the float θ h.py evaluates below the reduction threshold, where |θ| < 2²¹π: each of its roundings
+# and fl(π) err by a few units in the last place of 2²³.
+_THETA_ERROR = 2.0 ** -28
+
+# Largest relative change a phase class may cause in a result filed under the class.
+_MAX_CLASS_ERROR = 1e-3
+
+class PhaseMemo:
+    """Bounded LRU map from phase keys (see _keys) to results, counting hits, misses and evictions."""
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def lookup(self, *keys):
+        """Return the memoized result for the first of keys present, or _MISSING."""
+        for key in keys:
+            value = self.entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return value
+        self.misses += 1
+        return _MISSING
+
+    def store(self, key, value):
+        if key[0] != key[0]:
+            return  # nan phases never compare equal, so they could never be hit
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return MemoStats(self.hits, self.misses, self.evictions, len(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+# Memos by base function name; the preset-constant Qn wrappers share the memo of the model they call.
+memos = {}
+
+enabled = False
+memo_size = MEMO_SIZE
+
+def enable(maxsize=MEMO_SIZE):
+    """Turn memoization on, with at most maxsize entries per memo."""
+    global enabled, memo_size
+    enabled, memo_size = True, maxsize
+    for memo in memos.values():
+        memo.maxsize = maxsize
+
+def disable():
+    """Turn memoization off; memo contents and counters are kept until clear()."""
+    global enabled
+    enabled = False
+
+def clear():
+    """Empty every memo and reset its counters."""
+    for memo in memos.values():
+        memo.clear()
+
+def memo_stats():
+    """Return the MemoStats of every memo, by base function name."""
+    return {name: memo.stats() for name, memo in memos.items()}
+
+def base_name(func):
+    """Name of the Qn or H function whose phase func depends on (the model a preset-constant wrapper calls)."""
+    name = func.__name__
+    for base in sorted(h_array.qn_models + ('h_arctan', 'h_sigmoid'), key=len, reverse=True):
+        if name.startswith(base):
+            return base
+    raise ValueError(f"{name} is not a Qn or H function.")
+
+def _memo(base):
+    if base not in memos:
+        memos[base] = PhaseMemo(memo_size)
+    return memos[base]
+
+def phase(base, x, y, a, b):
+    """The phase a Qn or H function evaluates, computed exactly as h.py computes it (None for an exact π/4 table entry)."""
+    if base == 'h_arctan':
+        return ((x)/a) - ((y)/b)
+    if base == 'h_sigmoid':
+        return (x*a) + (y*b)
+    return h.qn_argument(x, y, a, b, h.qn_periods[base])[1]
+
+def phase_class(base, x, y, a, b):
+    """θ/π of a Qn point reduced exactly modulo the model's period, as a Fraction (None for H functions and nan or ±∞ phases)."""
+    if base not in h.qn_periods or a == 0 or b == 0:
+        return None
+    for value in (x, y, a, b):
+        if not isinstance(value, Rational) and not isfinite(value):
+            return None
+    return (Fraction(x) / Fraction(a) - Fraction(y) / Fraction(b)) % h.qn_periods[base]
+
+def _keys(value, reduced, decimals):
+    # Memo keys to look a result up by: its phase class (tagged, since a Fraction can equal a float θ), then its float θ
+    if reduced is None:
+        return ((value, decimals),)
+    return ((reduced, decimals, 'class'), (value, decimals))
+
+def _settled(func, x, y, a, b, value, decimals):
+    # True if every point of the phase class of θ = value rounds to this point's result: their float θ are at most
+    # 2⋅_THETA_ERROR apart, and every Qn model changes by a relative 3/|sin θ⋅cos θ| per radian at most
+    product = abs(sin(value) * cos(value))
+    if not product:
+        return False
+    tolerance = 6 * _THETA_ERROR / product
+    return tolerance <= _MAX_CLASS_ERROR and not h.near_rounding_boundary(func(x, y, a, b, 22), decimals, 1e-12 + tolerance)
+
+def _store(memo, func, x, y, a, b, value, reduced, decimals, result):
+    # File a computed result under its phase class if the whole class shares it, else under its float θ
+    if reduced is not None and _settled(func, x, y, a, b, value, decimals):
+        memo.store((reduced, decimals, 'class'), result)
+    else:
+        memo.store((value, decimals), result)
+
+def _call(memo, func, base, x, y, a, b, decimals):
+    # One point through the memo
+    value = phase(base, x, y, a, b)
+    if value is None:
+        return func(x, y, a, b, decimals)  # Table lookups are already cheaper than the memo
+    reduced = phase_class(base, x, y, a, b)
+    result = memo.lookup(*_keys(value, reduced, decimals))
+    if result is _MISSING:
+        result = func(x, y, a, b, decimals)
+        _store(memo, func, x, y, a, b, value, reduced, decimals, result)
+    return result
+
+def memoized(func):
+    """Wrap a scalar h.py Qn or H function (or preset-constant wrapper) in its phase memo, with the same defaults."""
+    base = base_name(func)
+    x0, y0, a0, b0, decimals0 = func.__defaults__
+    def wrapper(x=x0, y=y0, a=a0, b=b0, decimals=decimals0):
+        if not enabled:
+            return func(x, y, a, b, decimals)
+        return _call(_memo(base), func, base, x, y, a, b, decimals)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def evaluate(func, x_values, decimals=2):
+    """Apply a scalar h.py Qn or H function to a vector of x values through its memo, evaluating each distinct phase once."""
+    vector = getattr(h_array, func.__name__)
+    base = base_name(func)
+    x0, y, a, b, decimals0 = func.__defaults__
+    if not enabled or (base in h_array.qn_models and h_array._use_numpy() and h_array._rational_mode(x_values, y, a, b)):
+        return vector(x_values, decimals=decimals)
+    memo = _memo(base)
+    if not h_array._use_numpy():
+        return array('d', (_call(memo, func, base, x, y, a, b, decimals) for x in x_values))
+    np = h_array.np
+    x_values = np.asarray(x_values, dtype=np.float64)
+    if base in h_array.qn_models:
+        with np.errstate(all='ignore'):
+            phases = ((x_values * pi) / a) - ((y * pi) / b)
+    else:
+        phases = np.asarray(phase(base, x_values, y, a, b), dtype=np.float64)
+    direct = np.zeros(phases.shape, dtype=bool)
+    if base in h_array.qn_models:
+        # Large phases are keyed on their exactly reduced argument, and exact table entries skip the memo
+        for index in np.flatnonzero(h_array._large(x_values, y, a, b)):
+            value = phase(base, float(x_values[index]), y, a, b)
+            if value is None:
+                direct[index] = True
+            else:
+                phases[index] = value
+    values = np.empty(phases.shape, dtype=np.float64)
+    if direct.any():
+        values[direct] = vector(x_values[direct], decimals=decimals)
+        x_values, phases = x_values[~direct], phases[~direct]
+    # ±0.0 share a group here, which is safe: every memoized function rounds a zero phase to the same result.
+    # Points with the same float θ have the same result, so the class of each group's first point stands for the group.
+    distinct, first, inverse = np.unique(phases, return_index=True, return_inverse=True)
+    starts = x_values[first].tolist()
+    classes = [phase_class(base, x, y, a, b) for x in starts]
+    results = np.empty(len(distinct), dtype=np.float64)
+    missing = {}
+    for k, value in enumerate(distinct.tolist()):
+        keys = _keys(value, classes[k], decimals)
+        for key in keys:
+            result = memo.entries.get(key, _MISSING)
+            if result is not _MISSING:
+                memo.entries.move_to_end(key)
+                results[k] = result
+                break
+        else:
+            missing.setdefault(classes[k] if classes[k] is not None else keys[0], []).append(k)
+    def compute(pending):
+        computed = vector(x_values[first[pending]], decimals=decimals)
+        results[pending] = computed
+        for k, result in zip(pending, computed.tolist()):
+            _store(memo, func, starts[k], y, a, b, float(distinct[k]), classes[k], decimals, result)
+        return len(pending)
+    # Only the first starting point of one new phase per class is evaluated, through the vectorized primitive, and the
+    # other phases of the class only if that result was not filed under the whole class
+    groups = list(missing.values())
+    evaluated = compute([group[0] for group in groups]) if groups else 0
+    rest = []
+    for group in groups:
+        if classes[group[0]] is not None and (classes[group[0]], decimals, 'class') in memo.entries:
+            results[group[1:]] = results[group[0]]
+        else:
+            rest += group[1:]
+    if rest:
+        evaluated += compute(rest)
+    memo.misses += evaluated
+    memo.hits += len(x_values) - evaluated
+    values[~direct] = results[inverse.reshape(-1)]
+    return values
+
+# Memoized versions of the scalar h.py functions, pass-through while memoization is off.
+qn_tan2 = memoized(h.qn_tan2)
+qn_cot2 = memoized(h.qn_cot2)
+qn_tan2_sin = memoized(h.qn_tan2_sin)
+qn_cot2_cos = memoized(h.qn_cot2_cos)
+h_arctan = memoized(h.h_arctan)
+h_sigmoid = memoized(h.h_sigmoid)
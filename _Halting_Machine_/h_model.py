@@ -0,0 +1,479 @@
+import ast
+import json
+import os
+from fractions import Fraction
+from math import sin, cos, tan, pi, sqrt
+from numbers import Rational
+import h
+import h_array
+# Model DSL for defining new Qn models.
+# A model is an expression in t = θ = xπ/a - yπ/b, such as "tan(t)**2 * sin(t)", built from sin, cos, tan, cot, sec and
+# csc of t, numbers, pi, + - * / and integer powers. compile_model turns it into a scalar function shaped like the
+# hand-written Qn models in h.py (exact π/4 table, large-phase reduction, pole checks, round_to_limits) and into a NumPy
+# kernel shaped like h_array's (one sin and one cos pass, ambiguous elements recomputed with the scalar function), so the
+# two agree exactly. Poles are found automatically: tan and sec return +∞ where cos θ == 0, cot and csc where sin θ == 0,
+# and any other denominator that evaluates to 0 returns +∞ too. Constant subexpressions are folded, and calls with the
+# model's own y, a and b skip qn_argument and use the folded phase shift (yπ)/b. The exact values at multiples of π/4
+# take tan, cot, sec and csc at their poles as signed infinities, so tan²(θ)⋅sin(θ) is -∞ at 3π/2 and 1/tan²(θ) is 0 at
+# π/2, as on the float path.
+# register adds a compiled model to the registry, and, given an H function, to h.halting_models, which halting_machine,
+# the batched engine and the writers iterate over; the CLI reads the registry, and '--models path' (or HALTING_MODELS)
+# registers the models defined in a JSON file before a command runs.
+# differentiate gives an expression's symbolic derivative d/dt, which Model compiles into a NumPy slope kernel as well.
+
+# Environment variable naming a JSON file of model definitions to register at startup.
+MODELS_ENV = 'HALTING_MODELS'
+
+# Trig functions of t allowed in expressions.
+TRIG = ('sin', 'cos', 'tan', 'cot', 'sec', 'csc')
+
+# Unit roundoff of float64, the unit of the relative error bounds below.
+EPS = 2.0 ** -52
+
+# Relative difference between NumPy's value of each trig leaf and the scalar function's, in units of EPS.
+# The kernel derives tan and cot from sin and cos, while the scalar function calls tan.
+_LEAF_ERROR = {'sin': 2, 'cos': 2, 'tan': 8, 'cot': 8, 'sec': 4, 'csc': 4}
+
+# Compiled models by name.
+registry = {}
+
+# Definitions (name, expression, H function, y, a, b, period, description) of the registered models, for the cache key.
+definitions = {}
+
+def parse(expression):
+    """Parse a model expression into a tree of tuples, folding constant subexpressions."""
+    try:
+        tree = ast.parse(expression, mode='eval').body
+    except SyntaxError as e:
+        raise ValueError(f"Invalid model expression {expression!r}: {e.msg}.")
+    return _node(tree, expression)
+
+def _node(tree, expression):
+    # ('const', value), ('leaf', name), ('neg', node), ('add' | 'sub' | 'mul' | 'div', left, right) or ('pow', node, k)
+    operators = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div'}
+    if isinstance(tree, ast.Constant) and isinstance(tree.value, (int, float)) and not isinstance(tree.value, bool):
+        return ('const', float(tree.value))
+    if isinstance(tree, ast.Name) and tree.id == 'pi':
+        return ('const', pi)
+    if isinstance(tree, ast.Call) and isinstance(tree.func, ast.Name) and tree.func.id in TRIG:
+        if tree.keywords or len(tree.args) != 1 or not (isinstance(tree.args[0], ast.Name) and tree.args[0].id == 't'):
+            raise ValueError(f"In {expression!r}, {tree.func.id} must be applied to t alone.")
+        return ('leaf', tree.func.id)
+    if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, (ast.USub, ast.UAdd)):
+        operand = _node(tree.operand, expression)
+        if isinstance(tree.op, ast.UAdd):
+            return operand
+        return ('const', -operand[1]) if operand[0] == 'const' else ('neg', operand)
+    if isinstance(tree, ast.BinOp) and isinstance(tree.op, ast.Pow):
+        base, exponent = _node(tree.left, expression), _node(tree.right, expression)
+        if exponent[0] != 'const' or not exponent[1].is_integer():
+            raise ValueError(f"In {expression!r}, exponents must be integer constants.")
+        k = int(exponent[1])
+        if base[0] == 'const':
+            return ('const', base[1] ** k)
+        if k < 0:
+            return ('div', ('const', 1.0), ('pow', base, -k))  # x**-k is defined as 1/(x**k)
+        return ('const', 1.0) if k == 0 else base if k == 1 else ('pow', base, k)
+    if isinstance(tree, ast.BinOp) and type(tree.op) in operators:
+        operation = operators[type(tree.op)]
+        left, right = _node(tree.left, expression), _node(tree.right, expression)
+        if right == ('const', 0.0) and operation == 'div':
+            raise ValueError(f"In {expression!r}, a constant denominator is 0.")
+        if left[0] == 'const' and right[0] == 'const':
+            return ('const', _apply(operation, left[1], right[1]))
+        return (operation, left, right)
+    if isinstance(tree, ast.Name) and tree.id == 't':
+        raise ValueError(f"In {expression!r}, t may only appear inside {', '.join(TRIG)}, so the model stays periodic.")
+    raise ValueError(f"Unsupported syntax in model expression {expression!r}.")
+
+def _apply(operation, left, right):
+    if operation == 'add':
+        return left + right
+    if operation == 'sub':
+        return left - right
+    if operation == 'mul':
+        return left * right
+    return left / right
+
+# d/dt of each trig leaf.
+_LEAF_DERIVATIVES = {
+    'sin': ('leaf', 'cos'),
+    'cos': ('neg', ('leaf', 'sin')),
+    'tan': ('pow', ('leaf', 'sec'), 2),
+    'cot': ('neg', ('pow', ('leaf', 'csc'), 2)),
+    'sec': ('mul', ('leaf', 'sec'), ('leaf', 'tan')),
+    'csc': ('neg', ('mul', ('leaf', 'csc'), ('leaf', 'cot'))),
+}
+
+def differentiate(node):
+    """d/dt of a parsed expression, as a tree of the same form."""
+    kind = node[0]
+    if kind == 'const':
+        return ('const', 0.0)
+    if kind == 'leaf':
+        return _LEAF_DERIVATIVES[node[1]]
+    if kind == 'neg':
+        return _simplify('neg', differentiate(node[1]))
+    if kind == 'pow':
+        # d/dt uᵏ = k⋅uᵏ⁻¹⋅u'
+        k = node[2]
+        power = node[1] if k == 2 else ('pow', node[1], k - 1)
+        return _simplify('mul', _simplify('mul', ('const', float(k)), power), differentiate(node[1]))
+    left, right = node[1], node[2]
+    if kind in ('add', 'sub'):
+        return _simplify(kind, differentiate(left), differentiate(right))
+    if kind == 'mul':
+        return _simplify('add', _simplify('mul', differentiate(left), right), _simplify('mul', left, differentiate(right)))
+    # (u/v)' = (u'⋅v - u⋅v')/v²
+    numerator = _simplify('sub', _simplify('mul', differentiate(left), right), _simplify('mul', left, differentiate(right)))
+    return _simplify('div', numerator, ('pow', right, 2))
+
+def _simplify(operation, left, right=None):
+    # A node with constant operands folded and the zeros and ones of the derivative rules dropped
+    zero, one = ('const', 0.0), ('const', 1.0)
+    if operation == 'neg':
+        return ('const', -left[1]) if left[0] == 'const' else left[1] if left[0] == 'neg' else ('neg', left)
+    if left[0] == 'const' and right[0] == 'const':
+        return ('const', _apply(operation, left[1], right[1]))
+    if operation == 'add':
+        return right if left == zero else left if right == zero else ('add', left, right)
+    if operation == 'sub':
+        return _simplify('neg', right) if left == zero else left if right == zero else ('sub', left, right)
+    if operation == 'mul':
+        if zero in (left, right):
+            return zero
+        return right if left == one else left if right == one else ('mul', left, right)
+    return zero if left == zero else ('div', left, right)
+
+def leaves(node):
+    """The set of trig functions a parsed expression uses."""
+    if node[0] == 'leaf':
+        return {node[1]}
+    if node[0] == 'const':
+        return set()
+    return set().union(*(leaves(child) for child in node[1:] if isinstance(child, tuple)))
+
+def evaluate_tree(node, values):
+    """Evaluate a parsed expression from the values of its trig leaves; a zero denominator or a leaf at its pole gives +∞."""
+    try:
+        return _evaluate(node, values)
+    except ZeroDivisionError:
+        return float('inf')
+
+def _evaluate(node, values):
+    kind = node[0]
+    if kind == 'const':
+        return node[1]
+    if kind == 'leaf':
+        if values[node[1]] is None:
+            raise ZeroDivisionError  # tan, cot, sec or csc at its pole
+        return values[node[1]]
+    if kind == 'neg':
+        return -_evaluate(node[1], values)
+    if kind == 'pow':
+        return _evaluate(node[1], values) ** node[2]
+    left, right = _evaluate(node[1], values), _evaluate(node[2], values)
+    if kind == 'div' and right == 0:
+        raise ZeroDivisionError
+    return _apply(kind, left, right)
+
+def _exact_leaves(k):
+    # Trig values at θ = kπ/4 from the left and from the right of a pole, ±√2/2 as in h.qn_phase_table. A pole is ±∞ on
+    # each side, except cot and csc at θ = 0 (None), where sin(0.0) is exactly 0 in floating point too and the model's
+    # pole check gives +∞
+    half = sqrt(2) / 2
+    inf = float('inf')
+    sine = (0.0, half, 1.0, half, 0.0, -half, -1.0, -half)[k]
+    cosine = (1.0, half, 0.0, -half, -1.0, -half, 0.0, half)[k]
+    sides = []
+    for side in (1, -1):
+        tangent = (0.0, 1.0, side * inf, -1.0, 0.0, 1.0, side * inf, -1.0)[k]
+        cotangent = (None, 1.0, 0.0, -1.0, -side * inf, 1.0, 0.0, -1.0)[k]
+        secant = (1.0, sqrt(2), side * inf, -sqrt(2), -1.0, -sqrt(2), -side * inf, sqrt(2))[k]
+        cosecant = (None, sqrt(2), 1.0, sqrt(2), side * inf, -sqrt(2), -1.0, -sqrt(2))[k]
+        sides.append({'sin': sine, 'cos': cosine, 'tan': tangent, 'cot': cotangent, 'sec': secant, 'csc': cosecant})
+    return sides
+
+def _exact_value(node, k):
+    # Value of an expression at θ = kπ/4: infinite leaves propagate through it, and only a result that is undefined
+    # (nan, or different from the two sides of a pole) is +∞
+    left, right = [evaluate_tree(node, values) for values in _exact_leaves(k)]
+    return left if left == right else float('inf')
+
+def _float_leaves(theta):
+    return {'sin': sin(theta), 'cos': cos(theta), 'tan': tan(theta), 'cot': 1 / tan(theta), 'sec': 1 / cos(theta), 'csc': 1 / sin(theta)}
+
+def _literal(value):
+    # Source text for a constant, exact for finite floats
+    return f'({value!r})'
+
+class _Source:
+    # Straight-line source for an expression tree; scalar for the h.py-style function, otherwise NumPy with error bounds
+    def __init__(self, indent):
+        self.pad = ' ' * indent
+        self.lines = []
+        self.count = 0
+        self.checks = []  # NumPy: names of denominators whose zeros go to the scalar function
+
+    def name(self, prefix):
+        self.count += 1
+        return f'{prefix}{self.count}'
+
+    def scalar_expression(self, node):
+        kind = node[0]
+        if kind == 'const':
+            return _literal(node[1])
+        if kind == 'leaf':
+            return {'sin': 's', 'cos': 'c', 'tan': 'tn', 'cot': 'ct', 'sec': 'sc', 'csc': 'cs'}[node[1]]
+        if kind == 'neg':
+            return f'(-{self.scalar_expression(node[1])})'
+        if kind == 'pow':
+            return f'({self.scalar_expression(node[1])}**{node[2]})'
+        left = self.scalar_expression(node[1])
+        if kind == 'div' and node[2][0] != 'const':
+            denominator = self.name('d')
+            self.lines += [f"{self.pad}{denominator} = {self.scalar_expression(node[2])}",
+                           f"{self.pad}if {denominator} == 0:", f"{self.pad}    return INF  # Pole where the denominator vanishes"]
+            return f'({left} / {denominator})'
+        symbol = {'add': '+', 'sub': '-', 'mul': '*', 'div': '/'}[kind]
+        return f'({left} {symbol} {self.scalar_expression(node[2])})'
+
+    def vector_expression(self, node):
+        # Returns (value source, relative error bound): a float known at compile time or the name of an array
+        kind = node[0]
+        if kind == 'const':
+            return _literal(node[1]), 0.0
+        if kind == 'leaf':
+            return {'sin': 'sine', 'cos': 'cosine', 'tan': 'tangent', 'cot': 'cotangent', 'sec': 'secant', 'csc': 'cosecant'}[node[1]], _LEAF_ERROR[node[1]] * EPS
+        if kind == 'neg':
+            value, error = self.vector_expression(node[1])
+            return f'(-{value})', error
+        if kind == 'pow':
+            value, error = self.vector_expression(node[1])
+            return f'({value}**{node[2]})', self.bound(f'{node[2]} * ({error} + EPS)', node[2] * (error + EPS) if isinstance(error, float) else None)
+        (left, left_error), (right, right_error) = self.vector_expression(node[1]), self.vector_expression(node[2])
+        if kind in ('mul', 'div'):
+            if kind == 'div' and node[2][0] != 'const':
+                denominator = self.name('d')
+                self.lines.append(f"{self.pad}{denominator} = {right}")
+                self.checks.append(denominator)
+                right = denominator
+            value = f"({left} {'*' if kind == 'mul' else '/'} {right})"
+            if isinstance(left_error, float) and isinstance(right_error, float):
+                return value, left_error + right_error + EPS
+            return value, self.bound(f'{left_error} + {right_error} + EPS')
+        # Sums can cancel, so their bound depends on the values: (|u|⋅e(u) + |v|⋅e(v)) / |u ± v| + EPS
+        terms = [self.name('u'), self.name('u')]
+        self.lines += [f"{self.pad}{terms[0]} = {left}", f"{self.pad}{terms[1]} = {right}"]
+        value = self.name('u')
+        self.lines.append(f"{self.pad}{value} = {terms[0]} {'+' if kind == 'add' else '-'} {terms[1]}")
+        return value, self.bound(f'(np.abs({terms[0]}) * {left_error} + np.abs({terms[1]}) * {right_error}) / np.abs({value}) + EPS')
+
+    def bound(self, source, value=None):
+        if value is not None:
+            return value
+        name = self.name('e')
+        self.lines.append(f"{self.pad}{name} = {source}")
+        return name
+
+class Model:
+    """A compiled Qn model: scalar() behaves like the functions in h.py and vector() like those in h_array."""
+
+    def __init__(self, name, expression, y=0, a=1, b=1, period=2):
+        if not name.isidentifier():
+            raise ValueError(f"Model name {name!r} is not an identifier.")
+        if not isinstance(period, Rational) or period <= 0:
+            raise ValueError("The period must be a positive int or Fraction (in units of π).")
+        self.name, self.expression = name, expression
+        self.y, self.a, self.b, self.period = y, a, b, period
+        self.tree = parse(expression)
+        self.leaves = leaves(self.tree)
+        self.derivative = differentiate(self.tree)
+        self._check_period()
+        self.table = [_exact_value(self.tree, k) for k in range(8)]
+        namespace = {
+            'sin': sin, 'cos': cos, 'tan': tan, 'pi': pi, 'INF': float('inf'), 'qn_argument': h.qn_argument,
+            'round_to_limits': h.round_to_limits, 'table_value': self.table_value, 'Y0': y, 'A0': a, 'B0': b,
+        }
+        self.source = self._scalar_source()
+        exec(compile(self.source, f'<h_model {name}>', 'exec'), namespace)
+        self.scalar = namespace[name]
+        if h_array.np is not None:
+            self.vector_source = self._vector_source()
+            namespace = {'np': h_array.np, 'EPS': EPS, 'SLACK': h_array._SLACK}
+            exec(compile(self.vector_source, f'<h_model {name} kernel>', 'exec'), namespace)
+            self._raw = namespace['raw']
+            namespace = {'np': h_array.np, 'EPS': EPS, 'SLACK': h_array._SLACK}
+            exec(compile(self._vector_source(self.derivative), f'<h_model {name} slope kernel>', 'exec'), namespace)
+            self._raw_slope = namespace['raw']
+        model = self
+        def vector(x=0, y=y, a=a, b=b, decimals=2):
+            return model._vector(x, y, a, b, decimals)
+        vector.__name__ = name
+        vector.__doc__ = f"Vectorized {name}: Qn = {expression}."
+        self.vector = vector
+
+    def __repr__(self):
+        return f"Model({self.name!r}, {self.expression!r}, y={self.y!r}, a={self.a!r}, b={self.b!r}, period={self.period!r})"
+
+    def _check_period(self):
+        # θ/π is reduced modulo the period on the large-phase path, so it must really be a period of the expression
+        for theta in (0.3, 1.1, 2.0, 4.4):
+            value = evaluate_tree(self.tree, _float_leaves(theta))
+            shifted = evaluate_tree(self.tree, _float_leaves(theta + float(self.period) * pi))
+            if abs(value - shifted) > 1e-6 * max(1.0, abs(value)):
+                raise ValueError(f"{self.period}π is not a period of {self.expression!r}.")
+
+    def table_value(self, k, decimals=2):
+        """Value at θ = kπ/4, rounded like the model rounds."""
+        value = self.table[k]
+        return value if value == float('inf') else h.round_to_limits(value, decimals)
+
+    def _scalar_source(self):
+        # An h.py-style Qn function; with the default y, a and b and a float x the phase shift (yπ)/b is folded
+        folded = self.a != 0 and self.b != 0 and abs(self.y) < h.REDUCTION_THRESHOLD * abs(self.b)
+        folded = folded and all(isinstance(value, (int, float)) for value in (self.y, self.a, self.b))
+        lines = [f"def {self.name}(x=0, y=Y0, a=A0, b=B0, decimals=2):", f"    # Returns {self.expression} at θ = ((xπ)/a) - ((yπ)/b)"]
+        general = [
+            f"k, argument = qn_argument(x, y, a, b, {self.period!r})",
+            "if k is not None:", "    return table_value(k, decimals)  # Exact multiple of π/4",
+        ]
+        if folded:
+            a_literal, shift = _literal(self.a), _literal((self.y * pi) / self.b)
+            limit = _literal(h.REDUCTION_THRESHOLD * abs(self.a))
+            lines += [f"    if x.__class__ is float and y is Y0 and a is A0 and b is B0 and abs(x) < {limit}:",
+                      f"        argument = ((x * pi) / {a_literal}) - {shift}", "    else:"]
+            lines += ['        ' + line for line in general]
+        else:
+            lines += ['    ' + line for line in general]
+        uses = self.leaves
+        if uses & {'sin', 'cot', 'csc'}:
+            lines.append("    s = sin(argument)")
+        if uses & {'cos', 'tan', 'sec'}:
+            lines.append("    c = cos(argument)")
+        if uses & {'tan', 'sec'}:
+            lines += ["    if c == 0:", "        return INF  # tan(θ) and sec(θ) are undefined when cos(θ) is 0"]
+        if uses & {'cot', 'csc'}:
+            lines += ["    if s == 0:", "        return INF  # cot(θ) and csc(θ) are undefined when sin(θ) is 0"]
+        if uses & {'tan', 'cot'}:
+            lines.append("    tn = tan(argument)")
+        if 'cot' in uses:
+            lines.append("    ct = 1 / tn")
+        if 'sec' in uses:
+            lines.append("    sc = 1 / c")
+        if 'csc' in uses:
+            lines.append("    cs = 1 / s")
+        body = _Source(4)
+        result = body.scalar_expression(self.tree)
+        lines += body.lines
+        lines += [f"    result = {result}", "    return round_to_limits(result, decimals)"]
+        return '\n'.join(lines) + '\n'
+
+    def _vector_source(self, tree=None):
+        # raw(sine, cosine) -> (raw values, mask of elements to recompute with the scalar function or None) for the
+        # model's tree, or for another tree in t such as its derivative
+        tree = self.tree if tree is None else tree
+        lines = ["def raw(sine, cosine):"]
+        uses = leaves(tree)
+        if 'tan' in uses:
+            lines.append("    tangent = sine / cosine")
+        if 'cot' in uses:
+            lines.append("    cotangent = cosine / sine")
+        if 'sec' in uses:
+            lines.append("    secant = 1 / cosine")
+        if 'csc' in uses:
+            lines.append("    cosecant = 1 / sine")
+        body = _Source(4)
+        value, error = body.vector_expression(tree)
+        lines += body.lines
+        lines.append(f"    value = {value}" if uses else f"    value = np.full(sine.shape, {value})")
+        suspect = [f"({name} == 0)" for name in body.checks]
+        if isinstance(error, str):
+            suspect.append(f"~({error} <= SLACK)")  # Elements near a cancellation, where the usual slack is not enough
+        elif error > h_array._SLACK:
+            suspect.append("np.ones(sine.shape, dtype=bool)")
+        lines.append(f"    return value, {' | '.join(suspect) if suspect else 'None'}")
+        return '\n'.join(lines) + '\n'
+
+    def _vector(self, x, y, a, b, decimals):
+        if not h_array._use_numpy():
+            return h_array._map(self.scalar, x, y, a, b, decimals)
+        np = h_array.np
+        mode = h_array._rational_mode(x, y, a, b)
+        if mode == 'scalar':
+            args = [np.asarray(arg, dtype=object) if isinstance(arg, (list, tuple)) else arg for arg in (x, y, a, b)]
+            with np.errstate(all='ignore'):  # The scalar function's own float arithmetic, as in h_array._qn_scalar
+                return np.asarray(np.frompyfunc(self.scalar, 5, 1)(*args, decimals), dtype=np.float64)
+        on_grid = None
+        if mode == 'integer':
+            on_grid, quarter = h_array._quarter_turns(x, y, a, b)
+            table = np.array([self.table_value(k, decimals) for k in range(8)])
+            if on_grid.all():
+                return table[quarter]
+        args = h_array._originals(x, y, a, b)
+        x, y, a, b = h_array._operands(x, y, a, b)
+        with np.errstate(all='ignore'):
+            argument = h_array._argument(x, y, a, b)
+            sine = np.sin(argument) if self.leaves & {'sin', 'tan', 'cot', 'csc'} else np.ones(argument.shape)
+            cosine = np.cos(argument) if self.leaves & {'cos', 'tan', 'cot', 'sec'} else np.ones(argument.shape)
+            raw, suspect = self._raw(sine, cosine)
+            # Division by zero raises in h.py, and large phases are reduced exactly there, so both go to the scalar function
+            direct = h_array._divides(a, b) | h_array._large(x, y, a, b)
+            if suspect is not None:
+                direct = direct | suspect
+        pole = np.zeros(raw.shape, dtype=bool)
+        if self.leaves & {'tan', 'sec'}:
+            pole |= cosine == 0
+        if self.leaves & {'cot', 'csc'}:
+            pole |= sine == 0
+        fixed = [(pole & ~direct, float('inf'))]
+        if on_grid is not None:
+            fixed = [(pole & ~direct & ~on_grid, float('inf')), (on_grid, table[quarter])]
+        return h_array._finish(raw, args, self.scalar, fixed=fixed, suspect=direct, decimals=decimals)
+
+def compile_model(name, expression, y=0, a=1, b=1, period=2):
+    """Compile a model expression in t = θ into a Model with a scalar and a vectorized function."""
+    return Model(name, expression, y, a, b, period)
+
+def register(name, expression, h_function=None, y=0, a=1, b=1, period=2, description=None):
+    """Compile a model and add it to the registry; with an H function ('h_arctan' or 'h_sigmoid') halting_machine runs it too."""
+    if name in registry:
+        unregister(name)
+    elif hasattr(h, name):
+        raise ValueError(f"'{name}' is already defined in h.py.")
+    if h_function is not None and h_function not in ('h_arctan', 'h_sigmoid'):
+        raise ValueError(f"Unknown H function {h_function!r}, expected 'h_arctan' or 'h_sigmoid'.")
+    model = compile_model(name, expression, y, a, b, period)
+    registry[name] = model
+    definitions[name] = [name, expression, h_function, repr(y), repr(a), repr(b), repr(period), description]
+    if h_function is not None:
+        if description is None:
+            description = f"H {h_function[2:].capitalize()} with Qn = {expression}"
+        h.halting_models.append((getattr(h, h_function), model.scalar, description))
+    return model
+
+def unregister(name):
+    """Remove a model from the registry and from h.halting_models."""
+    model = registry.pop(name)
+    definitions.pop(name)
+    h.halting_models[:] = [entry for entry in h.halting_models if entry[1] is not model.scalar]
+
+def load_models(path):
+    """Register every model defined in a JSON file: a list of objects with a name and an expression, and optionally
+    h (the H function), y, a, b, period (in units of π, default 2) and description. Returns the compiled models."""
+    with open(path) as f:
+        entries = json.load(f)
+    models = []
+    for entry in entries:
+        constants = {key: _number(entry[key]) for key in ('y', 'a', 'b', 'period') if key in entry}
+        models.append(register(entry['name'], entry['expression'], entry.get('h'), description=entry.get('description'), **constants))
+    return models
+
+def _number(value):
+    # JSON numbers as given; strings such as "1/3" as exact Fractions
+    return Fraction(value) if isinstance(value, str) else value
+
+def load_environment():
+    """Register the models of the file named by HALTING_MODELS, if it is set."""
+    path = os.environ.get(MODELS_ENV)
+    return load_models(path) if path else []
@@ -0,0 +1,115 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import h
+import h_array
+import h_model
+from h_engine import run_halting_machine
+# Parallel sweep runner for the Halting Machine.
+# Every (x, model) orbit is independent, so x values are split into chunks and each (model, chunk) pair becomes one task.
+# Process mode runs the tasks on a concurrent.futures process pool; each worker writes its results straight into a
+# shared-memory (model, x, depth) cube, so nothing but the task description is pickled and the order is fixed by offsets.
+# Thread mode runs the same tasks on a thread pool over an ordinary cube, for NumPy chunks that release the GIL.
+# Models registered through h_model exist only in the parent (a spawned worker imports a fresh h.py), so process tasks
+# carry their definitions and each worker registers them once.
+
+# Starting points per task.
+PARALLEL_CHUNK = 1 << 14
+
+def _attach(name):
+    # Attach to the parent's segment; pool workers share the parent's resource tracker, which unlinks it once
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name=name)
+
+def _model(model):
+    # Tasks name the default models by index so they pickle even when h.py runs as __main__, and registered models by
+    # their definition (name, expression, H function, y, a, b, period, description)
+    if isinstance(model, int):
+        return h.halting_models[model]
+    if isinstance(model, tuple) and len(model) == 8:
+        name, expression, h_function, y, a, b, period, description = model
+        if name not in h_model.registry:
+            h_model.register(name, expression, None, y, a, b, period)  # Into the registry the engine reads, not halting_models
+        return getattr(h, h_function), h_model.registry[name].scalar, description
+    return model
+
+def _definition(model):
+    # A process task's stand-in for a model: the definition of a registered model, otherwise the model as given
+    entry = _model(model)
+    for name, compiled in h_model.registry.items():
+        if entry[1] is compiled.scalar:
+            return name, compiled.expression, entry[0].__name__, compiled.y, compiled.a, compiled.b, compiled.period, entry[2]
+    return model
+
+def _store(buffer, offset, cube):
+    # Copy a single-model chunk cube into the flat float64 buffer at offset
+    if h_array._use_numpy():
+        values = cube.reshape(-1)
+        target = h_array.np.frombuffer(buffer, dtype=h_array.np.float64, count=len(values), offset=offset * 8)
+        target[:] = values
+        return
+    view = memoryview(buffer).cast('B').cast('d')
+    rows = cube[0]
+    depth = len(rows[0]) if rows else 0
+    for j, row in enumerate(rows):
+        view[offset + j * depth:offset + (j + 1) * depth] = row
+    view.release()
+
+def _run_task(task):
+    # Worker: evaluate one model over one chunk of x values and write the rows into shared memory
+    name, model, x_chunk, depth, offset = task
+    segment = _attach(name)
+    try:
+        _store(segment.buf, offset, run_halting_machine(x_chunk, depth, [_model(model)]))
+    finally:
+        segment.close()
+    return len(x_chunk)
+
+def _tasks(x_values, depth, models, chunk_size):
+    # (model, x chunk, offset) for every model and chunk, offset counted in float64 elements of the cube
+    count = len(x_values)
+    for m, model in enumerate(models):
+        for start in range(0, count, chunk_size):
+            yield model, x_values[start:start + chunk_size], (m * count + start) * depth
+
+def _cube_from_buffer(buffer, model_count, count, depth):
+    # Copy the flat shared buffer out as the same result type run_halting_machine returns
+    if h_array._use_numpy():
+        np = h_array.np
+        return np.frombuffer(buffer, dtype=np.float64, count=model_count * count * depth).reshape(model_count, count, depth).copy()
+    flat = array('d', bytes(buffer[:model_count * count * depth * 8]))
+    return [[flat[(m * count + j) * depth:(m * count + j + 1) * depth] for j in range(count)] for m in range(model_count)]
+
+def run_halting_machine_parallel(x_values=[-1, 0, 1], depth=3, models=None, workers=None, chunk_size=PARALLEL_CHUNK, mode='process'):
+    """Run the Halting Machine over a pool of processes ('process') or threads ('thread'), returning the (model, x, depth) cube."""
+    if mode not in ('process', 'thread'):
+        raise ValueError(f"Unknown mode '{mode}', expected 'process' or 'thread'.")
+    if models is None:
+        models = list(range(len(h.halting_models)))
+    x_values = list(x_values)
+    workers = workers or os.cpu_count() or 1
+    model_count, count = len(models), len(x_values)
+    size = max(model_count * count * depth * 8, 1)
+    if mode == 'thread':
+        buffer = bytearray(size)
+        def run_task(model, x_chunk, offset):
+            _store(buffer, offset, run_halting_machine(x_chunk, depth, [_model(model)]))
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(run_task, model, x_chunk, offset) for model, x_chunk, offset in _tasks(x_values, depth, models, chunk_size)]
+            for future in futures:
+                future.result()
+        return _cube_from_buffer(buffer, model_count, count, depth)
+    segment = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        definitions = [_definition(model) for model in models]
+        tasks = [(segment.name, model, x_chunk, depth, offset) for model, x_chunk, offset in _tasks(x_values, depth, definitions, chunk_size)]
+        with ProcessPoolExecutor(workers) as pool:
+            for done in pool.map(_run_task, tasks):
+                pass
+        return _cube_from_buffer(segment.buf, model_count, count, depth)
+    finally:
+        segment.close()
+        segment.unlink()
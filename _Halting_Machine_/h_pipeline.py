@@ -0,0 +1,171 @@
+from math import sin, cos, tan, atan, exp, pi
+import h
+import h_array
+import h_memo
+# Pipeline compiler for chains of h.py functions.
+# A chain such as h_arctan(qn_tan2(h_arctan(qn_tan2(x)))) is declared innermost first, as a list of stages: each stage is
+# an h.py function name (called with its own default y, a and b) or a (name, y, a, b) tuple. compile_chain generates one
+# Python function with every stage inlined, so a call costs no Python call layers beyond its own. compile_chains does the
+# same for several chains at once: a stage in their common prefix is evaluated once, and Qn stages reading the same value
+# with the same y, a and b share one θ and one sin θ, cos θ and tan θ.
+# Every stage still rounds its result with round_to_limits, as h.py does, and the inlined code performs h.py's operations
+# in h.py's order, so results and exceptions are identical to nested calls. Inputs the inlined float path does not cover
+# (ints and Fractions on h.py's exact rational path, large phases, nan and ±∞) call the h.py Qn function itself.
+# Chain.vector evaluates the same stage graph on arrays with h_array, using qn_fused for Qn stages that share θ.
+
+# Stages that can be inlined, besides the Qn models and their preset-constant wrappers.
+_INLINE = ('halt', 'loop', 'q_inverse', 'h_arctan', 'h_sigmoid')
+
+# The float-path expression of each Qn model, from θ's sin s, cos c and tan t, and the value whose zero is its pole.
+_QN_CODE = {
+    'qn_tan2': ('c', 't**2'),
+    'qn_cot2': ('s', '1 / t**2'),
+    'qn_tan2_sin': ('c', '((t**2) * s)'),
+    'qn_cot2_cos': ('s', '((1 / t)**2) * c'),
+}
+
+def stage(spec):
+    """Normalize a stage to (name, base, y, a, b): base is the Qn model or H function the name evaluates."""
+    if isinstance(spec, str):
+        name, constants = spec, ()
+    else:
+        name, constants = spec[0], tuple(spec[1:])
+    function = getattr(h, name, None)
+    if function is None or not (name in _INLINE or name.startswith('qn_')) or name == 'qn_fused':
+        raise ValueError(f"'{name}' cannot be a pipeline stage.")
+    base = name if name in _INLINE else h_memo.base_name(function)
+    y, a, b = constants + function.__defaults__[1 + len(constants):4]
+    return name, base, y, a, b
+
+def _rounded(target, indent):
+    # round_to_limits inlined on target
+    pad = ' ' * indent
+    return [
+        f"{pad}if abs({target}) < 1e-10:", f"{pad}    {target} = 0.0",
+        f"{pad}elif {target} > 1e10:", f"{pad}    {target} = INF",
+        f"{pad}elif {target} < -1e10:", f"{pad}    {target} = -INF",
+        f"{pad}else:", f"{pad}    {target} = round({target}, DECIMALS)",
+    ]
+
+class Chain:
+    """One or more compiled chains of h.py functions: call it on a scalar x, or use vector() on arrays."""
+
+    def __init__(self, chains, decimals=2, single=False):
+        self.decimals = decimals
+        self.single = single
+        self.nodes = []  # (base, y, a, b, source node); node 0 is x
+        self.outputs = []
+        index = {}
+        for chain in chains:
+            node = 0
+            for spec in chain:
+                name, base, y, a, b = stage(spec)
+                key = (base, repr(y), repr(a), repr(b), node)
+                if key not in index:
+                    self.nodes.append((base, y, a, b, node))
+                    index[key] = len(self.nodes)
+                node = index[key]
+            self.outputs.append(node)
+        self.source = self._generate()
+        namespace = {
+            'sin': sin, 'cos': cos, 'tan': tan, 'atan': atan, 'exp': exp, 'pi': pi, 'INF': float('inf'),
+            'INFINITIES': (float('inf'), float('-inf')), 'DECIMALS': decimals,
+        }
+        for model in _QN_CODE:
+            namespace[model] = getattr(h, model)
+        for number, (base, y, a, b, source) in enumerate(self.nodes, 1):
+            namespace.update({f'y{number}': y, f'a{number}': a, f'b{number}': b})
+            if base in _QN_CODE:
+                namespace[f'limit{number}'] = h.REDUCTION_THRESHOLD * abs(a)
+                namespace[f'small{number}'] = abs(y) < h.REDUCTION_THRESHOLD * abs(b)
+        exec(compile(self.source, '<h_pipeline>', 'exec'), namespace)
+        self.scalar = namespace['chain']
+
+    def _groups(self):
+        # Qn nodes by (source, y, a, b): each group shares θ
+        groups = {}
+        for number, (base, y, a, b, source) in enumerate(self.nodes, 1):
+            if base in _QN_CODE:
+                groups.setdefault((source, repr(y), repr(a), repr(b)), []).append(number)
+        return groups
+
+    def _generate(self):
+        lines = ["def chain(v0):"]
+        groups = {numbers[0]: numbers for numbers in self._groups().values()}
+        emitted = set()
+        for number, (base, y, a, b, source) in enumerate(self.nodes, 1):
+            if number in emitted:
+                continue
+            x, t, k = f'v{source}', f'v{number}', number
+            if base in _QN_CODE:
+                numbers = groups[number]
+                emitted.update(numbers)
+                models = [self.nodes[n - 1][0] for n in numbers]
+                lines.append(f"    if {x}.__class__ is float and abs({x}) < limit{k} and small{k}:")
+                lines.append(f"        theta = (({x} * pi) / a{k}) - ((y{k} * pi) / b{k})")
+                needed = set(''.join(_QN_CODE[model][0] + _QN_CODE[model][1] for model in models))
+                for value, function in (('s', 'sin'), ('c', 'cos'), ('t', 'tan')):
+                    if value in needed:
+                        lines.append(f"        {value} = {function}(theta)")
+                for n, model in zip(numbers, models):
+                    pole, expression = _QN_CODE[model]
+                    lines += [f"        if {pole} == 0:", f"            v{n} = INF", "        else:", f"            v{n} = {expression}"]
+                    lines += _rounded(f'v{n}', 12)
+                lines.append("    else:")
+                for n, model in zip(numbers, models):
+                    lines.append(f"        v{n} = {model}({x}, y{k}, a{k}, b{k}, DECIMALS)")
+            elif base == 'halt':
+                lines.append(f"    {t} = 0*(({x}*a{k}) + (y{k}*b{k}))")
+                lines += _rounded(t, 4)
+            elif base == 'loop':
+                lines += [
+                    f"    {t} = ({x}*a{k}) + (y{k}*b{k})",
+                    f"    if {t} > 0:", f"        {t} = INF",
+                    f"    elif {t} < 0:", f"        {t} = -INF",
+                    "    else:", f"        {t} = 1",
+                ]
+            elif base == 'q_inverse':
+                lines += [
+                    f"    if ({x} + y{k}) == 0:", f"        {t} = INF",
+                    f"    elif {x} in INFINITIES or y{k} in INFINITIES:", f"        {t} = 0",
+                    "    else:", f"        {t} = 1 / (({x}*a{k}) + (y{k}*b{k}))",
+                ]
+                lines += _rounded(t, 8)
+            elif base == 'h_arctan':
+                lines.append(f"    {t} = atan((({x})/a{k}) - ((y{k})/b{k})) * (2 / pi)")
+                lines += _rounded(t, 4)
+            else:
+                lines.append(f"    {t} = 1 / (1 + exp(-(({x}*a{k}) + (y{k}*b{k}))))")
+                lines += _rounded(t, 4)
+        results = ', '.join(f'v{node}' for node in self.outputs)
+        lines.append(f"    return {results}" if self.single else f"    return ({results},)")
+        return '\n'.join(lines) + '\n'
+
+    def __call__(self, x):
+        return self.scalar(x)
+
+    def vector(self, x_values):
+        """Evaluate the chains on an array of x values with h_array, returning an array (or a tuple, one per chain)."""
+        values = {0: x_values}
+        groups = {numbers[0]: numbers for numbers in self._groups().values()}
+        for number, (base, y, a, b, source) in enumerate(self.nodes, 1):
+            if number in values:
+                continue  # Filled in by its Qn group
+            if base in _QN_CODE:
+                numbers = groups[number]
+                names = tuple(self.nodes[n - 1][0] for n in numbers)
+                values.update(zip(numbers, h_array.qn_fused(values[source], y, a, b, self.decimals, names)))
+            elif base == 'loop':
+                values[number] = h_array.loop(values[source], y, a, b)
+            else:
+                values[number] = getattr(h_array, base)(values[source], y, a, b, self.decimals)
+        outputs = tuple(values[node] for node in self.outputs)
+        return outputs[0] if self.single else outputs
+
+def compile_chain(chain, decimals=2):
+    """Compile a chain of h.py stages (innermost first) into one fused callable."""
+    return Chain([chain], decimals, single=True)
+
+def compile_chains(chains, decimals=2):
+    """Compile several chains together, sharing common prefixes and Qn arguments; the callable returns one result per chain."""
+    return Chain(chains, decimals)
@@ -0,0 +1,236 @@
+import os
+import random
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from math import sin, cos, pi, fsum, ceil, floor, log, sqrt, isfinite
+import h_array
+import h_model
+import h_quad
+# Quasi-Monte Carlo integration of n-dimensional truth densities.
+# The halting_machine docstring's ρ = Qn(Θ/α, φ/β, ..., Ω/ζ) is taken as Qn at the phase θ = Θ/α + φ/β + ... + Ω/ζ, so
+# h.py's own θ = (xπ)/a - (yπ)/b is the two dimensional case with angles (xπ, -yπ) and scalars (a, b).
+# integrate estimates ∫...∫ρ dΘ...dΩ over a box from scrambled Halton points: dimension i uses the i-th prime as its base,
+# and every digit position of every dimension is put through a random permutation of the base's digits. Each replicate
+# draws its own permutations, so the replicates are independent randomized QMC estimates; their mean is the estimate and
+# their standard error the error bar. The points per replicate double every round until the error bar meets the tolerance.
+# Replicates are evaluated in vectorized batches, in parallel over a process pool, and summed with math.fsum.
+# A box whose phase range crosses a pole of the model has an improper integral (divergent for the four h.py models, see
+# h_quad) and unbounded variance; the estimate is still returned but flagged as singular.
+# Halton points are used rather than Sobol points since they need nothing but the primes, where Sobol points need a table
+# of direction numbers per dimension.
+
+# Points per vectorized batch.
+QMC_BATCH = 1 << 14
+
+# Default number of independent scrambles, error tolerances and point budget (over all replicates).
+REPLICATES = 8
+ABS_TOL = 1e-3
+REL_TOL = 1e-3
+MAX_POINTS = 1 << 24
+
+# Digits scrambled per point; base^digits ≥ 2^53, so the scrambled tail is below float64 resolution.
+_BITS = 53
+
+# (value, error, points, replicates, converged, singular): the mean of the replicate estimates, its standard error, the
+# points evaluated over all replicates, whether the error bar met the tolerance, and whether the box crosses a pole.
+QmcEstimate = namedtuple('QmcEstimate', ['value', 'error', 'points', 'replicates', 'converged', 'singular'])
+
+# Models compiled in a worker process from their definitions, by name.
+_compiled = {}
+
+def primes(count):
+    """The first count primes, the Halton bases."""
+    found = []
+    candidate = 2
+    while len(found) < count:
+        if all(candidate % p for p in found if p * p <= candidate):
+            found.append(candidate)
+        candidate += 1
+    return found
+
+def _digits(base):
+    return ceil(_BITS * log(2) / log(base))
+
+def scrambles(dimensions, seed=0, replicate=0):
+    """Digit permutations of one replicate: scrambles(...)[i][k] permutes the k-th digit of dimension i."""
+    rng = random.Random(f"{seed}:{replicate}")
+    tables = []
+    for base in primes(dimensions):
+        permutations = []
+        for k in range(_digits(base)):
+            permutation = list(range(base))
+            rng.shuffle(permutation)
+            permutations.append(permutation)
+        tables.append(permutations)
+    return tables
+
+def halton(start, count, dimensions, seed=0, replicate=0):
+    """Scrambled Halton points start .. start + count - 1 in [0, 1)^dimensions: a (count, dimensions) array, or a list of
+    array('d') rows without NumPy. With seed=None the points are not scrambled."""
+    tables = scrambles(dimensions, seed, replicate) if seed is not None else None
+    return _halton(start, count, primes(dimensions), tables)
+
+def _halton(start, count, bases, tables):
+    # Digits past the last one that varies over the points are all 0, so their scrambled tail is one constant per dimension
+    columns = []
+    for i, base in enumerate(bases):
+        used, power = 0, 1
+        while power <= start + count - 1:
+            used, power = used + 1, power * base
+        scale, tail = base ** -used, 0.0
+        for k in range(used, _digits(base)):
+            scale /= base
+            tail += (tables[i][k][0] if tables is not None else 0) * scale
+        columns.append((base, used, tail))
+    if h_array._use_numpy():
+        np = h_array.np
+        index = np.arange(start, start + count, dtype=np.int64)
+        points = np.empty((count, len(bases)), dtype=np.float64)
+        for i, (base, used, tail) in enumerate(columns):
+            remaining, value, scale = index.copy(), np.full(count, tail), 1.0 / base
+            for k in range(used):
+                digit = remaining % base
+                if tables is not None:
+                    digit = np.asarray(tables[i][k])[digit]
+                value += digit * scale
+                remaining //= base
+                scale /= base
+            points[:, i] = value
+        return points
+    rows = []
+    for n in range(start, start + count):
+        row = array('d')
+        for i, (base, used, tail) in enumerate(columns):
+            remaining, value, scale = n, tail, 1.0 / base
+            for k in range(used):
+                digit = remaining % base
+                if tables is not None:
+                    digit = tables[i][k][digit]
+                value += digit * scale
+                remaining //= base
+                scale /= base
+            row.append(value)
+        rows.append(row)
+    return rows
+
+def _spec(model):
+    # Picklable description of a model: (name, expression, period), with expression None for the h.py models
+    name = model if isinstance(model, str) else model.__name__
+    if name in h_model.registry:
+        compiled = h_model.registry[name]
+        return name, compiled.expression, compiled.period
+    h_quad.integrand(name)  # Raises for anything but a Qn model
+    return name, None, None
+
+def _kernel(spec):
+    # The model as a function of (sin θ, cos θ), on arrays with NumPy and on floats without
+    name, expression, period = spec
+    if expression is None:
+        return h_quad.integrand(name)[0]  # The h.py models' integrands take arrays too
+    if name not in _compiled:
+        _compiled[name] = h_model.registry.get(name) or h_model.Model(name, expression, period=period)
+    model = _compiled[name]
+    if h_array._use_numpy():
+        return lambda sine, cosine: model._raw(sine, cosine)[0]
+    return lambda sine, cosine: h_model.evaluate_tree(model.tree, h_quad._leaves(sine, cosine))
+
+def truth_density(model, angles, scales=None):
+    """ρ = Qn(Θ/α + φ/β + ... + Ω/ζ) for a Qn model (unrounded, +∞ at poles), with angles[..., i] the i-th angle and
+    scales[i] its scalar (1 by default)."""
+    kernel = _kernel(_spec(model))
+    if h_array._use_numpy():
+        np = h_array.np
+        angles = np.asarray(angles, dtype=np.float64)
+        scales = np.ones(angles.shape[-1]) if scales is None else np.asarray(scales, dtype=np.float64)
+        with np.errstate(all='ignore'):
+            theta = (angles / scales).sum(axis=-1)
+            return kernel(np.sin(theta), np.cos(theta))
+    scales = scales or [1] * len(angles[0])
+    return array('d', (_value(kernel, point, scales) for point in angles))
+
+def _value(kernel, point, scales):
+    theta = fsum(angle / scale for angle, scale in zip(point, scales))
+    try:
+        return kernel(sin(theta), cos(theta))
+    except ZeroDivisionError:
+        return float('inf')
+
+def _replicate_sum(task):
+    # Worker: fsum of ρ over Halton points start .. start + count - 1 of one replicate, mapped onto the box
+    spec, seed, replicate, start, count, lower, upper, scales, batch = task
+    kernel = _kernel(spec)
+    dimensions = len(lower)
+    bases, tables = primes(dimensions), scrambles(dimensions, seed, replicate)
+    sums = []
+    for offset in range(start, start + count, batch):
+        size = min(batch, start + count - offset)
+        points = _halton(offset, size, bases, tables)
+        if h_array._use_numpy():
+            np = h_array.np
+            with np.errstate(all='ignore'):
+                theta = ((np.asarray(lower) + points * (np.asarray(upper) - np.asarray(lower))) / np.asarray(scales)).sum(axis=1)
+                sums.append(fsum(kernel(np.sin(theta), np.cos(theta)).tolist()))
+        else:
+            for point in points:
+                angles = [lo + u * (hi - lo) for u, lo, hi in zip(point, lower, upper)]
+                sums.append(_value(kernel, angles, scales))
+    return fsum(sums)
+
+def _singular(spec, lower, upper, scales):
+    # Whether the phase range of the box has a pole of the model inside it; the poles repeat with the model's period
+    g, period = h_quad.integrand(spec[0])
+    ends = [(lo / scale, hi / scale) for lo, hi, scale in zip(lower, upper, scales)]
+    low, high = fsum(min(end) for end in ends), fsum(max(end) for end in ends)
+    first, last = floor(low / (pi / 2)), ceil(high / (pi / 2))
+    for k in range(first, min(last, first + 4 * int(ceil(period))) + 1):
+        if low < k * pi / 2 < high and h_quad._classify(h_quad._rotated(g, k), k * pi / 2, low, high)[0] is not None:
+            return True
+    # Zeros of a registered model's denominators off the grid, over one period
+    zeros, evaluations = h_quad.denominator_zeros(spec[0], low, min(high, low + float(period) * pi))
+    for p in zeros:
+        if low < p < high and h_quad._classify(h_quad._shifted(g, p), p, low, high)[0] is not None:
+            return True
+    return False
+
+def integrate(model, lower, upper, scales=None, abs_tol=ABS_TOL, rel_tol=REL_TOL, replicates=REPLICATES, max_points=MAX_POINTS,
+              seed=0, workers=None, batch=QMC_BATCH):
+    """Randomized QMC estimate of ∫...∫ρ dΘ...dΩ over the box lower[i] ≤ Θ_i ≤ upper[i], with ρ as in truth_density.
+    Stops once the standard error over the replicates is within max(abs_tol, rel_tol⋅|value|), or after max_points points;
+    the replicates run on a pool of workers processes (in this process if workers is 1)."""
+    lower, upper = [float(lo) for lo in lower], [float(hi) for hi in upper]
+    if len(lower) != len(upper) or not lower:
+        raise ValueError("lower and upper must give the same number (at least one) of dimensions.")
+    scales = [1.0] * len(lower) if scales is None else [float(scale) for scale in scales]
+    if len(scales) != len(lower):
+        raise ValueError("scales must give one scalar per dimension.")
+    if replicates < 2:
+        raise ValueError("At least 2 replicates are needed for an error bar.")
+    spec = _spec(model)
+    volume = 1.0
+    for lo, hi in zip(lower, upper):
+        volume *= hi - lo
+    singular = _singular(spec, lower, upper, scales)
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        sums = [[] for r in range(replicates)]
+        done, size = 0, batch
+        while True:
+            tasks = [(spec, seed, r, done, size, lower, upper, scales, batch) for r in range(replicates)]
+            for r, total in enumerate(pool.map(_replicate_sum, tasks) if pool else map(_replicate_sum, tasks)):
+                sums[r].append(total)
+            done += size
+            estimates = [volume * fsum(replicate) / done for replicate in sums]
+            value = fsum(estimates) / replicates
+            if all(isfinite(estimate) for estimate in estimates):
+                error = sqrt(fsum((estimate - value) ** 2 for estimate in estimates) / (replicates - 1) / replicates)
+            else:
+                error = float('nan')
+            converged = error <= max(abs_tol, rel_tol * abs(value))
+            if converged or not isfinite(error) or done * replicates * 2 > max_points:
+                return QmcEstimate(value, error, done * replicates, replicates, converged, singular)
+            size = done  # Double the points per replicate
+    finally:
+        if pool is not None:
+            pool.shutdown()
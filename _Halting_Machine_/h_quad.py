@@ -0,0 +1,363 @@
+import heapq
+from collections import namedtuple
+from math import sin, cos, pi, fsum, floor, ceil, isfinite, log2, copysign
+import h
+import h_memo
+import h_model
+# Pole-aware adaptive quadrature of ∫Qn(θ)dθ.
+# Every Qn model is built from sin θ and cos θ, so its poles and zeros lie on the grid θ = kπ/2. The models compiled by
+# h_model can also have poles where a denominator such as sin(t) - 0.5 vanishes; those are found from the model's tree by
+# scanning each factor of each denominator for sign changes and touching minima, and refining them to the float nearest
+# the zero. The interval is split at every grid point and denominator zero, each is classified from the growth of the
+# integrand next to it (regular, or a pole of order m with leading coefficient c, Qn ≈ c/(θ - p)^m), and the pieces are
+# integrated with adaptive Gauss–Kronrod (7–15 point) quadrature under one global error budget, summing with math.fsum.
+# Around an interior pole p the integrand is folded onto u = |θ - p| and evaluated from the exact sin u and cos u rotated
+# by the quarter turns of p (off the grid, by the angle-addition formulas from sin p and cos p), so no rounding of θ
+# happens next to the pole. The fold f(u) + f(-u) cancels the odd terms of the Laurent series: if it is bounded (a simple
+# pole, say) the result is the principal value. If it grows like 2c/u² (a double pole, like every pole of the four h.py
+# models) the integral diverges to sign(c)⋅∞; subtracting 2c/u² leaves a smooth integrand, and adding back the finite
+# part -2c/h of ∫c/u² over [-h, h] gives Hadamard's finite part, the sense in which ∫Qn(θ)dθ over a period averages out
+# as the halting_machine docstring says.
+# Divergent integrals report +∞, -∞, or nan where poles diverge both ways. Poles at a limit, folds growing faster than
+# 1/u² and double poles off the grid (whose folds cancel their leading digits next to the pole) leave the finite part
+# undefined (nan) and are not integrated at all. An estimate that still comes out ±∞ or nan met a singularity none of
+# this found, and is reported as 'unknown' rather than as a proper integral.
+
+# Gauss–Kronrod 7–15 abscissae on [0, 1] (the rule is symmetric) with their Kronrod and Gauss weights (from QUADPACK's qk15).
+_XGK = (
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851, 0.864864423359769072789712788640926,
+    0.741531185599394439863864773280788, 0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.0,
+)
+_WGK = (
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204, 0.104790010322250183839876322541518,
+    0.140653259715525918745189590510238, 0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+)
+# Gauss weights of the abscissae _XGK[1], _XGK[3], _XGK[5] and _XGK[7].
+_WG = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780, 0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+_EPS = 2.0 ** -52
+
+# Default error tolerances and evaluation budget.
+ABS_TOL = 1e-10
+REL_TOL = 1e-10
+LIMIT = 20000
+
+# Offsets from a grid point at which its pole order is measured; powers of two, so p ± u is exact for |p| < 2^40.
+_PROBE = 2.0 ** -12
+_PROBE_FAR = 2.0 ** -22
+
+# Samples per π/2 when scanning denominators for zeros off the grid.
+_SCAN = 256
+
+# Largest |denominator| at a refined zero, relative to the denominator's scale around it; sign changes across a pole of
+# the denominator itself (tan(t) - 1 at π/2, say) refine to huge values instead.
+_ZERO = 1e-8
+
+# The h.py models as functions of s = sin θ and c = cos θ.
+_INTEGRANDS = {
+    'qn_tan2': lambda s, c: (s / c) ** 2,
+    'qn_cot2': lambda s, c: (c / s) ** 2,
+    'qn_tan2_sin': lambda s, c: ((s / c) ** 2) * s,
+    'qn_cot2_cos': lambda s, c: ((c / s) ** 2) * c,
+}
+
+# A pole at theta of the given order with leading coefficient, Qn ≈ coefficient/(θ - theta)^order; interior is False at an endpoint.
+Singularity = namedtuple('Singularity', ['theta', 'order', 'coefficient', 'interior'])
+
+# kind is 'proper', 'principal value', 'divergent' or 'unknown' (a non-finite estimate from a singularity that was not
+# found); value is ±∞ (or nan for ∞ - ∞) when divergent, and finite_part the regularized value (equal to value otherwise).
+# error bounds the finite part, and evaluations counts integrand calls.
+Integral = namedtuple('Integral', ['value', 'error', 'evaluations', 'kind', 'finite_part', 'singularities'])
+
+def integrand(model):
+    """The model (an h.py Qn function or its name, or a model registered with h_model) as a function of (sin θ, cos θ),
+    and its period in units of π."""
+    name = model if isinstance(model, str) else model.__name__
+    if name in h_model.registry:
+        compiled = h_model.registry[name]
+        tree = compiled.tree
+        return (lambda s, c: h_model.evaluate_tree(tree, _leaves(s, c))), compiled.period
+    function = getattr(h, name, None)
+    base = h_memo.base_name(function) if callable(function) else None
+    if base not in _INTEGRANDS:
+        raise ValueError(f"'{name}' is not a Qn model.")
+    return _INTEGRANDS[base], h.qn_periods[base]
+
+def _leaves(s, c):
+    # Trig leaves for h_model.evaluate_tree, with None at a pole
+    return {
+        'sin': s, 'cos': c, 'tan': s / c if c else None, 'cot': c / s if s else None,
+        'sec': 1 / c if c else None, 'csc': 1 / s if s else None,
+    }
+
+def _denominators(node):
+    # The factors of the non-constant denominators of a parsed h_model expression that can vanish off the grid
+    kind = node[0]
+    if kind in ('const', 'leaf'):
+        return []
+    if kind in ('neg', 'pow'):
+        return _denominators(node[1])
+    found = _denominators(node[1]) + _denominators(node[2])
+    if kind == 'div':
+        found += _factors(node[2])
+    return found
+
+def _factors(node):
+    # Products, powers and negations split into their factors; leaves vanish on the grid only
+    kind = node[0]
+    if kind == 'mul':
+        return _factors(node[1]) + _factors(node[2])
+    if kind in ('neg', 'pow'):
+        return _factors(node[1])
+    return [] if kind in ('const', 'leaf') else [node]
+
+def _refine(d, a, b, crossing):
+    # Float nearest a zero of d in [a, b]: bisection of a sign change, or golden-section search of a touching minimum of |d|
+    if crossing:
+        da = d(a)
+        while True:
+            middle = (a + b) / 2
+            if not a < middle < b:
+                return min((a, b), key=lambda theta: abs(d(theta)))
+            dm = d(middle)
+            if dm == 0:
+                return middle
+            if (dm < 0) == (da < 0):
+                a, da = middle, dm
+            else:
+                b = middle
+    ratio = (5 ** 0.5 - 1) / 2
+    while True:
+        c, e = b - ratio * (b - a), a + ratio * (b - a)
+        if not a < c < e < b:
+            return min((a, b), key=lambda theta: abs(d(theta)))
+        if abs(d(c)) <= abs(d(e)):
+            b = e
+        else:
+            a = c
+
+def denominator_zeros(model, lower, upper):
+    """Zeros of the denominators of a registered h_model model in [lower, upper] off the grid kπ/2, in increasing order
+    (none for the h.py models, whose poles all lie on the grid); also returns the denominator evaluations spent."""
+    name = model if isinstance(model, str) else model.__name__
+    if name not in h_model.registry:
+        return [], 0
+    zeros, evaluations = [], 0
+    count = max(2, ceil((upper - lower) / (pi / 2) * _SCAN))
+    samples = [lower + (upper - lower) * i / count for i in range(count)] + [upper]
+    for factor in _denominators(h_model.registry[name].tree):
+        d = lambda theta, factor=factor: h_model.evaluate_tree(factor, _leaves(sin(theta), cos(theta)))
+        values = [d(theta) for theta in samples]
+        evaluations += len(samples)
+        for i, value in enumerate(values):
+            candidate = None
+            if value == 0:
+                candidate = samples[i]
+            elif i and isfinite(value) and isfinite(values[i - 1]) and (value < 0) != (values[i - 1] < 0) and values[i - 1]:
+                candidate = _refine(d, samples[i - 1], samples[i], True)
+            elif 0 < i < count and abs(value) < abs(values[i - 1]) and abs(value) <= abs(values[i + 1]):
+                candidate = _refine(d, samples[i - 1], samples[i + 1], False)
+            if candidate is None:
+                continue
+            scale = max(abs(values[j]) for j in (i - 1, i, min(i + 1, count)) if isfinite(values[j]))
+            if abs(d(candidate)) <= _ZERO * scale:
+                zeros.append(candidate)
+    # Zeros on the grid are classified there, and a zero found twice (in two factors, or by both searches) counts once
+    grid = [round(theta / (pi / 2)) * pi / 2 for theta in zeros]
+    zeros = sorted(theta for theta, p in zip(zeros, grid) if abs(theta - p) > _PROBE_FAR)
+    return [theta for i, theta in enumerate(zeros) if not i or theta - zeros[i - 1] > _PROBE_FAR], evaluations
+
+def _shifted(g, p):
+    # u ↦ Qn(p + u) off the grid, from sin p and cos p by the angle-addition formulas
+    sine, cosine = sin(p), cos(p)
+    return lambda u: g(sine * cos(u) + cosine * sin(u), cosine * cos(u) - sine * sin(u))
+
+def _rotated(g, k):
+    # u ↦ Qn(kπ/2 + u), from the exact sin u and cos u
+    k %= 4
+    if k == 0:
+        return lambda u: g(sin(u), cos(u))
+    if k == 1:
+        return lambda u: g(cos(u), -sin(u))
+    if k == 2:
+        return lambda u: g(-sin(u), -cos(u))
+    return lambda u: g(-cos(u), sin(u))
+
+def _order(f, side):
+    # Pole order m ≥ 1 of f(side⋅u) as u → 0+, or 0 if f stays bounded
+    near, far = abs(f(side * _PROBE_FAR)), abs(f(side * _PROBE))
+    if near == 0 or far == 0:
+        return 0
+    order = round(log2(min(near, 1e300) / far) / log2(_PROBE / _PROBE_FAR))
+    return max(order, 0)
+
+def _classify(f, p, lower, upper):
+    # Singularity at p (None if regular), with f(u) = Qn(p + u), the order and leading coefficient of its folded part
+    # f(u) + f(-u) (interior poles only), and the number of evaluations spent
+    sides = [side for side, inside in ((1, p < upper), (-1, p > lower)) if inside]
+    order = max(_order(f, side) for side in sides)
+    evaluations = 2 * len(sides)
+    if order == 0:
+        return None, None, evaluations
+    u = _PROBE
+    if len(sides) == 1:
+        side = sides[0]
+        def leading(u):
+            return (side * u) ** order * f(side * u)
+        coefficient = 2 * leading(u / 2) - leading(u)  # Richardson extrapolation of c + O(u)
+        return Singularity(p, order, coefficient, False), None, evaluations + 4
+    # Richardson extrapolation of uᵐ⋅(f(u) + (-1)ᵐ⋅f(-u))/2 = c + O(u²)
+    def leading(u, order=order, sign=(-1) ** order):
+        return u ** order * (f(u) + sign * f(-u)) / 2
+    coefficient = (4 * leading(u / 2) - leading(u)) / 3
+    evaluations += 4
+    folded = order
+    if order % 2:
+        # Odd terms cancel in the fold, leaving the even terms of the Laurent series (none for a simple pole)
+        folded = _order(lambda u: f(u) + f(-u), 1)
+        evaluations += 4
+    even = coefficient if folded == order else (4 * leading(u / 2, folded, 1) - leading(u, folded, 1)) / 3
+    if folded not in (0, order):
+        evaluations += 4
+    return Singularity(p, order, coefficient, True), (folded, even), evaluations
+
+def _kronrod(f, a, b):
+    # Gauss–Kronrod 7–15 estimate of ∫f over [a, b] and its QUADPACK error estimate
+    center, half = (a + b) / 2, (b - a) / 2
+    fc = f(center)
+    pairs = [(f(center - half * x), f(center + half * x)) for x in _XGK[:7]]
+    kronrod = fsum([_WGK[7] * fc] + [w * (l + r) for w, (l, r) in zip(_WGK, pairs)])
+    gauss = fsum([_WG[3] * fc] + [_WG[j] * (l + r) for j, (l, r) in enumerate(pairs[1::2])])
+    mean = kronrod / 2
+    absolute = fsum([_WGK[7] * abs(fc)] + [w * (abs(l) + abs(r)) for w, (l, r) in zip(_WGK, pairs)]) * abs(half)
+    spread = fsum([_WGK[7] * abs(fc - mean)] + [w * (abs(l - mean) + abs(r - mean)) for w, (l, r) in zip(_WGK, pairs)]) * abs(half)
+    error = abs((kronrod - gauss) * half)
+    if spread != 0 and error != 0:
+        error = spread * min(1.0, (200 * error / spread) ** 1.5)
+    if absolute > 1e-290:
+        error = max(50 * _EPS * absolute, error)
+    return kronrod * half, error
+
+def _adaptive(pieces, abs_tol, rel_tol, limit, evaluations=0):
+    # Global adaptive bisection of the pieces (f, a, b, calls per evaluation of f) under one error budget
+    heap = []
+    for order, (f, a, b, calls) in enumerate(pieces):
+        value, error = _kronrod(f, a, b)
+        evaluations += 15 * calls
+        heap.append((-error, order, f, a, b, calls, value))
+    heapq.heapify(heap)
+    count = len(heap)
+    while heap:
+        total = fsum(entry[6] for entry in heap)
+        error = fsum(-entry[0] for entry in heap)
+        if error <= max(abs_tol, rel_tol * abs(total)) or evaluations >= limit:
+            return total, error, evaluations
+        worst, order, f, a, b, calls, value = heapq.heappop(heap)
+        middle = (a + b) / 2
+        for lo, hi in ((a, middle), (middle, b)):
+            value, error = _kronrod(f, lo, hi)
+            evaluations += 15 * calls
+            count += 1
+            heapq.heappush(heap, (-error, count, f, lo, hi, calls, value))
+    return 0.0, 0.0, evaluations
+
+def integrate(model, lower, upper, abs_tol=ABS_TOL, rel_tol=REL_TOL, limit=LIMIT):
+    """∫Qn(θ)dθ from lower to upper for a Qn model (an h.py function or name, or a registered h_model model).
+    Returns an Integral: the value (a principal value across simple poles, ±∞ or nan across non-integrable ones), its error
+    estimate, the integrand and denominator evaluations spent, the kind of integral, Hadamard's finite part, and the
+    poles found."""
+    g, period = integrand(model)
+    if lower > upper:
+        result = integrate(model, upper, lower, abs_tol, rel_tol, limit)
+        return result._replace(value=-result.value, finite_part=-result.finite_part)
+    if lower == upper or not (isfinite(lower) and isfinite(upper)):
+        if lower == upper:
+            return Integral(0.0, 0.0, 0, 'proper', 0.0, ())
+        raise ValueError("The limits of integration must be finite.")
+    # Grid points kπ/2 in [lower, upper], counting a limit within a few ulps of one as on it
+    first, last = ceil(lower / (pi / 2)), floor(upper / (pi / 2))
+    grid = []
+    for k in range(first - 1, last + 2):
+        p = k * pi / 2
+        if lower - 4 * _EPS * abs(p) <= p <= upper + 4 * _EPS * abs(p):
+            grid.append(k)
+    zeros, evaluations = denominator_zeros(model, lower, upper)
+    candidates = [(k * pi / 2, _rotated(g, k)) for k in grid] + [(p, _shifted(g, p)) for p in zeros]
+    singularities, folds, shifts, points = [], {}, {}, [lower, upper]
+    for p, f in sorted(candidates, key=lambda candidate: candidate[0]):
+        singularity, fold, calls = _classify(f, p, lower, upper)
+        evaluations += calls
+        if singularity is None:
+            if lower < p < upper:
+                points.append(p)
+            continue
+        singularities.append(singularity)
+        folds[p], shifts[p] = fold, f
+        if not singularity.interior:
+            # Snap the limit onto the pole
+            if abs(p - lower) < abs(p - upper):
+                lower = points[0] = p
+            else:
+                upper = points[1] = p
+    # Divergence: the signs of ∞ the poles contribute
+    signs = set()
+    regular = True
+    for singularity in singularities:
+        if not singularity.interior:
+            side = 1 if singularity.theta == lower else -1
+            signs.add(copysign(1.0, singularity.coefficient * side ** singularity.order))
+            regular = False
+            continue
+        folded, even = folds[singularity.theta]
+        if folded:
+            signs.add(copysign(1.0, even))
+            # Off the grid the fold loses its leading digits to cancellation next to the pole, so only principal values
+            # are taken there
+            regular = regular and folded == 2 and singularity.theta not in zeros
+    if regular:
+        finite_part, error, evaluations = _finite_part(g, sorted(points), singularities, folds, shifts, abs_tol, rel_tol, limit,
+                                                       evaluations)
+    else:
+        finite_part, error = float('nan'), float('nan')
+    if signs:
+        value = signs.pop() * float('inf') if len(signs) == 1 else float('nan')
+        kind = 'divergent'
+    else:
+        value = finite_part
+        kind = 'principal value' if singularities else 'proper'
+        if not isfinite(value):
+            kind = 'unknown'
+    return Integral(value, error, evaluations, kind, finite_part, tuple(singularities))
+
+def _finite_part(g, points, singularities, folds, shifts, abs_tol, rel_tol, limit, evaluations):
+    # Finite part over [lower, upper]: regular pieces between the breakpoints and a folded piece around each pole
+    poles = {singularity.theta: singularity for singularity in singularities}
+    edges = sorted(set(points) | set(poles))
+    widths = {}
+    for i, edge in enumerate(edges):
+        if edge in poles:
+            # Half-width of the folded piece: half the distance to the neighbouring breakpoints
+            widths[edge] = min(edge - edges[i - 1], edges[i + 1] - edge) / 2
+    pieces, corrections = [], []
+    for singularity in singularities:
+        p = singularity.theta
+        folded, even = folds[p]
+        f, half = shifts[p], widths[p]
+        if folded == 0:
+            pieces.append((lambda u, f=f: f(u) + f(-u), 0.0, half, 2))
+        else:
+            pieces.append((lambda u, f=f, c=even: f(u) + f(-u) - (2 * c) / (u * u), 0.0, half, 2))
+            corrections.append(-2 * even / half)
+    for a, b in zip(edges, edges[1:]):
+        a, b = a + widths.get(a, 0.0), b - widths.get(b, 0.0)
+        if a < b:
+            pieces.append((lambda theta: g(sin(theta), cos(theta)), a, b, 1))
+    total, error, evaluations = _adaptive(pieces, abs_tol, rel_tol, limit, evaluations)
+    return fsum([total] + corrections), error, evaluations
+
+def period_integral(model, start=pi / 4, abs_tol=ABS_TOL, rel_tol=REL_TOL, limit=LIMIT):
+    """∫Qn(θ)dθ over one period of the model, [start, start + period⋅π]; the default start keeps poles off the limits."""
+    g, period = integrand(model)
+    return integrate(model, start, start + float(period) * pi, abs_tol, rel_tol, limit)
@@ -0,0 +1,634 @@
+import json
+import mmap
+import os
+import random
+from array import array
+from itertools import combinations, permutations
+from math import copysign, isfinite, pi
+import h
+import h_array
+import h_chunk
+import h_memo
+# Out-of-core parameter sweeps over the (x, y, a, b) grid.
+# Any Qn or H function is evaluated over the Cartesian product of four axes, tile by tile, straight into a
+# memory-mapped file: a 4-byte header length, a JSON header describing the axes, then the float64 grid in C order.
+# Tiles are contiguous runs of the flat grid sized to stay in cache, so grids much larger than RAM stream through
+# the page cache. A progress file next to the output records finished tiles, and rerunning the same sweep resumes there.
+# dtype='float32' stores the grid in float32 through h_chunk's float32 mode; check_precision reports its deviation.
+
+AXES = ('x', 'y', 'a', 'b')
+
+# Header dtype and array typecode of each storage precision.
+DTYPES = {'float64': ('<f8', 'd'), 'float32': ('<f4', 'f')}
+
+# Grid points per tile (256 KiB of float64).
+TILE_SIZE = 1 << 15
+
+# Tiles between flushing the mapped file and recording progress.
+CHECKPOINT_TILES = 64
+
+def linspace(start, stop, count):
+    """Return count evenly spaced values from start to stop inclusive, as a list of floats."""
+    if count == 1:
+        return [float(start)]
+    step = (stop - start) / (count - 1)
+    return [start + i * step for i in range(count - 1)] + [float(stop)]
+
+def _axis(values):
+    # A single number or any sequence of numbers becomes a list of floats,
+    # or of ints when every value is an integer, so integer grids keep h.py's exact rational phases
+    if isinstance(values, (int, float)):
+        values = [values]
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return [int(value) for value in values]
+    return [float(value) for value in values]
+
+def _header(function, axes, decimals, errors, tile_size, dtype='float64'):
+    shape = [len(axes[name]) for name in AXES]
+    return {
+        "function": function, "decimals": decimals, "errors": errors, "dtype": DTYPES[dtype][0],
+        "axes": {name: axes[name] for name in AXES}, "shape": shape, "tile_size": tile_size,
+    }
+
+def _progress_path(path):
+    return path + '.progress'
+
+def _read_header(f):
+    size = int.from_bytes(f.read(4), 'little')
+    return json.loads(f.read(size)), 4 + size
+
+def _typecode(header):
+    return 'f' if header["dtype"] == DTYPES['float32'][0] else 'd'
+
+def _create(path, header, count):
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(len(encoded) + 4) % 8)
+    with open(path, 'wb') as f:
+        f.write(len(encoded).to_bytes(4, 'little'))
+        f.write(encoded)
+        f.truncate(4 + len(encoded) + array(_typecode(header)).itemsize * count)  # Sparse until each tile is written
+
+def _tiles_done(path, header):
+    # Resume point: the finished tile count recorded for a file whose header matches this sweep
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        existing, offset = _read_header(f)
+    if existing != header:
+        return None
+    if not os.path.exists(_progress_path(path)):
+        return 0
+    with open(_progress_path(path)) as f:
+        return json.load(f)["tiles_done"]
+
+def _record_progress(path, tiles_done):
+    # Written to a temporary file and renamed, so an interruption never leaves a torn progress record
+    temporary = _progress_path(path) + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump({"tiles_done": tiles_done}, f)
+    os.replace(temporary, _progress_path(path))
+
+def _evaluate_tile(func, scalar, axes, shape, start, stop, decimals, errors):
+    # Evaluate the flat grid indices start .. stop - 1
+    if h_array._use_numpy():
+        np = h_array.np
+        coordinates = np.unravel_index(np.arange(start, stop), shape)
+        args = [axes[name][index] for name, index in zip(AXES, coordinates)]
+    else:
+        args = [[] for name in AXES]
+        for flat in range(start, stop):
+            for axis in range(len(AXES) - 1, -1, -1):
+                flat, index = divmod(flat, shape[axis])
+                args[axis].append(axes[AXES[axis]][index])
+    return _evaluate_points(func, scalar, args, decimals, errors)
+
+def _evaluate_points(func, scalar, args, decimals, errors):
+    try:
+        return func(*args, **decimals)
+    except (OverflowError, ZeroDivisionError, ValueError):
+        if errors == 'raise':
+            raise
+    # Points where h.py raises are stored as nan
+    results = array('d')
+    for point in zip(*[h_array.as_list(arg) if not isinstance(arg, list) else arg for arg in args]):
+        try:
+            results.append(scalar(*point, **decimals))
+        except (OverflowError, ZeroDivisionError, ValueError):
+            results.append(float('nan'))
+    return results
+
+def _float32(function):
+    # h_chunk's float32 mode of function, called like the h_array function
+    def evaluate(x, y, a, b, decimals=2):
+        return h_chunk.evaluate(function, x, y, a, b, decimals=decimals, dtype='float32')
+    return evaluate
+
+def sweep(function, path, x=0, y=0, a=1, b=1, decimals=2, errors='nan', tile_size=TILE_SIZE, checkpoint=CHECKPOINT_TILES,
+          symmetry=False, dtype='float64'):
+    """Evaluate an h.py function over the (x, y, a, b) grid into a memory-mapped file, resuming an interrupted run.
+
+    With symmetry=True each point is mapped to its fundamental-domain representative, by sign flips or by its phase modulo
+    the model's period, the representatives are evaluated once and the results scattered back; header["symmetry"] reports
+    the achieved reduction factor.
+    dtype='float32' computes and stores the grid in h_chunk's float32 mode.
+    """
+    if errors not in ('nan', 'raise'):
+        raise ValueError(f"Unknown errors mode '{errors}', expected 'nan' or 'raise'.")
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown dtype '{dtype}', expected 'float64' or 'float32'.")
+    if not hasattr(h_array, function) or not hasattr(h, function):
+        raise ValueError(f"Unknown function '{function}'.")
+    func, scalar = getattr(h_array, function), getattr(h, function)
+    if dtype == 'float32' and h_array._use_numpy():
+        func = _float32(function)
+    axes = {name: _axis(values) for name, values in zip(AXES, (x, y, a, b))}
+    header = _header(function, axes, decimals, errors, tile_size, dtype)
+    shape = header["shape"]
+    count = shape[0] * shape[1] * shape[2] * shape[3]
+    # loop() has no rounding, so it takes no decimals argument
+    arguments = {} if function == 'loop' else {"decimals": decimals}
+    grid = {name: h_array.np.asarray(axes[name]) for name in AXES} if h_array._use_numpy() else axes
+    scheme = phases = None
+    if symmetry:
+        scheme, representatives = fundamental_domain(function, axes)
+        header["symmetry"] = _symmetry_report(scheme, representatives, count)
+        # Phase classes replace the sign flips where they shrink the grid further
+        phases = _phases(func, scalar, grid, shape, arguments, errors, dtype)
+        if phases is not None and phases.collect(count, tile_size) and phases.size < header["symmetry"]["representatives"]:
+            header["symmetry"] = phases.report(count)
+        else:
+            phases = None
+    tiles_done = _tiles_done(path, header)
+    if tiles_done is None:
+        _create(path, header, count)
+        tiles_done = 0
+    tile_count = (count + tile_size - 1) // tile_size
+    if tiles_done >= tile_count:
+        _record_progress(path, tile_count)
+        return header
+    if phases is not None:
+        _run_tiles(path, count, tile_size, checkpoint, tiles_done, phases, DTYPES[dtype][1])
+        return header
+    if not scheme:
+        evaluate = lambda start, stop: _evaluate_tile(func, scalar, grid, shape, start, stop, arguments, errors)
+        _run_tiles(path, count, tile_size, checkpoint, tiles_done, evaluate, DTYPES[dtype][1])
+        return header
+    # The representatives are a sweep of their own, so an interruption there resumes too
+    fundamental = path + '.fundamental'
+    sweep(function, fundamental, **representatives, decimals=decimals, errors='nan', tile_size=tile_size, checkpoint=checkpoint,
+          dtype=dtype)
+    rep_header, rep_values = open_sweep(fundamental)
+    if h_array._use_numpy():
+        rep_values = rep_values.reshape(-1)
+    scatter = _Scatter(function, func, scalar, axes, grid, scheme, representatives, arguments, errors)
+    evaluate = lambda start, stop: scatter(rep_values, start, stop)
+    _run_tiles(path, count, tile_size, checkpoint, tiles_done, evaluate, DTYPES[dtype][1])
+    del rep_values
+    os.remove(fundamental)
+    os.remove(_progress_path(fundamental))
+    return header
+
+def _run_tiles(path, count, tile_size, checkpoint, tiles_done, evaluate, typecode='d'):
+    # Write evaluate(start, stop) into the mapped grid tile by tile, checkpointing progress
+    tile_count = (count + tile_size - 1) // tile_size
+    itemsize = array(typecode).itemsize
+    with open(path, 'r+b') as f:
+        existing, data_offset = _read_header(f)
+        mapped = mmap.mmap(f.fileno(), 0)
+        values = memoryview(mapped)[data_offset:data_offset + itemsize * count].cast(typecode)
+        try:
+            flushed = tiles_done
+            for tile in range(tiles_done, tile_count):
+                start = tile * tile_size
+                stop = min(start + tile_size, count)
+                results = evaluate(start, stop)
+                if isinstance(results, array):
+                    if results.typecode != typecode:
+                        results = array(typecode, results)
+                else:
+                    results = results.reshape(-1).astype(typecode, copy=False)
+                values[start:stop] = results
+                if tile + 1 - flushed >= checkpoint or tile + 1 == tile_count:
+                    # Flush the pages written since the last checkpoint before recording them as done
+                    first = (data_offset + itemsize * flushed * tile_size) // mmap.PAGESIZE * mmap.PAGESIZE
+                    mapped.flush(first, data_offset + itemsize * stop - first)
+                    _record_progress(path, tile + 1)
+                    flushed = tile + 1
+        finally:
+            values.release()
+            mapped.close()
+
+# Symmetric sweeps.
+# Every Qn model depends on (x, y, a, b) only through θ = ((xπ)/a) - ((yπ)/b), h_arctan through x/a - y/b and h_sigmoid
+# through x⋅a + y⋅b. Flipping the signs of x and a together (or of y and b) leaves each of these unchanged bit for bit,
+# and flipping x and y together negates θ exactly, under which tan², cot² and cot²⋅cos are even and tan²⋅sin and arctan odd.
+# The sign flips make chosen axes non-negative, the grid of representatives is swept once and scattered back. Negating θ
+# is not exact for the large phases h.py reduces, nor for the sign of zero, ±∞ and nan results of the odd functions, so
+# such points are evaluated directly. The flips keep the representatives a grid of their own, so they work out of core
+# and without NumPy; shifts of θ by the period need the phase classes below.
+
+# Sign flips leaving the phase unchanged, as (flipped axes, phase negated, result sign).
+_PAIR_FLIPS = ((('x', 'a'), False, 1), (('y', 'b'), False, 1))
+
+# Functions odd in their phase; the others are even.
+_ODD = ('qn_tan2_sin', 'h_arctan')
+
+def symmetries(function):
+    """Generators of the sign-flip symmetries of an h.py Qn or H function, as (flipped axes, phase negated, result sign)."""
+    base = h_memo.base_name(getattr(h, function))
+    if base == 'h_sigmoid':
+        return _PAIR_FLIPS
+    return _PAIR_FLIPS + ((('x', 'y'), True, -1 if base in _ODD else 1),)
+
+def _compose(first, second):
+    axes = tuple(name for name in AXES if (name in first[0]) != (name in second[0]))
+    return axes, first[1] != second[1], first[2] * second[2]
+
+def _span(generators):
+    elements = [((), False, 1)]
+    for generator in generators:
+        elements += [_compose(element, generator) for element in elements]
+    return elements
+
+def _distinct(values):
+    # Distinct values in order of appearance, keeping 0.0 and -0.0 apart since they give different phases
+    return list({repr(value): value for value in values}.values())
+
+def _negative(value):
+    return copysign(1, value) < 0
+
+def _variants(axes):
+    # Each axis as it stays, made non-negative, or joined by its negations
+    return {name: {
+        "same": _distinct(axes[name]),
+        "abs": _distinct(abs(value) for value in axes[name]),
+        "signed": _distinct(axes[name] + [-value for value in axes[name]]),
+    } for name in AXES}
+
+def _representative_axes(variants, scheme):
+    # Key axes become non-negative, axes flipped by any applied symmetry gain their negations
+    flipped = {name for key, element in scheme for name in element[0]}
+    keys = {key for key, element in scheme}
+    return {name: variants[name]["abs" if name in keys else "signed" if name in flipped else "same"] for name in AXES}
+
+def fundamental_domain(function, axes):
+    """Choose the symmetries that shrink the grid most: returns (scheme, representative axes).
+
+    The scheme is a list of (key axis, symmetry); a symmetry is applied exactly when its key axis value is negative,
+    and no symmetry flips another's key axis, so every representative has non-negative key axes.
+    """
+    generators = symmetries(function)
+    variants = _variants({name: _axis(axes[name]) for name in AXES})
+    best_scheme, best_axes = [], _representative_axes(variants, [])
+    best_size = _size(best_axes)
+    for count in range(1, len(generators) + 1):
+        for subset in combinations(generators, count):
+            span = _span(subset)
+            for keys in permutations(AXES, count):
+                scheme = []
+                for key in keys:
+                    # The symmetry flipping this key axis and no other key axis
+                    matches = [element for element in span if set(element[0]) & set(keys) == {key}]
+                    if not matches:
+                        break
+                    scheme.append((key, matches[0]))
+                else:
+                    representatives = _representative_axes(variants, scheme)
+                    size = _size(representatives)
+                    if size < best_size:
+                        best_scheme, best_axes, best_size = scheme, representatives, size
+    return best_scheme, best_axes
+
+def _size(axes):
+    size = 1
+    for name in AXES:
+        size *= len(axes[name])
+    return size
+
+def _symmetry_report(scheme, representatives, count):
+    size = _size(representatives) if scheme else count
+    return {
+        "scheme": [[key, list(element[0]), element[1], element[2]] for key, element in scheme],
+        "representatives": size, "reduction": count / size if size else 1.0,
+    }
+
+class _Scatter:
+    """Maps grid points to representatives and reads their results back with the sign of the symmetry."""
+
+    def __init__(self, function, func, scalar, axes, grid, scheme, representatives, arguments, errors):
+        self.func, self.scalar, self.grid, self.scheme = func, scalar, grid, scheme
+        self.arguments, self.errors = arguments, errors
+        self.shape = [len(axes[name]) for name in AXES]
+        self.rep_shape = [len(representatives[name]) for name in AXES]
+        self.large = h_memo.base_name(scalar) in h_array.qn_models
+        # Index of each axis value, and of its negation, on the representative axis (-1 where absent)
+        self.same, self.opposite, self.negative = {}, {}, {}
+        for name in AXES:
+            position = {repr(value): index for index, value in enumerate(representatives[name])}
+            self.same[name] = [position.get(repr(value), -1) for value in axes[name]]
+            self.opposite[name] = [position.get(repr(-value), -1) for value in axes[name]]
+            self.negative[name] = [int(_negative(value)) for value in axes[name]]
+        self._tables()
+
+    def _tables(self):
+        # Bit k of a point's pattern is set when the k-th symmetry of the scheme applies to it. Per pattern, each axis
+        # index maps to its strided offset in the representative grid, so a point's representative is a sum of lookups.
+        patterns = 1 << len(self.scheme)
+        self.key_bits = {name: [0] * size for name, size in zip(AXES, self.shape)}
+        for bit, (key, element) in enumerate(self.scheme):
+            self.key_bits[key] = [bits | negative << bit for bits, negative in zip(self.key_bits[key], self.negative[key])]
+        self.offsets = {}
+        stride = 1
+        for axis in range(len(AXES) - 1, -1, -1):
+            name = AXES[axis]
+            self.offsets[name] = []
+            for pattern in range(patterns):
+                flipped = False
+                for bit, (key, element) in enumerate(self.scheme):
+                    if pattern >> bit & 1 and name in element[0]:
+                        flipped = not flipped
+                self.offsets[name].append([index * stride for index in (self.opposite if flipped else self.same)[name]])
+            stride *= self.rep_shape[axis]
+        self.negated, self.opposite_sign = [False] * patterns, [False] * patterns
+        for pattern in range(patterns):
+            for bit, (key, (names, negates, sign)) in enumerate(self.scheme):
+                if pattern >> bit & 1:
+                    self.negated[pattern] ^= negates
+                    self.opposite_sign[pattern] ^= sign < 0
+        if h_array._use_numpy():
+            np = h_array.np
+            for name in AXES:
+                self.key_bits[name] = np.asarray(self.key_bits[name], dtype=np.intp)
+                self.offsets[name] = np.asarray(self.offsets[name], dtype=np.intp).reshape(patterns, -1)
+            self.negated = np.asarray(self.negated, dtype=bool)
+            self.opposite_sign = np.asarray(self.opposite_sign, dtype=bool)
+
+    def __call__(self, rep_values, start, stop):
+        if not h_array._use_numpy():
+            return self._scatter_points(rep_values, start, stop)
+        np = h_array.np
+        index = dict(zip(AXES, np.unravel_index(np.arange(start, stop), self.shape)))
+        pattern = self.key_bits[AXES[0]][index[AXES[0]]]
+        for name in AXES[1:]:
+            pattern |= self.key_bits[name][index[name]]
+        rep_flat = self.offsets[AXES[0]][pattern, index[AXES[0]]]
+        for name in AXES[1:]:
+            rep_flat += self.offsets[name][pattern, index[name]]
+        values = rep_values[rep_flat]
+        opposite = self.opposite_sign[pattern]
+        np.negative(values, out=values, where=opposite)
+        direct = opposite & ((values == 0) | ~np.isfinite(values))
+        if self.errors == 'raise':
+            direct |= np.isnan(values)  # Representatives are swept with errors='nan'
+        negated = np.flatnonzero(self.negated[pattern]) if self.large else ()
+        if len(negated):
+            large = h_array._large(*[self.grid[name][index[name][negated]] for name in AXES])
+            direct[negated[large]] = True
+        if direct.any():
+            args = [self.grid[name][index[name][direct]] for name in AXES]
+            values[direct] = _evaluate_points(self.func, self.scalar, args, self.arguments, self.errors)
+        return values
+
+    def _scatter_points(self, rep_values, start, stop):
+        results = array('d')
+        x_size, y_size, a_size, b_size = self.shape
+        key_x, key_y, key_a, key_b = [self.key_bits[name] for name in AXES]
+        offset_x, offset_y, offset_a, offset_b = [self.offsets[name] for name in AXES]
+        for flat in range(start, stop):
+            rest, ib = divmod(flat, b_size)
+            rest, ia = divmod(rest, a_size)
+            ix, iy = divmod(rest, y_size)
+            pattern = key_x[ix] | key_y[iy] | key_a[ia] | key_b[ib]
+            value = rep_values[offset_x[pattern][ix] + offset_y[pattern][iy] + offset_a[pattern][ia] + offset_b[pattern][ib]]
+            if self.opposite_sign[pattern]:
+                value = -value
+                direct = value == 0 or not isfinite(value)
+            else:
+                direct = False
+            if direct or (self.errors == 'raise' and value != value) or self.large and self.negated[pattern]:
+                point = [self.grid['x'][ix], self.grid['y'][iy], self.grid['a'][ia], self.grid['b'][ib]]
+                if direct or value != value or h.large_phase(*point):
+                    try:
+                        value = self.scalar(*point, **self.arguments)
+                    except (OverflowError, ZeroDivisionError, ValueError):
+                        if self.errors == 'raise':
+                            raise
+                        value = float('nan')
+            results.append(value)
+        return results
+
+# Phase classes.
+# Every Qn model has period π up to sign: tan² and cot² repeat every π and are even, tan²⋅sin and cot²⋅cos change sign
+# every π, tan²⋅sin is odd and cot²⋅cos even. So θ = kπ + r with |r| ≤ π/2 folds onto ψ = |r| in [0, π/2] with a sign
+# from the parities of k and r, and the points of a grid fall into classes by their folded phase, however many periods
+# apart. ψ is binned to a multiple of PHASE_QUANTUM, so phases a period apart up to float noise (x = 0.3 and x = 1.8 at
+# a = 1.5, say) share a class. h_arctan is odd, so its argument x/a - y/b folds onto its absolute value, and h_sigmoid has
+# no symmetry of its own; their arguments are binned the same way, so points whose arguments agree up to float noise
+# share a class too.
+# Each class is evaluated once, at its representative, with the slope there. A point takes the representative's value
+# times its sign, rounded, unless that rounding could differ from h.py's. Its own float θ and the representative are at
+# most the fold and bin errors apart (|k| times the error of fl(π), plus a few ulps), so the values differ by at most the
+# slope times that distance; points that close to a rounding boundary, or near a pole or zero where the bound is loose,
+# are evaluated directly, like h_array's suspect elements. Points h.py answers from its exact table are filled from it,
+# and those it reduces exactly or rejects are evaluated directly. The classes are held in memory and need NumPy.
+
+# Width of the bins representative phases are rounded to, in radians.
+PHASE_QUANTUM = 2.0 ** -40
+
+# Most phase classes held in memory; sweeps with more use the sign flips alone.
+MAX_PHASE_CLASSES = 1 << 22
+
+# Bound on |π - fl(π)|: folding by k⋅fl(π) instead of kπ moves the phase by at most |k| times this.
+_PI_ERROR = 1.3e-16
+
+# Relative deviation from the representative beyond which a point is evaluated directly.
+_MAX_DEVIATION = 1e-6
+
+# Bound on int axis values for h_arctan and h_sigmoid: below it their float64 products, sums and quotients equal h.py's.
+_EXACT_INT = 1 << 26
+
+def _phases(func, scalar, grid, shape, arguments, errors, dtype):
+    # Phase classes for a sweep, or None where they do not apply
+    base = h_memo.base_name(scalar)
+    decimals = arguments.get("decimals")
+    if not h_array._use_numpy() or dtype != 'float64' or decimals is None or not 0 <= decimals <= 22:
+        return None
+    if base not in h_array.qn_models and base not in ('h_arctan', 'h_sigmoid'):
+        return None
+    if base not in h_array.qn_models:
+        for name in AXES:
+            if grid[name].dtype.kind != 'f' and grid[name].size and abs(grid[name]).max() >= _EXACT_INT:
+                return None  # h.py's int arithmetic is exact where float64 is not
+    return _Phases(base, func, scalar, grid, shape, arguments, errors)
+
+class _Phases:
+    """The phase classes of a sweep: their representatives with values and slopes, and the scatter back to the grid."""
+
+    def __init__(self, base, func, scalar, grid, shape, arguments, errors):
+        self.base, self.func, self.scalar, self.grid, self.shape = base, func, scalar, grid, shape
+        self.arguments, self.errors, self.decimals = arguments, errors, arguments["decimals"]
+        self.keys = self.values = self.slopes = None
+        self.size = 0
+
+    def _points(self, start, stop):
+        np = h_array.np
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        return [self.grid[name][i] for name, i in zip(AXES, index)]
+
+    def _classify(self, x, y, a, b):
+        # (key, sign, deviation, exact, table, direct): each point's representative, the sign its value takes and a bound
+        # on its phase distance to the representative, the points h.py answers from its table with their table values,
+        # and the points to evaluate directly
+        np = h_array.np
+        mode = h_array._rational_mode(x, y, a, b) if self.base in h_array.qn_models else None
+        x, y, a, b = np.broadcast_arrays(x, y, a, b)
+        direct = h_array._divides(a, b)
+        exact, table = np.zeros(x.shape, dtype=bool), None
+        with np.errstate(all='ignore'):
+            if self.base == 'h_sigmoid':
+                argument = (x * a) + (y * b)
+                key = np.rint(argument / PHASE_QUANTUM) * PHASE_QUANTUM
+                sign, deviation = np.ones(key.shape), np.abs(argument - key)
+                direct |= ~np.isfinite(argument) | (argument < -700)  # math.exp overflows there and h.py raises
+                return key, sign, deviation, exact, table, direct
+            if self.base == 'h_arctan':
+                argument = (x / a) - (y / b)
+                key = np.rint(np.abs(argument) / PHASE_QUANTUM) * PHASE_QUANTUM
+                sign, deviation = np.where(argument < 0, -1.0, 1.0), np.abs(np.abs(argument) - key)
+                direct |= ~np.isfinite(argument)
+                return key, sign, deviation, exact, table, direct
+            theta = h_array._argument(x, y, a, b)
+            turns = np.rint(theta / pi)
+            folded = theta - turns * pi
+            phase = np.abs(folded)
+            key = np.rint(phase / PHASE_QUANTUM) * PHASE_QUANTUM
+            deviation = np.abs(phase - key) + np.spacing(phase) + np.abs(turns) * _PI_ERROR + np.spacing(np.abs(turns * pi))
+            sign = np.ones(key.shape)
+            if self.base in ('qn_tan2_sin', 'qn_cot2_cos'):
+                sign[np.fmod(turns, 2) != 0] = -1.0
+            if self.base == 'qn_tan2_sin':
+                sign[folded < 0] *= -1.0
+        direct |= h_array._large(x, y, a, b) | ~np.isfinite(theta)
+        if mode == 'scalar':
+            direct[...] = True
+        elif mode == 'integer':
+            exact, quarter = h_array._quarter_turns(x, y, a, b)
+            model = h_array.qn_models.index(self.base)
+            table = np.array([h.qn_table_value(k, model, self.decimals) for k in range(8)])[quarter]
+        return key, sign, deviation, exact, table, direct
+
+    def _evaluate(self, keys):
+        # Values and slopes at the representatives, by h.py's formulas
+        np = h_array.np
+        with np.errstate(all='ignore'):
+            if self.base == 'h_sigmoid':
+                values = 1 / (1 + np.exp(-keys))
+                return values, values * (1 - values)
+            if self.base == 'h_arctan':
+                return np.arctan(keys) * (2 / pi), (2 / pi) / (1 + keys * keys)
+            sine, cosine, tangent = np.sin(keys), np.cos(keys), np.tan(keys)
+            model = h_array.qn_models.index(self.base)
+            if model == 0:
+                values = tangent ** 2
+            elif model == 1:
+                values = 1 / tangent ** 2
+            elif model == 2:
+                values = (tangent ** 2) * sine
+            else:
+                values = ((1 / tangent) ** 2) * cosine
+            return values, h_array.phase_slope(model, sine, cosine)[0]
+
+    def collect(self, count, tile_size):
+        """Class every point of the grid and evaluate the representatives; False if there are over MAX_PHASE_CLASSES."""
+        np = h_array.np
+        keys, pending, direct, tables = np.empty(0), [], 0, set()
+        for start in range(0, count, tile_size):
+            key, sign, deviation, exact, table, unclassed = self._classify(*self._points(start, min(start + tile_size, count)))
+            pending.append(np.unique(key[~(exact | unclassed)]))
+            direct += int(np.count_nonzero(unclassed & ~exact))
+            if table is not None:
+                tables.update(np.unique(table[exact]).tolist())
+            if sum(len(block) for block in pending) > max(len(keys), tile_size):
+                keys, pending = np.unique(np.concatenate([keys] + pending)), []
+                if len(keys) > MAX_PHASE_CLASSES:
+                    return False
+        keys = np.unique(np.concatenate([keys] + pending))
+        if len(keys) > MAX_PHASE_CLASSES:
+            return False
+        self.keys = keys
+        self.values, self.slopes = self._evaluate(keys)
+        self.size = len(keys) + direct + len(tables)
+        return True
+
+    def report(self, count):
+        return {"scheme": "phase", "representatives": self.size, "reduction": count / self.size if self.size else 1.0}
+
+    def __call__(self, start, stop):
+        np = h_array.np
+        args = self._points(start, stop)
+        key, sign, deviation, exact, table, direct = self._classify(*args)
+        direct &= ~exact
+        classed = np.flatnonzero(~(exact | direct))
+        index = np.searchsorted(self.keys, key[classed])
+        values, slopes = self.values[index], self.slopes[index]
+        with np.errstate(all='ignore'):
+            raw = sign[classed] * values
+            deviation = 2 * np.abs(slopes) * deviation[classed] / np.abs(values)
+        results = np.empty(key.shape)
+        results[classed] = h_array._round(raw, self.decimals)
+        unsettled = h_array._suspect(raw, self.decimals, h_array._SLACK + deviation) | ~(deviation <= _MAX_DEVIATION)
+        direct[classed[unsettled]] = True
+        if table is not None:
+            results[exact] = table[exact]
+        if direct.any():
+            results[direct] = _evaluate_points(self.func, self.scalar, [arg[direct] for arg in args], self.arguments, self.errors)
+        return results
+
+def open_sweep(path):
+    """Memory-map a finished sweep, returning (header, values) with values shaped by the x, y, a, b axes."""
+    with open(path, 'rb') as f:
+        header, data_offset = _read_header(f)
+    shape = header["shape"]
+    if h_array._use_numpy():
+        np = h_array.np
+        return header, np.memmap(path, dtype=header["dtype"], mode='r', offset=data_offset, shape=tuple(shape))
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    count = shape[0] * shape[1] * shape[2] * shape[3]
+    typecode = _typecode(header)
+    return header, memoryview(mapped)[data_offset:data_offset + array(typecode).itemsize * count].cast(typecode)
+
+def check_precision(path, samples=h_chunk.SAMPLE_SIZE, seed=0):
+    """Recompute a random sample of a sweep's points in float64 and report the deviation of the stored values.
+
+    Returns an h_chunk.PrecisionReport; run it on a float32 sweep before trusting the float32 mode on that grid.
+    """
+    header, values = open_sweep(path)
+    shape = header["shape"]
+    count = shape[0] * shape[1] * shape[2] * shape[3]
+    indices = sorted(random.Random(seed).sample(range(count), min(samples, count)))
+    args = [[] for name in AXES]
+    for flat in indices:
+        for axis in range(len(AXES) - 1, -1, -1):
+            flat, index = divmod(flat, shape[axis])
+            args[axis].append(header["axes"][AXES[axis]][index])
+    function = header["function"]
+    decimals = {} if function == 'loop' else {"decimals": header["decimals"]}
+    reference = _evaluate_points(getattr(h_array, function), getattr(h, function), args, decimals, 'nan')
+    if h_array._use_numpy():
+        stored = values.reshape(-1)[indices]
+    else:
+        stored = [values[index] for index in indices]
+    return h_chunk.compare_precision(reference, stored)
+
+def sweep_progress(path):
+    """Return (tiles done, tile count) for a sweep file."""
+    with open(path, 'rb') as f:
+        header, data_offset = _read_header(f)
+    shape = header["shape"]
+    count = shape[0] * shape[1] * shape[2] * shape[3]
+    tiles_done = 0
+    if os.path.exists(_progress_path(path)):
+        with open(_progress_path(path)) as f:
+            tiles_done = json.load(f)["tiles_done"]
+    return tiles_done, (count + header["tile_size"] - 1) // header["tile_size"]
@@ -0,0 +1,642 @@
+import math
+import pytest
+import h
+# Regression tests for the Halting Machine modules, run with python -m pytest from the repository root.
+
+QN_MODELS = ['qn_tan2', 'qn_cot2', 'qn_tan2_sin', 'qn_cot2_cos']
+
+# Starting points covering int and float starts, the exact π/4 table, poles, halves, large phases and nan (h.py raises on ±∞).
+X_VALUES = [-1, 0, 1, 2, 3, -1.0, 0.0, 1.0, 0.5, 2.5, -0.25, 1.5, 1e-9, 3e15, 2.0 ** 21, float('nan')]
+
+def _same(left, right):
+    return [repr(float(value)) for value in left] == [repr(float(value)) for value in right]
+
+@pytest.mark.parametrize('backend', ['numpy', 'array'])
+def test_h_array_is_bit_identical_to_h(backend, monkeypatch):
+    import h_array
+    monkeypatch.setattr(h_array, 'BACKEND', backend)
+    for name in ('qn_tan2', 'qn_cot2', 'qn_tan2_sin', 'qn_cot2_cos', 'h_arctan', 'h_sigmoid', 'halt', 'q_inverse'):
+        for y, a, b in ((0, 2, 2), (0.5, 1, 3), (-1, 0.7, 2)):
+            expected = []
+            for x in X_VALUES:
+                try:
+                    expected.append(getattr(h, name)(x, y, a, b))
+                except (OverflowError, ValueError, ZeroDivisionError):
+                    expected = None
+                    break
+            if expected is not None:
+                assert _same(getattr(h_array, name)(X_VALUES, y, a, b), expected), (name, y, a, b)
+
+# The halting cycles from the halting_machine docstring for x = -1, 0 and 1, as the results of iterations 1 .. 4.
+DOCUMENTED_CYCLES = {
+    'H Sigmoid with Qn = tan²(θ)⋅sin(θ)': {-1: [0.0, 1.0, 0.0, 1.0], 0: [1.0, 0.0, 1.0, 0.0], 1: [0.0, 1.0, 0.0, 1.0]},
+    'H Sigmoid with Qn = cot²(θ)⋅cos(θ)': {-1: [0.0, 1.0, 0.0, 1.0], 0: [1.0, 0.0, 1.0, 0.0], 1: [0.0, 1.0, 0.0, 1.0]},
+    'H Arctan with Qn = tan²(θ)': {-1: [0.0, 1.0, 0.0, 1.0], 0: [1.0, 0.0, 1.0, 0.0], 1: [0.0, 1.0, 0.0, 1.0]},
+    'H Arctan with Qn = cot²(θ)': {-1: [0.0, 1.0, 0.0, 1.0], 0: [1.0, 0.0, 1.0, 0.0], 1: [0.0, 1.0, 0.0, 1.0]},
+    'H Arctan with Qn = tan²(θ)⋅sin(θ)': {-1: [1.0, -1.0, 1.0, -1.0], 0: [0.0, 0.0, 0.0, 0.0], 1: [-1.0, 1.0, -1.0, 1.0]},
+    'H Arctan with Qn = cot²(θ)⋅cos(θ)': {-1: [1.0, -1.0, 1.0, -1.0], 0: [0.0, 0.0, 0.0, 0.0], 1: [-1.0, 1.0, -1.0, 1.0]},
+}
+
+def test_engine_cube_matches_documented_cycles():
+    import h_engine
+    cube = h_engine.run_halting_machine([-1, 0, 1], 4)
+    for m, (h_func, qn_func, description) in enumerate(h.halting_models):
+        for j, x in enumerate([-1, 0, 1]):
+            assert list(cube[m][j]) == DOCUMENTED_CYCLES[description][x]
+
+@pytest.mark.parametrize('backend', ['numpy', 'array'])
+def test_h_array_model_wrappers_are_bit_identical_to_h(backend, monkeypatch):
+    import h_array
+    monkeypatch.setattr(h_array, 'BACKEND', backend)
+    for h_func, qn_func, description in h.halting_models:
+        assert _same(getattr(h_array, qn_func.__name__)(X_VALUES), [qn_func(x) for x in X_VALUES]), qn_func.__name__
+
+def test_h_array_scalar_fallbacks_receive_the_original_arguments():
+    # Fractions, ints beyond 2**53 and lists mixing them with floats reach h.py as given, not as rounded floats
+    import h_array
+    from fractions import Fraction
+    x_values = [Fraction(1, 3), Fraction(-5, 8), 10 ** 30 + 1, 0.125, 2, Fraction(7, 2)]
+    for name in ('halt', 'q_inverse', 'h_arctan', 'qn_tan2', 'qn_cot2', 'qn_tan2_sin', 'qn_cot2_cos'):
+        for y, a, b in ((0, 1, 1), (Fraction(1, 3), 3, 1), (1, 10 ** 20 + 1, 1)):
+            expected = [getattr(h, name)(x, y, a, b) for x in x_values]
+            assert _same(getattr(h_array, name)(x_values, y, a, b), expected), (name, y, a, b)
+    x_values = [Fraction(1, 3), 10 ** 30 + 1, 0.3]
+    assert _same(h_array.qn_phase_slope('qn_cot2_cos', x_values), [h.qn_phase_slope('qn_cot2_cos', x) for x in x_values])
+    # x + y is 1 exactly but 0.0 in floats
+    assert _same(h_array.q_inverse_n([2 ** 53 + 1, 3], [1, 2], -2 ** 53), [h.q_inverse_n(x, n, -2 ** 53) for x, n in ((2 ** 53 + 1, 1), (3, 2))])
+
+def _direct(h_func, qn_func, x, n):
+    for i in range(n):
+        x = h_func(qn_func(x))
+    return x
+
+def test_documented_halting_cycles():
+    import h_engine
+    for h_func, qn_func, description in h.halting_models:
+        for x, results in DOCUMENTED_CYCLES[description].items():
+            assert [_direct(h_func, qn_func, x, n) for n in range(1, 5)] == results, (description, x)
+            orbit = h_engine.trace_orbit(h_func, qn_func, x)
+            assert orbit.period == (1 if results[0] == results[1] else 2)
+            assert h_engine.orbit_value(orbit, 10 ** 18) == results[1]
+
+def test_cycle_states_keep_their_type():
+    import h_engine
+    assert not h_engine.same_state(1, 1.0)
+    for h_func, qn_func, description in h.halting_models:
+        for x in (-1, 0, 1, -1.0, 0.0, 1.0, 0.5):
+            orbit = h_engine.trace_orbit(h_func, qn_func, x)
+            for n in range(12):
+                assert repr(h_engine.orbit_value(orbit, n)) == repr(_direct(h_func, qn_func, x, n)), (description, x, n)
+
+def test_cycle_and_graph_answers_agree():
+    import h_engine
+    import h_graph
+    for h_func, qn_func, description in h.halting_models:
+        graph = h_graph.build_transition_graph(h_func, qn_func)
+        for x in (-1, 0, 1, 0.5, 0.25, -0.75, 2.5):
+            orbit = h_engine.trace_orbit(h_func, qn_func, x)
+            for n in (0, 1, 2, 3, 7, 10 ** 6, 10 ** 18 + 1):
+                assert repr(h_graph.graph_orbit_value(graph, x, n)) == repr(h_engine.orbit_value(orbit, n)), (description, x, n)
+
+def test_graph_orbit_value_matches_the_recurrence():
+    import h_graph
+    h_func, qn_func, description = h.halting_models[0]
+    graph = h_graph.build_transition_graph(h_func, qn_func)
+    for x in (-1, 0, 1, 1.0, 0.5, 3.25):
+        for n in range(9):
+            assert repr(h_graph.graph_orbit_value(graph, x, n)) == repr(_direct(h_func, qn_func, x, n)), (x, n)
+    assert h_graph.graph_orbit_value(graph, float('nan'), 10 ** 18) != h_graph.graph_orbit_value(graph, float('nan'), 10 ** 18)
+
+def test_cached_graphs_are_rebuilt_when_their_source_changes(tmp_path, monkeypatch):
+    import h_cache
+    import h_graph
+    models = h.halting_models[:2]
+    (h_func, qn_func, description), (other_h, other_qn, other) = models
+    # A stale table under the first model's name: built from another model and recorded with an older source
+    path = tmp_path / f"{h_func.__name__}_{qn_func.__name__}_2.hqg"
+    h_graph.save_transition_graph(h_graph.build_transition_graph(other_h, other_qn), str(path), 'older')
+    graphs = h_graph.halting_graphs(2, str(tmp_path), models)
+    assert list(graphs[0].successor) == list(h_graph.build_transition_graph(h_func, qn_func).successor)
+    assert h_graph.graph_file_source(str(path)) == h_graph.graph_source(h_func, qn_func)
+    modified = path.stat().st_mtime_ns
+    h_graph.halting_graphs(2, str(tmp_path), models)
+    assert path.stat().st_mtime_ns == modified
+    monkeypatch.setattr(h_cache, 'source_hash', lambda *args, **kwargs: 'edited')
+    h_graph.halting_graphs(2, str(tmp_path), models)
+    assert h_graph.graph_file_source(str(path)) == h_graph.graph_source(h_func, qn_func)
+
+def test_qn_fused_matches_the_separate_models():
+    import h_array
+    x_values = [-1.0, 0.0, 0.5, 1.0, 1.5, -0.25, 0.37, 2.75, 1e-9, 123.456]
+    for y, a, b in ((0, 1, 1), (0.3, 1.7, 2.5), (-1, 2, 2)):
+        columns = [[] for name in QN_MODELS]
+        for x in x_values:
+            fused = h.qn_fused(x, y, a, b)
+            assert fused == tuple(getattr(h, name)(x, y, a, b) for name in QN_MODELS), (x, y, a, b)
+            for column, value in zip(columns, fused):
+                column.append(value)
+        for column, vector in zip(columns, h_array.qn_fused(x_values, y, a, b)):
+            assert _same(vector, column), (y, a, b)
+
+def test_near_rounding_boundary():
+    for value in (float('inf'), float('-inf'), float('nan'), 1e10, -1e-10, 0.125, -0.025, 1e300):
+        assert h.near_rounding_boundary(value), value
+    for value in (0.0, 0.13, -3.0, 0.1249, 1e-11, 5e5):
+        assert not h.near_rounding_boundary(value), value
+    assert h.near_rounding_boundary(0.0125, 3) and not h.near_rounding_boundary(0.0125, 2)
+
+def test_iterate_halting_machine_is_lazy_and_chunked():
+    import itertools
+    import h_engine
+    x_values = [-1, 0, 1, 0.5, 2.5, -0.25, 3]
+    records = list(h_engine.iterate_halting_machine(x_values, 3))
+    assert len(records) == len(x_values) * len(h.halting_models) * 3
+    for chunk_size in (1, 2, 5):
+        assert [repr(record) for record in h_engine.iterate_halting_machine(x_values, 3, chunk_size=chunk_size)] == \
+            [repr(record) for record in records]
+    cube = h_engine.run_halting_machine(x_values, 3)
+    for record in records:
+        assert record.result == cube[record.model][x_values.index(record.x0)][record.iteration - 1]
+    # An endless input is consumed one chunk at a time
+    first = list(itertools.islice(h_engine.iterate_halting_machine(itertools.count(), 2, chunk_size=4), 5))
+    assert [record.x0 for record in first] == [0, 0, 0, 0, 0]
+
+def test_read_x_values(tmp_path):
+    import io
+    import h_engine
+    text = "-1 0 1\n0.5  2e3\n\n-inf 7\n"
+    expected = [-1, 0, 1, 0.5, 2000.0, float('-inf'), 7]
+    values = list(h_engine.read_x_values(io.StringIO(text)))
+    assert values == expected
+    assert [type(value) for value in values] == [int, int, int, float, float, float, int]
+    path = tmp_path / 'x_values.txt'
+    path.write_text(text)
+    assert list(h_engine.read_x_values(str(path))) == expected
+
+def test_writers_round_trip(tmp_path):
+    import csv
+    import json
+    import h_engine
+    import h_io
+    x_values = [-1, 0, 1, 0.5, 2.5, 0.0, float('nan')]
+    records = list(h_engine.iterate_halting_machine(x_values, 4))
+    paths = {fmt: str(tmp_path / f'records.{fmt}') for fmt in h_io.writers}
+    for fmt, path in paths.items():
+        assert h_io.write_halting_machine(x_values, 4, fmt, path, chunk_size=3) == len(records)
+    with open(paths['csv'], newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(h_engine.IterationRecord._fields)
+    assert len(rows) == len(records) + 1
+    with open(paths['jsonl']) as f:
+        objects = [json.loads(line) for line in f]
+    assert len(objects) == len(records)
+    binary = list(h_io.read_binary_records(paths['binary']))
+    assert h_io.ITERATION_STRUCT.format == '<BdQdd' and h_io.ITERATION_STRUCT.size == 33
+    for record, row, obj, packed in zip(records, rows[1:], objects, binary):
+        expected = [float(value) for value in record]
+        assert _same([float(value) for value in row], expected)
+        assert _same([obj[field] for field in record._fields], expected)
+        assert _same(packed, expected)
+        assert packed.model == record.model and packed.iteration == record.iteration
+
+@pytest.mark.parametrize('mode', ['process', 'thread'])
+def test_parallel_equals_serial(mode):
+    import numpy as np
+    import h_engine
+    import h_parallel
+    x_values = X_VALUES * 4
+    parallel = h_parallel.run_halting_machine_parallel(x_values, 6, workers=2, chunk_size=7, mode=mode)
+    assert np.array_equal(parallel, h_engine.run_halting_machine(x_values, 6), equal_nan=True)
+
+def test_sweep_resumes_where_it_stopped(tmp_path, monkeypatch):
+    import h_sweep
+    axes = dict(x=h_sweep.linspace(-2, 2, 41), y=[0, 0.5], a=[1, 2], b=[2, 3])
+    complete = str(tmp_path / 'complete.bin')
+    h_sweep.sweep('qn_tan2_sin', complete, **axes, tile_size=16, checkpoint=2)
+    interrupted = str(tmp_path / 'interrupted.bin')
+    evaluate_tile, calls = h_sweep._evaluate_tile, []
+    def failing(*args):
+        calls.append(args)
+        if len(calls) == 5:
+            raise KeyboardInterrupt
+        return evaluate_tile(*args)
+    monkeypatch.setattr(h_sweep, '_evaluate_tile', failing)
+    with pytest.raises(KeyboardInterrupt):
+        h_sweep.sweep('qn_tan2_sin', interrupted, **axes, tile_size=16, checkpoint=2)
+    calls.clear()
+    monkeypatch.setattr(h_sweep, '_evaluate_tile', lambda *args: calls.append(args) or evaluate_tile(*args))
+    h_sweep.sweep('qn_tan2_sin', interrupted, **axes, tile_size=16, checkpoint=2)
+    assert len(calls) == (41 * 8 + 15) // 16 - 4  # Only the tiles after the last checkpoint
+    with open(complete, 'rb') as f, open(interrupted, 'rb') as g:
+        assert f.read() == g.read()
+
+@pytest.mark.parametrize('function, axes', [(name, dict(y=0.25, a=1.5, b=1)) for name in QN_MODELS + ['h_arctan']] + [
+    ('h_sigmoid', dict(y=[0.5, 1.0, 2.0], a=[0.5, 1.0, 2.0], b=[1.0, 2.0])),
+    ('qn_tan2_sin', dict(y=[-0.5, 0.25], a=[0.5, 1.5], b=[1.0, 2.0])),
+])
+def test_symmetric_sweep_is_bit_identical(tmp_path, function, axes):
+    import numpy as np
+    import h_sweep
+    x = h_sweep.linspace(-6, 6, 481)
+    header = h_sweep.sweep(function, str(tmp_path / 'symmetric.bin'), x=x, **axes, tile_size=97, symmetry=True)
+    h_sweep.sweep(function, str(tmp_path / 'plain.bin'), x=x, **axes, tile_size=97)
+    assert header["symmetry"]["scheme"] == 'phase' and header["symmetry"]["reduction"] > 1
+    symmetric, plain = h_sweep.open_sweep(str(tmp_path / 'symmetric.bin'))[1], h_sweep.open_sweep(str(tmp_path / 'plain.bin'))[1]
+    assert np.asarray(symmetric).tobytes() == np.asarray(plain).tobytes()
+
+def test_h_memo_is_bit_identical_to_h():
+    import h_memo
+    h_memo.enable()
+    try:
+        x_values = X_VALUES[:-1] * 3
+        for h_func, qn_func, description in h.halting_models:
+            qn_values = h_memo.evaluate(qn_func, x_values)
+            assert _same(qn_values, [qn_func(x) for x in x_values]), qn_func.__name__
+            assert _same(h_memo.evaluate(h_func, list(qn_values)), [h_func(value) for value in qn_values]), description
+            assert _same([h_memo.memoized(qn_func)(x) for x in x_values], [qn_func(x) for x in x_values])
+    finally:
+        h_memo.disable()
+
+@pytest.mark.parametrize('backend', ['numpy', 'array'])
+def test_h_memo_shares_phases_a_period_apart(backend, monkeypatch):
+    import h_array
+    import h_memo
+    monkeypatch.setattr(h_array, 'BACKEND', backend)
+    h_memo.enable()
+    h_memo.clear()
+    try:
+        # qn_tan2 has period π, x = 0.25 + 2k for its a = 2; 1e7 + 0.25 is a large phase h.py reduces exactly
+        x_values = [0.25 + 2 * k for k in range(-20, 21)] + [1e7 + 0.25]
+        assert _same([h_memo.qn_tan2(x) for x in x_values], [h.qn_tan2(x) for x in x_values])
+        assert h_memo.memo_stats()['qn_tan2'].misses == 1
+        assert _same(h_memo.evaluate(h.qn_tan2, [x + 4 for x in x_values]), [h.qn_tan2(x + 4) for x in x_values])
+        assert h_memo.memo_stats()['qn_tan2'].misses == 1
+        # Near a rounding boundary the points of a class may round apart, so each is keyed on its own θ
+        x = round(2 * math.atan(math.sqrt(0.5)) / math.pi * 2 ** 40) / 2 ** 40  # tan² = 0.5, with x + 2k exact
+        x_values = [x + 2 * k for k in range(-3, 4)]
+        assert _same([h_memo.qn_tan2(x, decimals=0) for x in x_values], [h.qn_tan2(x, decimals=0) for x in x_values])
+        assert h_memo.memo_stats()['qn_tan2'].misses == 1 + len(x_values)
+    finally:
+        h_memo.clear()
+        h_memo.disable()
+
+@pytest.mark.parametrize('name', QN_MODELS)
+def test_exact_phases_match_float_phases(name):
+    # At every kπ/2 (and kπ/4) the exact table of an int phase gives what the float path rounds to
+    model = getattr(h, name)
+    for k in range(-16, 17):
+        assert model(k, 0, 4, 2) == model(float(k), 0, 4, 2), k
+
+def test_pole_signs():
+    assert h.qn_tan2_sin_arctan_const(1) == h.qn_tan2_sin_arctan_const(1.0) == float('-inf')
+    assert h.qn_cot2_cos_sigmoid_const(-1) == h.qn_cot2_cos_sigmoid_const(-1.0) == float('-inf')
+    assert h.qn_tan2_sin(3, 0, 2, 1) == h.qn_tan2_sin(1.5, 0, 1, 1) == float('-inf')
+
+def test_h_approx_is_within_its_error_bound():
+    import h_approx
+    import h_array
+    x_values = h_array.np.linspace(-3, 3, 2001)
+    for name in ('qn_tan2', 'qn_cot2', 'qn_tan2_sin', 'qn_cot2_cos', 'h_arctan', 'h_sigmoid'):
+        for y, a, b in ((0, 1, 1), (0.3, 1.7, 2.5)):
+            for decimals in (2, 6):
+                approximate = getattr(h_approx, name)(x_values, y, a, b, decimals)
+                exact = getattr(h_array, name)(x_values, y, a, b, decimals)
+                finite = h_array.np.isfinite(exact)
+                assert (approximate[~finite] == exact[~finite]).all(), name
+                error = abs(approximate[finite] - exact[finite]).max()
+                assert error <= h_approx.error_bound(name) + 10.0 ** -decimals, (name, y, a, b, decimals)
+
+def test_h_approx_is_exact_inside_the_pole_window():
+    import h_approx
+    import h_array
+    np = h_array.np
+    window = h_approx.POLE_WINDOW
+    # Phases within the window of the poles at π/2 (tan² models) and at 0 and π (cot² models)
+    offsets = np.linspace(-window, window, 101)
+    for name, poles in (('qn_tan2', [0.5]), ('qn_tan2_sin', [0.5, 1.5]), ('qn_cot2', [0, 1]), ('qn_cot2_cos', [0, 1])):
+        x_values = np.concatenate([pole + offsets / np.pi for pole in poles])
+        assert _same(getattr(h_approx, name)(x_values, 0, 1, 1, 6), [getattr(h, name)(float(x), 0, 1, 1, 6) for x in x_values]), name
+
+def test_h_chunk_is_bit_identical_to_h():
+    import h_chunk
+    x_values = [float(x) for x in X_VALUES]
+    for h_func, qn_func, description in h.halting_models:
+        out = h_chunk.evaluate((qn_func.__name__, h_func.__name__), x=x_values, chunk_size=4)
+        assert _same(out, [h_func(qn_func(x)) for x in x_values]), description
+
+@pytest.mark.parametrize('backend', ['numpy', 'array'])
+def test_float32_thresholds_apply_to_every_input(backend, monkeypatch):
+    from fractions import Fraction
+    import h_array
+    import h_chunk
+    monkeypatch.setattr(h_array, 'BACKEND', backend)
+    assert h.qn_tan2(1, 0, 100000, 1, 12) == 9.87e-10  # Above h.py's zero threshold, below float32's
+    for x, a in (([1, 2], 100000), ([1.0, 2.0], 100000.0), ([Fraction(1), Fraction(2)], Fraction(100000))):
+        assert list(h_chunk.evaluate('qn_tan2', x, 0, a, 1, decimals=12, dtype='float32')) == [0.0, 0.0]
+    # Values between 2²⁴ and 1e10 stay finite, as in h.py
+    x = [1e-4 / math.pi, 1e-3 / math.pi]
+    for value, expected in zip(h_chunk.evaluate('qn_cot2', x, 0.0, 1.0, 1.0, dtype='float32'), [h.qn_cot2(v, 0.0, 1.0, 1.0) for v in x]):
+        assert value == pytest.approx(expected, rel=1e-3)
+
+def _nested_q_inverse(x, n, y, a, b):
+    for i in range(n):
+        x = h.q_inverse(x, y, a, b)
+    return x
+
+def test_q_inverse_n_matches_nested_calls():
+    import h_array
+    for y, a, b in ((0, 1, 1), (0.5, 1, 1), (1, 2, 3), (-0.25, 1.5, 0.5)):
+        for x in (-1, 0, 1, 3, 7, 0.5, 3.0, -0.07, 123.0, 1e-12, float('inf')):
+            for n in list(range(12)) + [1001, 10 ** 9]:
+                try:
+                    expected = _nested_q_inverse(x, n if n <= 1001 else 1000 + n % 2, y, a, b)
+                except ZeroDivisionError:
+                    with pytest.raises(ZeroDivisionError):
+                        h.q_inverse_n(x, n, y, a, b)
+                    continue
+                assert repr(h.q_inverse_n(x, n, y, a, b)) == repr(expected), (x, n, y, a, b)
+    x_values, depths = [3.0, 0.5, -0.07, 7.0, 1e-12], [0, 1, 2, 5, 10 ** 9]
+    assert _same(h_array.q_inverse_n(x_values, depths), [h.q_inverse_n(x, n) for x, n in zip(x_values, depths)])
+
+def _nested(chain, x, decimals=2):
+    for spec in chain:
+        name, constants = (spec, ()) if isinstance(spec, str) else (spec[0], spec[1:])
+        if name == 'loop':
+            x = h.loop(x, *constants)  # loop does not round
+        else:
+            x = getattr(h, name)(x, *constants, decimals=decimals)
+    return x
+
+def test_pipeline_chains_match_nested_calls():
+    import h_pipeline
+    chains = [
+        ['qn_tan2', 'h_arctan', 'qn_tan2', 'h_arctan'],
+        ['qn_tan2_sin_sigmoid_const', 'h_sigmoid'],
+        [('qn_cot2_cos', 0.25, 1.5, 2), 'h_arctan', 'q_inverse', 'halt'],
+        [('qn_tan2', 0.5, 3, 1), ('qn_cot2', 0.5, 3, 1), 'loop'],
+    ]
+    x_values = [-1, 0, 1, 2, 0.5, -0.25, 1.5, 2.0 ** 21, 3e15, 0.0, float('nan')]
+    for decimals in (2, 5):
+        for chain in chains:
+            compiled = h_pipeline.compile_chain(chain, decimals)
+            finished, expected = [], []
+            for x in x_values:
+                try:
+                    value = _nested(chain, x, decimals)
+                except (OverflowError, ValueError, ZeroDivisionError) as error:
+                    with pytest.raises(type(error)):
+                        compiled(x)
+                    continue
+                assert repr(compiled(x)) == repr(value), (chain, x)
+                finished.append(x)
+                expected.append(value)
+            assert _same(compiled.vector(finished), expected), chain
+        shared = h_pipeline.compile_chains(chains[:2], decimals)
+        for x in (-1, 0.5, 1.5):
+            assert shared(x) == tuple(_nested(chain, x, decimals) for chain in chains[:2])
+
+def test_model_table_propagates_infinite_leaves():
+    import h_model
+    model = h_model.compile_model('test_inverse_tan2', '1 / tan(t)**2')
+    assert model.table[2] == model.table[6] == 0.0
+    assert model.table[0] == model.table[4] == float('inf')
+    for k, name in enumerate(QN_MODELS):
+        compiled = h_model.compile_model(f'test_{name}', ['tan(t)**2', 'cot(t)**2', 'tan(t)**2 * sin(t)', 'cot(t)**2 * cos(t)'][k])
+        assert [compiled.table_value(q) for q in range(8)] == [h.qn_table_value(q, k) for q in range(8)]
+
+def test_cache_keeps_entries_of_other_sources(tmp_path):
+    import h_cache
+    path = str(tmp_path / 'cache.sqlite')
+    with h_cache.ResultCache(path, source='first') as cache:
+        cache.put('halting_machine', ['1'], 'first output')
+    with h_cache.ResultCache(path, source='second') as cache:
+        assert cache.get('halting_machine', ['1']) is None
+        cache.put('halting_machine', ['1'], 'second output')
+    with h_cache.ResultCache(path, source='first') as cache:
+        assert cache.get('halting_machine', ['1']) == 'first output'
+        assert len(cache) == 2
+
+def test_source_hash_covers_only_the_command_modules(tmp_path):
+    import os
+    import shutil
+    import h_cache
+    directory = os.path.dirname(os.path.abspath(h_cache.__file__))
+    for name in os.listdir(directory):
+        if name.endswith('.py'):
+            shutil.copy(os.path.join(directory, name), tmp_path)
+    def hashes():
+        return [h_cache.source_hash(str(tmp_path), h_cache.command_modules(command)) for command in ('q_inverse', 'halting_machine')]
+    before = hashes()
+    (tmp_path / 'h_unrelated.py').write_text('import h\n')
+    with open(tmp_path / 'h_sweep.py', 'a') as f:
+        f.write('\n# edited\n')
+    assert hashes() == before
+    with open(tmp_path / 'h_memo.py', 'a') as f:
+        f.write('\n# edited\n')  # imported by h_engine only
+    after = hashes()
+    assert after[0] == before[0] and after[1] != before[1]
+    with open(tmp_path / 'h_array.py', 'a') as f:
+        f.write('\n# edited\n')  # imported by h_model
+    assert all(new != old for new, old in zip(hashes(), after))
+
+def test_cache_evicts_least_recently_used_within_its_size(tmp_path):
+    import h_cache
+    with h_cache.ResultCache(str(tmp_path / 'cache.sqlite'), max_bytes=100, source='s') as cache:
+        for i in range(30):
+            cache.put('halt', [str(i)], 'x' * 10)
+        cache.get('halt', ['20'])
+        cache.put('halt', ['29'], 'y' * 20)  # Replacing an entry counts only its new size
+        sizes = [size for size, in cache.connection.execute("SELECT size FROM results")]
+        assert cache.size() == sum(sizes) <= 100 and len(sizes) == 9
+        assert cache.get('halt', ['20']) == 'x' * 10 and cache.get('halt', ['21']) is None
+        cache.clear()
+        assert cache.size() == 0
+
+def test_spawned_workers_run_registered_models(monkeypatch):
+    import functools
+    import multiprocessing
+    import numpy as np
+    import h_engine
+    import h_model
+    import h_parallel
+    monkeypatch.setattr(h_parallel, 'ProcessPoolExecutor',
+                        functools.partial(h_parallel.ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn')))
+    h_model.register('test_sec2', 'sec(t)**2', 'h_sigmoid', period=1)
+    try:
+        x_values = [-1, 0, 1, 0.5, 2.5]
+        parallel = h_parallel.run_halting_machine_parallel(x_values, 5, workers=2, chunk_size=2)
+        assert np.array_equal(parallel, h_engine.run_halting_machine(x_values, 5), equal_nan=True)
+    finally:
+        h_model.unregister('test_sec2')
+
+def test_derivatives_match_finite_differences():
+    step = 1e-6
+    point = dict(x=0.37, y=0.21, a=1.3, b=2.1)
+    for name in QN_MODELS:
+        model, derivative = getattr(h, name), getattr(h, 'd_' + name)
+        for wrt in 'xyab':
+            def shifted(delta):
+                return model(**dict(point, **{wrt: point[wrt] + delta}), decimals=15)
+            difference = (shifted(step) - shifted(-step)) / (2 * step)
+            slope = derivative(**point, wrt=wrt, decimals=12)
+            assert abs(slope - difference) <= 1e-6 * max(1.0, abs(slope)), (name, wrt, slope, difference)
+            assert slope == h.qn_partial(name, **point, wrt=wrt, decimals=12)
+        assert h.qn_gradient(**point, decimals=12, name=name) == tuple(derivative(**point, wrt=wrt, decimals=12) for wrt in 'xyab')
+
+@pytest.mark.parametrize('backend', ['numpy', 'array'])
+def test_array_derivatives_are_bit_identical_to_h(backend, monkeypatch):
+    import h_array
+    monkeypatch.setattr(h_array, 'BACKEND', backend)
+    x_values = X_VALUES[:-1]
+    for name in QN_MODELS:
+        for y, a, b in ((0, 2, 2), (0.5, 1, 3)):
+            for wrt in 'xyab':
+                expected = [getattr(h, 'd_' + name)(x, y, a, b, wrt) for x in x_values]
+                assert _same(getattr(h_array, 'd_' + name)(x_values, y, a, b, wrt), expected), (name, y, a, b, wrt)
+            gradient = h_array.qn_gradient(x_values, y, a, b, 2, name)
+            for column, wrt in zip(gradient, 'xyab'):
+                assert _same(column, [h.qn_partial(name, x, y, a, b, wrt) for x in x_values]), (name, wrt)
+
+@pytest.mark.parametrize('wrt', [('x', 'a', 'b'), ('a', 'b'), ('y',)])
+def test_sensitivities_match_the_array_fallback(wrt, monkeypatch):
+    import h_array
+    import h_dual
+    cube, tangents = h_dual.halting_sensitivities(depth=4, wrt=wrt)
+    monkeypatch.setattr(h_array, 'BACKEND', 'array')
+    rows, tangent_rows = h_dual.halting_sensitivities(depth=4, wrt=wrt)
+    assert [[list(row) for row in model] for model in rows] == [[list(row) for row in model] for model in cube]
+    assert [[[list(row) for row in parameter] for parameter in model] for model in tangent_rows] == \
+        [[[list(row) for row in parameter] for parameter in model] for model in tangents]
+
+# Antiderivatives of the four models: tan θ - θ, -cot θ - θ, sec θ + cos θ and -csc θ - sin θ.
+ANTIDERIVATIVES = {
+    'qn_tan2': lambda t: math.tan(t) - t,
+    'qn_cot2': lambda t: -1 / math.tan(t) - t,
+    'qn_tan2_sin': lambda t: 1 / math.cos(t) + math.cos(t),
+    'qn_cot2_cos': lambda t: -1 / math.sin(t) - math.sin(t),
+}
+
+def test_quadrature_matches_antiderivatives():
+    import h_quad
+    for name, antiderivative in ANTIDERIVATIVES.items():
+        for lower, upper in ((0.2, 1.3), (-1.2, -0.4), (3.3, 4.5), (1.1, 0.3)):
+            if name in ('qn_cot2', 'qn_cot2_cos') and lower < 0:
+                lower, upper = lower + 1.5, upper + 1.5
+            result = h_quad.integrate(name, lower, upper)
+            assert result.kind == 'proper' and result.singularities == ()
+            assert result.value == pytest.approx(antiderivative(upper) - antiderivative(lower), rel=1e-9, abs=1e-9), (name, lower, upper)
+
+def test_quadrature_finite_parts():
+    import h_quad
+    # Every pole of the four models is double, so integrals across one diverge; the finite part is the antiderivative's
+    # difference, which over a period is -π for tan² and cot² and 0 for the compositional models
+    result = h_quad.integrate('qn_tan2', 1, 2)
+    assert result.kind == 'divergent' and result.value == float('inf')
+    assert result.finite_part == pytest.approx(ANTIDERIVATIVES['qn_tan2'](2) - ANTIDERIVATIVES['qn_tan2'](1), rel=1e-9)
+    assert [(s.theta, s.order, s.interior) for s in result.singularities] == [(math.pi / 2, 2, True)]
+    assert result.singularities[0].coefficient == pytest.approx(1.0)
+    for name, finite_part in (('qn_tan2', -math.pi), ('qn_cot2', -math.pi), ('qn_tan2_sin', 0.0), ('qn_cot2_cos', 0.0)):
+        result = h_quad.period_integral(name)
+        assert result.kind == 'divergent'
+        assert result.finite_part == pytest.approx(finite_part, abs=1e-8), name
+    # tan²⋅sin diverges to +∞ at π/2 and to -∞ at 3π/2
+    assert math.isnan(h_quad.period_integral('qn_tan2_sin').value)
+    assert h_quad.integrate('qn_cot2', 0.5, 4).value == float('inf')
+
+def test_quadrature_finds_denominator_zeros(monkeypatch):
+    import h_model
+    import h_quad
+    h_model.register('test_shifted_pole', '1/(sin(t) - 0.5)', period=2)
+    try:
+        # A simple pole at π/6: the principal value, from the antiderivative log|(tan(t/2) - 2 + √3)/(tan(t/2) - 2 - √3)|/√(3/4)
+        antiderivative = lambda t: math.log(abs((math.tan(t / 2) - 2 + math.sqrt(3)) / (math.tan(t / 2) - 2 - math.sqrt(3)))) / math.sqrt(0.75)
+        result = h_quad.integrate('test_shifted_pole', 0, 2)
+        assert result.kind == 'principal value'
+        assert result.value == pytest.approx(antiderivative(2) - antiderivative(0), rel=1e-9)
+        assert [(s.order, s.interior) for s in result.singularities] == [(1, True)]
+        assert result.singularities[0].theta == pytest.approx(math.pi / 6, abs=1e-15)
+        # A pole the integrator cannot see leaves a non-finite estimate, which is not reported as proper
+        monkeypatch.setattr(h_quad, 'denominator_zeros', lambda model, lower, upper: ([], 0))
+        result = h_quad.integrate('test_shifted_pole', 0, 2)
+        assert result.kind == 'unknown' and not math.isfinite(result.value)
+    finally:
+        h_model.unregister('test_shifted_pole')
+
+def test_qmc_matches_a_known_integral():
+    import h_qmc
+    # ∫∫tan²(Θ + φ) over [0, 1/2]², from the antiderivative tan θ - θ and ∫tan θ dθ = -log cos θ
+    exact = 2 * math.log(math.cos(0.5)) - math.log(math.cos(1)) - 0.25
+    estimate = h_qmc.integrate('qn_tan2', [0, 0], [0.5, 0.5], abs_tol=1e-6, rel_tol=1e-6, workers=1)
+    assert estimate.converged and not estimate.singular
+    assert abs(estimate.value - exact) <= 5 * estimate.error + 1e-9
+    assert estimate.error <= 1e-6
+    # The same phase range through scalars: θ = Θ/2 + φ/2 over [0, 1]²
+    scaled = h_qmc.integrate('qn_tan2', [0, 0], [1, 1], scales=[2, 2], abs_tol=1e-6, rel_tol=1e-6, workers=1)
+    assert abs(scaled.value - 4 * exact) <= 5 * scaled.error + 1e-9
+    assert h_qmc.integrate('qn_tan2', [0, 0], [1, 1], max_points=1 << 16, workers=1).singular
+
+def test_field_values_and_gradients():
+    import h_array
+    import h_field
+    np = h_array.np
+    # θ = Θ_0/1.5 + Θ_1/2 + Θ_2/0.5 stays within [0.2, 1.35], clear of every pole
+    angles = h_field.grid(np.linspace(0.3, 1.2, 7), np.linspace(-0.2, 0.3, 5), np.array([0.05, 0.2]))
+    scales = [1.5, 2.0, 0.5]
+    step = 1e-6
+    for name in QN_MODELS:
+        value, *partials = h_field.qn_field(name, angles, scales, gradient='all')
+        theta = sum(angle / scale for angle, scale in zip(angles, scales))
+        assert value.shape == (7, 5, 2)
+        expected = [getattr(h, name)(t / np.pi, 0, 1, 1, 15) for t in np.broadcast_to(theta, value.shape).flat]
+        assert np.allclose(value.reshape(-1), expected, rtol=1e-12)
+        for i in range(3):
+            def shifted(delta, i=i, kind='angle'):
+                moved = list(angles) if kind == 'angle' else list(scales)
+                moved[i] = moved[i] + delta
+                if kind == 'angle':
+                    return h_field.qn_field(name, moved, scales, gradient=None)[0]
+                return h_field.qn_field(name, angles, moved, gradient=None)[0]
+            for kind, partial in (('angle', partials[i]), ('scale', partials[3 + i])):
+                difference = (shifted(step, kind=kind) - shifted(-step, kind=kind)) / (2 * step)
+                assert np.allclose(partial, difference, rtol=1e-6, atol=1e-6), (name, kind, i)
+        phase = h_field.qn_field(name, angles, scales, gradient='phase')[1]
+        assert np.array_equal(partials[0], phase / scales[0])
+
+def test_field_resumes_where_it_stopped(tmp_path, monkeypatch):
+    import h_array
+    import h_field
+    np = h_array.np
+    angles = h_field.grid(np.linspace(-1, 1, 33), np.linspace(0, 2, 9))
+    complete = str(tmp_path / 'complete.field')
+    header = h_field.field('qn_tan2_sin', complete, angles, [1.5, 2.0], tile_size=16, checkpoint=2)
+    assert header['components'] == ['value', 'angle_0', 'angle_1']
+    interrupted = str(tmp_path / 'interrupted.field')
+    evaluate, calls = h_field._evaluate, []
+    def failing(*args):
+        calls.append(args)
+        if len(calls) == 6:
+            raise KeyboardInterrupt
+        return evaluate(*args)
+    monkeypatch.setattr(h_field, '_evaluate', failing)
+    with pytest.raises(KeyboardInterrupt):
+        h_field.field('qn_tan2_sin', interrupted, angles, [1.5, 2.0], tile_size=16, checkpoint=2)
+    calls.clear()
+    monkeypatch.setattr(h_field, '_evaluate', lambda *args: calls.append(args) or evaluate(*args))
+    h_field.field('qn_tan2_sin', interrupted, angles, [1.5, 2.0], tile_size=16, checkpoint=2)
+    assert len(calls) == (33 * 9 + 15) // 16 - 4  # Only the tiles after the last checkpoint
+    with open(complete, 'rb') as f, open(interrupted, 'rb') as g:
+        assert f.read() == g.read()
+    header, data = h_field.open_field(interrupted)
+    expected = h_field.qn_field('qn_tan2_sin', angles, [1.5, 2.0])
+    for component, values in enumerate(expected):
+        assert np.array_equal(data[..., component], values, equal_nan=True)
+
+@pytest.mark.parametrize('name', QN_MODELS)
+def test_gradient_at_poles_is_the_model_value(name):
+    # At a pole the slope table and every partial carry the model's own ±∞
+    model = getattr(h, name)
+    for k in range(-8, 9):
+        value = model(k, 0, 2, 1)
+        if value in (float('inf'), float('-inf')):
+            assert h.qn_phase_slope(name, k, 0, 2, 1) == value
+            assert h.qn_gradient(k, 0, 2, 1, 2, name) == (value,) * 4